@@ -1,10 +1,18 @@
 import subprocess
-import json
 from pathlib import Path
 import sys
 import os
+import tempfile
 
 from config.paths import TARGET_REPOS_DIR, VENVS_DIR, DATA_DIR, CI_WORKSPACE_COVERAGE
+from ci.diff_scope import load_diff_scope
+from ci.instrumentation import span
+from analysis.coverage_store import (
+    BRANCHES_SUFFIX, LINES_SUFFIX, CoverageResult,
+    read_branch_stats, read_executed_lines, save_branch_stats, save_line_bitmaps,
+)
+from analysis.test_impact import TEST_IMPACT_NAME, read_test_lines, save_test_lines
+from analysis.incremental_coverage import IncrementalPlan, StaleIndex, coverage_state
 
 
 CI_MODE = os.getenv("CI_MODE") == "1"
@@ -14,6 +22,46 @@ TARGET_REPO = Path(os.getenv("TARGET_REPO", TARGET_REPOS_DIR))
 
 VALIDATION_REPOS = {"attrs", "jinja2", "itsdangerous"}
 
+# Parallel pytest processes per coverage run (1 = single `coverage run`)
+COVERAGE_SHARDS = int(os.getenv("COVERAGE_SHARDS", 1))
+
+# Measure branch arcs too (per-function branch coverage in post_ml_aggregate)
+COVERAGE_BRANCH = os.getenv("COVERAGE_BRANCH", "1") == "1"
+
+# Record which test executed each line (see analysis/test_impact.py)
+COVERAGE_CONTEXTS = os.getenv("COVERAGE_CONTEXTS") == "1"
+CONTEXTS_RC = "[run]\ndynamic_context = test_function\n"
+
+# Re-run only the tests affected since the previous run (see analysis/incremental_coverage.py)
+COVERAGE_INCREMENTAL = os.getenv("COVERAGE_INCREMENTAL") == "1"
+
+# pytest exit code when a -k filter deselects every requested test
+NO_TESTS_COLLECTED = 5
+
+# pytest plugin keeping only the node IDs listed in $COVERAGE_SELECT_IDS, so
+# test selections never have to fit on the command line
+SELECT_PLUGIN = "_coverage_select"
+SELECT_PLUGIN_SOURCE = """\
+import os
+
+with open(os.environ["COVERAGE_SELECT_IDS"]) as f:
+    SELECTED = set(f.read().splitlines())
+
+
+def pytest_collection_modifyitems(config, items):
+    keep, drop = [], []
+    for item in items:
+        nodeid = item.nodeid
+        # Parametrized items run under their function's ID, whole files under their path
+        if nodeid in SELECTED or nodeid.split("[", 1)[0] in SELECTED or nodeid.split("::", 1)[0] in SELECTED:
+            keep.append(item)
+        else:
+            drop.append(item)
+    if drop:
+        config.hook.pytest_deselected(items=drop)
+        items[:] = keep
+"""
+
 REPO_PACKAGE_OVERRIDES = {
     "attrs": "attr",
     "jinja2": "jinja2",
@@ -68,45 +116,240 @@ def pytest_args() -> list[str]:
     return ["-k", "not mypy and not TestAssoc"]
 
 
+def selection_args(tests, workdir: Path, name: str = "tests") -> tuple[list[str], dict]:
+    """
+    (pytest arguments, extra env) running only the given targets: their test
+    files, plus the select plugin when they name single tests. The node IDs
+    go to a file in workdir instead of onto the command line.
+    """
+    tests = list(tests)
+    files = list(dict.fromkeys(t.split("::", 1)[0] for t in tests))
+    if all("::" not in t for t in tests):
+        return files, {}
+
+    workdir = Path(workdir)
+    (workdir / f"{SELECT_PLUGIN}.py").write_text(SELECT_PLUGIN_SOURCE)
+    ids_file = workdir / f"{name}.txt"
+    ids_file.write_text("\n".join(tests) + "\n")
+    pythonpath = os.pathsep.join(p for p in (str(workdir), os.environ.get("PYTHONPATH")) if p)
+    return [*files, "-p", SELECT_PLUGIN], {"PYTHONPATH": pythonpath, "COVERAGE_SELECT_IDS": str(ids_file)}
+
+
 # ---------------------------------------------------------
 # Coverage execution
 # ---------------------------------------------------------
-def collect_coverage(repo_path: Path, python_exec: Path) -> dict:
-    package = detect_package_name(repo_path)
-
-    cmd = [
-        str(python_exec),
-        "-m",
-        "coverage",
-        "run",
-        "--rcfile=/dev/null",
-        f"--source={package}",
-        "-m",
-        "pytest",
-    ]
-    cmd += pytest_args()
+def measurement_args(repo_path: Path, include=None) -> list[str]:
+    # --include and --source are mutually exclusive in coverage run
+    if include:
+        args = [f"--include={','.join(include)}"]
+    else:
+        args = [f"--source={detect_package_name(repo_path)}"]
+    return args + ["--branch"] if COVERAGE_BRANCH else args
+
+
+def rcfile_arg(workdir: Path, contexts: bool) -> str:
+    # The repo's own config is always ignored; contexts need a one-line rcfile
+    if not contexts:
+        return "--rcfile=/dev/null"
+    rcfile = Path(workdir) / "coveragerc"
+    rcfile.write_text(CONTEXTS_RC)
+    return f"--rcfile={rcfile}"
+
+
+def read_coverage(data_file: Path, repo_path: Path, contexts: bool) -> CoverageResult:
+    return CoverageResult(
+        read_executed_lines(data_file, repo_path),
+        test_lines=read_test_lines(data_file, repo_path) if contexts else None,
+        branches=read_branch_stats(data_file, repo_path),
+    )
+
+
+def collect_coverage(repo_path: Path, python_exec: Path, include=None, shards: int = None,
+                     contexts: bool = False, tests=None) -> CoverageResult:
+    """
+    Runs the repo's tests (or only the given pytest targets) under coverage.
+    Per-test lines are collected with contexts=True, branch stats with
+    COVERAGE_BRANCH.
+    """
+    shards = COVERAGE_SHARDS if shards is None else shards
+    if shards > 1:
+        return collect_sharded_coverage(repo_path, python_exec, shards, include, contexts, tests)
+
+    with tempfile.TemporaryDirectory(prefix="coverage_rc_") as tmp:
+        selection, select_env = selection_args(tests, tmp) if tests else ([], {})
+        cmd = [
+            str(python_exec),
+            "-m",
+            "coverage",
+            "run",
+            rcfile_arg(tmp, contexts),
+            *measurement_args(repo_path, include),
+            "-m",
+            "pytest",
+        ]
+        cmd += pytest_args() + selection
+
+        env = {**os.environ, **select_env} if select_env else None
+        returncode = subprocess.run(cmd, cwd=repo_path, env=env).returncode
+        if returncode != 0 and not (tests and returncode == NO_TESTS_COLLECTED):
+            raise CoverageError("Coverage run failed")
+
+    return read_coverage(repo_path / os.getenv("COVERAGE_FILE", ".coverage"), repo_path, contexts)
 
-    try:
-        subprocess.run(cmd, cwd=repo_path, check=True)
-    except subprocess.CalledProcessError:
-        raise CoverageError("Coverage run failed")
 
-    json_out = repo_path / "coverage_tmp.json"
+# ---------------------------------------------------------
+# Sharded execution (no pytest-xdist needed)
+# ---------------------------------------------------------
+def collect_test_ids(repo_path: Path, python_exec: Path) -> list[str]:
+    result = subprocess.run(
+        [str(python_exec), "-m", "pytest", "--collect-only", "-q", *pytest_args()],
+        cwd=repo_path, capture_output=True, text=True,
+    )
+    if result.returncode not in (0, 5):  # 5 = no tests collected
+        raise CoverageError(f"Test collection failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    return [line.strip() for line in result.stdout.splitlines() if "::" in line and not line.startswith(" ")]
+
+
+def shard_test_ids(test_ids: list[str], shards: int) -> list[list[str]]:
+    """
+    Splits test IDs into at most `shards` groups. Tests of one file stay
+    together (module fixtures run once); files are assigned largest-first to
+    the currently smallest shard.
+    """
+    by_file = {}
+    for test_id in test_ids:
+        by_file.setdefault(test_id.split("::", 1)[0], []).append(test_id)
+
+    groups = [[] for _ in range(min(shards, len(by_file)))]
+    for ids in sorted(by_file.values(), key=len, reverse=True):
+        min(groups, key=len).extend(ids)
+    return [g for g in groups if g]
+
+
+def collect_sharded_coverage(repo_path: Path, python_exec: Path, shards: int, include=None,
+                             contexts: bool = False, tests=None) -> CoverageResult:
+    test_ids = list(tests) if tests else collect_test_ids(repo_path, python_exec)
+    groups = shard_test_ids(test_ids, shards)
+    if len(groups) < 2:
+        return collect_coverage(repo_path, python_exec, include=include, shards=1, contexts=contexts, tests=tests)
+
+    print(f"[INFO] Running {len(test_ids)} tests in {len(groups)} coverage shards")
+
+    with tempfile.TemporaryDirectory(prefix="coverage_shards_") as tmp:
+        env = os.environ.copy()
+        # Every shard writes .coverage.<host>.<pid>.<rand> next to this base name
+        env["COVERAGE_FILE"] = str(Path(tmp) / ".coverage")
+        rcfile = rcfile_arg(tmp, contexts)
+
+        procs = []
+        for i, group in enumerate(groups):
+            # Each shard holds whole test files: collected IDs are re-selected by
+            # their files and pytest_args(), explicit targets through a file
+            if tests:
+                selection, select_env = selection_args(group, tmp, name=f"shard_{i}_tests")
+            else:
+                selection, select_env = list(dict.fromkeys(t.split("::", 1)[0] for t in group)), {}
+            cmd = [
+                str(python_exec), "-m", "coverage", "run",
+                rcfile, "--parallel-mode",
+                *measurement_args(repo_path, include),
+                "-m", "pytest", "-p", "no:cacheprovider", *pytest_args(), *selection,
+            ]
+            log = open(Path(tmp) / f"shard_{i}.log", "w+")
+            procs.append((
+                subprocess.Popen(cmd, cwd=repo_path, env={**env, **select_env}, stdout=log, stderr=subprocess.STDOUT),
+                log,
+            ))
+
+        failed = []
+        for i, (proc, log) in enumerate(procs):
+            returncode = proc.wait()
+            if returncode != 0 and not (tests and returncode == NO_TESTS_COLLECTED):
+                failed.append(i)
+            log.seek(0)
+            print(f"--- coverage shard {i} ({len(groups[i])} tests) ---")
+            print(log.read().rstrip())
+            log.close()
+
+        if failed:
+            raise CoverageError(f"Coverage run failed in shard(s) {failed}")
 
-    try:
-        subprocess.run(
-            [str(python_exec), "-m", "coverage", "json", "-o", str(json_out)],
-            cwd=repo_path,
-            check=True,
-        )
-    except subprocess.CalledProcessError:
-        raise CoverageError("Coverage JSON failed")
+        try:
+            subprocess.run(
+                [str(python_exec), "-m", "coverage", "combine", rcfile, "-q"],
+                cwd=repo_path, env=env, check=True,
+            )
+        except subprocess.CalledProcessError:
+            raise CoverageError("Coverage combine failed")
 
-    with open(json_out, "r") as f:
-        data = json.load(f)
-    
-    json_out.unlink()
-    return data
+        return read_coverage(env["COVERAGE_FILE"], repo_path, contexts)
+
+
+# ---------------------------------------------------------
+# Incremental execution
+# ---------------------------------------------------------
+def collect_incremental_coverage(repo_path: Path, python_exec: Path, test_impact_file: Path, measure: str,
+                                 include=None) -> CoverageResult:
+    """
+    Re-runs only the tests affected since the run recorded in test_impact_file
+    and merges them into it; falls back to a full run with contexts.
+    """
+    try:
+        plan = IncrementalPlan(repo_path, test_impact_file, measure)
+    except StaleIndex as e:
+        print(f"[INFO] Full coverage run: {e}")
+        return collect_coverage(repo_path, python_exec, include=include, contexts=True)
+
+    if not plan.targets:
+        print("[INFO] No affected tests, reusing the previous coverage")
+        return plan.merge()
+    return plan.merge(collect_coverage(repo_path, python_exec, include=include, contexts=True, tests=plan.targets))
+
+
+def run_coverage(repo_path: Path, python_exec: Path, test_impact_file: Path, include=None):
+    """
+    The coverage run configured by COVERAGE_INCREMENTAL / COVERAGE_CONTEXTS.
+    Returns (result, state) for save_coverage.
+    """
+    with span("coverage", repo=Path(repo_path).name, shards=COVERAGE_SHARDS) as s:
+        if not (COVERAGE_CONTEXTS or COVERAGE_INCREMENTAL):
+            s.set(mode="full")
+            result, state = collect_coverage(repo_path, python_exec, include=include), None
+        else:
+            measure = " ".join(measurement_args(repo_path, include) + pytest_args())
+            state = coverage_state(repo_path, measure)
+            if COVERAGE_INCREMENTAL:
+                s.set(mode="incremental")
+                result = collect_incremental_coverage(repo_path, python_exec, test_impact_file, measure, include)
+            else:
+                s.set(mode="contexts")
+                result = collect_coverage(repo_path, python_exec, include=include, contexts=True)
+
+        s.set(files_measured=len(result.executed))
+        if result.test_lines is not None:
+            s.set(tests=len({t for by_test in result.test_lines.values() for t in by_test}))
+    return result, state
+
+
+def save_coverage(result: CoverageResult, base: Path, test_impact_file: Path, state: dict = None) -> Path:
+    """
+    Persists a coverage run as <base>.lines.z (+ <base>.branches.z); per-test
+    lines go to the test-impact index. Files a run did not collect are
+    removed so they never go stale.
+    """
+    branches_file = base.parent / f"{base.name}{BRANCHES_SUFFIX}"
+    if result.branches is not None:
+        save_branch_stats(branches_file, result.branches)
+    else:
+        branches_file.unlink(missing_ok=True)
+
+    if result.test_lines is not None:
+        out = save_test_lines(test_impact_file, result.test_lines, result.executed, state, result.branches)
+        n_tests = len({t for by_test in result.test_lines.values() for t in by_test})
+        print(f"[OK] Per-test coverage for {n_tests} tests saved to -> {out}")
+    else:
+        Path(test_impact_file).unlink(missing_ok=True)
+    return save_line_bitmaps(base.parent / f"{base.name}{LINES_SUFFIX}", result.executed)
 
 
 # ---------------------------------------------------------
@@ -121,11 +364,14 @@ if __name__ == "__main__":
         repo = Path(sys.argv[1]) if len(sys.argv) > 1 else TARGET_REPO
         py = Path(sys.executable)
 
+        # Diff mode: only measure the changed files
+        diff_scope = load_diff_scope()
+        include = diff_scope.absolute_paths() if diff_scope is not None else None
+
+        test_impact_file = CI_WORKSPACE_COVERAGE / TEST_IMPACT_NAME
         try:
-            cov = collect_coverage(repo, py)
-            out = CI_WORKSPACE_COVERAGE / "coverage.json"
-            with open(out, 'w') as f:
-                json.dump(cov, f, indent=2)
+            cov, state = run_coverage(repo, py, test_impact_file, include=include)
+            out = save_coverage(cov, CI_WORKSPACE_COVERAGE / "coverage", test_impact_file, state)
             print(f"[OK] CI coverage collected and saved to -> {out}")
         except CoverageError as e:
             print(f"[ERROR] {e}")
@@ -135,7 +381,7 @@ if __name__ == "__main__":
 
     # ---------------- RESEARCH MODE ----------------
     if len(sys.argv) != 2:
-        print("Usage: python analysis/coverage.py <repo-name>")
+        print("Usage: python -m analysis.coverage <repo-name>")
         sys.exit(1)
 
     repo_name = sys.argv[1]
@@ -148,11 +394,10 @@ if __name__ == "__main__":
 
     DATA_DIR.mkdir(exist_ok=True)
 
+    test_impact_file = DATA_DIR / f"{repo_name}_{TEST_IMPACT_NAME}"
     try:
-        cov = collect_coverage(repo_path, python_exec)
-        out = DATA_DIR / f"{repo_name}_coverage.json"
-        with open(out, 'w') as f:
-            json.dump(cov, f, indent=2)
+        cov, state = run_coverage(repo_path, python_exec, test_impact_file)
+        out = save_coverage(cov, DATA_DIR / f"{repo_name}_coverage", test_impact_file, state)
         print(f"[OK] Coverage saved for {repo_name} in path → {out}")
     except CoverageError as e:
         print(f"[ERROR] {e}")
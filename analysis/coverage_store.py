@@ -0,0 +1,197 @@
+"""
+coverage_store.py
+(Executed lines straight from the .coverage database, persisted as bitmaps)
+
+collect_coverage used to export `coverage json`, load it and dump it again
+for post_ml_aggregate to parse a third time. Instead, executed lines are read
+from the .coverage SQLite file with coverage.CoverageData and stored as one
+bit per source line, zlib-compressed:
+
+    b"CLB1" | u32 n_files | n x (u32 name_len, name utf-8, u32 n_bytes, bitmap)
+
+bit (line % 8) of bitmap byte (line // 8) is set when the line executed;
+names are repo-relative when the file lives inside the repo.
+
+Stdlib only: in clone mode this runs under the target repo's venv, which has
+coverage and pytest but not numpy.
+
+Raw line data is what the tracer recorded, so continuation lines of
+multi-line statements count as executed too (the JSON report folds them into
+the statement's first line).
+
+Branch runs (`coverage run --branch`) also store, per file, every branch line
+with its number of possible and taken exits (coverage's branch_stats):
+
+    b"CBS1" | u32 n_files | n x (u32 name_len, name utf-8, u32 m,
+                                 m x u32 line, m x u16 total, m x u16 taken)
+"""
+import os
+import struct
+import zlib
+from array import array
+from pathlib import Path
+
+LINES_SUFFIX = ".lines.z"
+BRANCHES_SUFFIX = ".branches.z"
+MAGIC = b"CLB1"
+BRANCH_MAGIC = b"CBS1"
+
+
+class CoverageResult:
+    """
+    One coverage run: executed lines per file, plus per-test lines
+    (file -> {test ID -> lines}) and branch stats (file -> {line: (total, taken)})
+    when those were collected.
+    """
+
+    def __init__(self, executed: dict, test_lines: dict = None, branches: dict = None):
+        self.executed = executed
+        self.test_lines = test_lines
+        self.branches = branches
+
+
+def _relative_key(measured: str, repo_root) -> str:
+    key = measured[len(repo_root):] if repo_root and measured.startswith(repo_root) else measured
+    return key.replace("\\", "/")
+
+
+def read_executed_lines(data_file, repo_path=None) -> dict:
+    """Measured file -> sorted list of executed lines."""
+    from coverage import CoverageData
+
+    data = CoverageData(basename=str(data_file))
+    data.read()
+
+    repo_root = str(Path(repo_path).resolve()) + os.sep if repo_path else None
+    executed = {}
+    for measured in sorted(data.measured_files()):
+        executed[_relative_key(measured, repo_root)] = sorted(l for l in set(data.lines(measured) or ()) if l > 0)
+    return executed
+
+
+def read_branch_stats(data_file, repo_path=None):
+    """
+    Measured file -> {branch line: (possible exits, taken exits)}, or None
+    when the data has no arcs or coverage predates Coverage.branch_stats (7.7).
+    Each file's source is parsed once to find its possible exits.
+    """
+    from coverage import Coverage, CoverageData
+    from coverage.exceptions import NoSource, NotPython
+
+    data = CoverageData(basename=str(data_file))
+    data.read()
+    if not data.has_arcs() or not hasattr(Coverage, "branch_stats"):
+        return None
+
+    cov = Coverage(data_file=str(data_file), config_file=False)
+    cov.load()
+
+    repo_root = str(Path(repo_path).resolve()) + os.sep if repo_path else None
+    branches = {}
+    for measured in sorted(data.measured_files()):
+        try:
+            stats = cov.branch_stats(measured)
+        except (NoSource, NotPython):
+            continue
+        branches[_relative_key(measured, repo_root)] = dict(sorted(stats.items()))
+    return branches
+
+
+def lines_to_bitmap(lines) -> bytes:
+    if not lines:
+        return b""
+    bitmap = bytearray(max(lines) // 8 + 1)
+    for line in lines:
+        bitmap[line >> 3] |= 1 << (line & 7)
+    return bytes(bitmap)
+
+
+def bitmap_to_lines(bitmap: bytes) -> list[int]:
+    return [
+        (i << 3) + bit
+        for i, byte in enumerate(bitmap) if byte
+        for bit in range(8) if byte >> bit & 1
+    ]
+
+
+def save_line_bitmaps(path, executed: dict) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    parts = [MAGIC, struct.pack("<I", len(executed))]
+    for name, lines in executed.items():
+        encoded = name.encode("utf-8")
+        bitmap = lines_to_bitmap(lines)
+        parts += [struct.pack("<I", len(encoded)), encoded, struct.pack("<I", len(bitmap)), bitmap]
+
+    with open(path, "wb") as f:
+        f.write(zlib.compress(b"".join(parts), 6))
+    return path
+
+
+def load_line_bitmaps(path) -> dict:
+    buf = zlib.decompress(Path(path).read_bytes())
+    if buf[:4] != MAGIC:
+        raise ValueError(f"Not a coverage line bitmap file: {path}")
+
+    (n_files,) = struct.unpack_from("<I", buf, 4)
+    pos = 8
+    executed = {}
+    for _ in range(n_files):
+        (name_len,) = struct.unpack_from("<I", buf, pos)
+        name = buf[pos + 4:pos + 4 + name_len].decode("utf-8")
+        pos += 4 + name_len
+        (n_bytes,) = struct.unpack_from("<I", buf, pos)
+        executed[name] = bitmap_to_lines(buf[pos + 4:pos + 4 + n_bytes])
+        pos += 4 + n_bytes
+    return executed
+
+
+def encode_branch_stats(stats: dict) -> bytes:
+    """{line: (total, taken)} -> u32 n | n x u32 line | n x u16 total | n x u16 taken."""
+    return b"".join([
+        struct.pack("<I", len(stats)),
+        array("I", stats.keys()).tobytes(),
+        array("H", (total for total, _ in stats.values())).tobytes(),
+        array("H", (taken for _, taken in stats.values())).tobytes(),
+    ])
+
+
+def decode_branch_stats(buf: bytes, pos: int = 0):
+    """Inverse of encode_branch_stats; returns (stats, position after it)."""
+    (n,) = struct.unpack_from("<I", buf, pos)
+    pos += 4
+    lines, totals, taken = array("I"), array("H"), array("H")
+    lines.frombytes(buf[pos:pos + 4 * n])
+    totals.frombytes(buf[pos + 4 * n:pos + 6 * n])
+    taken.frombytes(buf[pos + 6 * n:pos + 8 * n])
+    return dict(zip(lines, zip(totals, taken))), pos + 8 * n
+
+
+def save_branch_stats(path, branches: dict) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    parts = [BRANCH_MAGIC, struct.pack("<I", len(branches))]
+    for name, stats in branches.items():
+        encoded = name.encode("utf-8")
+        parts += [struct.pack("<I", len(encoded)), encoded, encode_branch_stats(stats)]
+
+    with open(path, "wb") as f:
+        f.write(zlib.compress(b"".join(parts), 6))
+    return path
+
+
+def load_branch_stats(path) -> dict:
+    buf = zlib.decompress(Path(path).read_bytes())
+    if buf[:4] != BRANCH_MAGIC:
+        raise ValueError(f"Not a coverage branch stats file: {path}")
+
+    (n_files,) = struct.unpack_from("<I", buf, 4)
+    pos = 8
+    branches = {}
+    for _ in range(n_files):
+        (name_len,) = struct.unpack_from("<I", buf, pos)
+        name = buf[pos + 4:pos + 4 + name_len].decode("utf-8")
+        branches[name], pos = decode_branch_stats(buf, pos + 4 + name_len)
+    return branches
@@ -0,0 +1,179 @@
+"""
+incremental_coverage.py
+(Re-runs only the tests affected by changes since the last coverage run)
+
+With COVERAGE_INCREMENTAL=1, analysis/coverage.py starts from the previous
+run's test-impact index (analysis/test_impact.py), which records the commit
+it was measured at, its per-test lines and its executed lines:
+
+  1. changed files = committed, uncommitted and untracked changes since that
+     commit, plus the files that were dirty when it was recorded
+  2. affected tests = tests whose recorded lines touch a changed source file,
+     plus every test module that changed
+  3. only those run under coverage; their fresh per-test lines replace the
+     old ones, changed files take the fresh executed lines and branch stats
+     and every other file keeps its previous ones (taken branch exits are
+     the larger of the two runs: re-run tests only repeat what they did)
+
+A full run is used instead when the index cannot be trusted: no index or no
+recorded commit, different measurement settings, changed test configuration
+(conftest.py, pyproject.toml, test helpers, ...), a changed source file that
+no recorded test executes (its import-time lines would be stale), or more
+than INCREMENTAL_MAX_FRACTION of the recorded tests affected.
+
+Stdlib only (runs under the target repo's venv).
+"""
+import json
+import os
+import subprocess
+from pathlib import Path, PurePosixPath
+
+from analysis.coverage_store import CoverageResult
+from analysis.test_impact import load_branch_stats, load_executed_lines, load_state, load_test_lines
+
+# Above this share of affected tests a full run is about as fast and simpler
+INCREMENTAL_MAX_FRACTION = float(os.getenv("INCREMENTAL_MAX_FRACTION", 0.5))
+
+CONFIG_FILES = {
+    "conftest.py", "pyproject.toml", "setup.cfg", "setup.py",
+    "tox.ini", "pytest.ini", ".coveragerc",
+}
+TEST_DIRS = {"tests", "test", "testing"}
+
+
+class StaleIndex(Exception):
+    pass
+
+
+def _git(repo_path: Path, *args) -> list[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise StaleIndex(f"git {' '.join(args)} failed: {getattr(e, 'stderr', e)}".strip())
+    return [line for line in out.stdout.splitlines() if line]
+
+
+def coverage_state(repo_path: Path, measure: str) -> dict:
+    """What a coverage run was measured against; stored in the test-impact index."""
+    try:
+        commit = _git(repo_path, "rev-parse", "HEAD")[0]
+        dirty = sorted(set(
+            _git(repo_path, "diff", "--name-only", "--relative", "HEAD")
+            + _git(repo_path, "ls-files", "--others", "--exclude-standard")
+        ))
+    except StaleIndex:
+        commit, dirty = "", []
+    return {"commit": commit, "dirty": json.dumps(dirty), "measure": measure}
+
+
+def is_test_module(path: str) -> bool:
+    name = PurePosixPath(path).name
+    return name.startswith("test_") or name.endswith("_test.py")
+
+
+def is_test_path(path: str) -> bool:
+    return is_test_module(path) or bool(TEST_DIRS & set(PurePosixPath(path).parts[:-1]))
+
+
+class IncrementalPlan:
+    """
+    Tests to re-run and how to merge their coverage into the previous run.
+    Raises StaleIndex when a full run is needed.
+    """
+
+    def __init__(self, repo_path: Path, index_file: Path, measure: str):
+        self.repo_path = Path(repo_path)
+        if not Path(index_file).exists():
+            raise StaleIndex("no previous test-impact index")
+
+        state = load_state(index_file)
+        if not state.get("commit"):
+            raise StaleIndex("previous run has no recorded commit")
+        if state.get("measure") != measure:
+            raise StaleIndex("measurement settings changed")
+
+        changed = set(
+            _git(self.repo_path, "diff", "--name-only", "--relative", state["commit"])
+            + _git(self.repo_path, "ls-files", "--others", "--exclude-standard")
+        ) | set(json.loads(state.get("dirty", "[]")))
+
+        config = sorted(f for f in changed if PurePosixPath(f).name in CONFIG_FILES)
+        if config:
+            raise StaleIndex(f"test configuration changed: {', '.join(config)}")
+
+        changed_py = {f for f in changed if f.endswith(".py")}
+        helpers = sorted(f for f in changed_py if is_test_path(f) and not is_test_module(f))
+        if helpers:
+            raise StaleIndex(f"test helpers changed: {', '.join(helpers)}")
+
+        self.previous_tests = load_test_lines(index_file)
+        self.previous_executed = load_executed_lines(index_file)
+        self.previous_branches = load_branch_stats(index_file)
+        self.changed_sources = {f for f in changed_py if not is_test_path(f)}
+        self.changed_tests = {f for f in changed_py if is_test_module(f)}
+
+        all_tests = {t for by_test in self.previous_tests.values() for t in by_test}
+        affected = set()
+        for f in sorted(self.changed_sources):
+            tests = self.previous_tests.get(f, {})
+            if not tests and f in self.previous_executed:
+                raise StaleIndex(f"no recorded test executes changed file {f}")
+            affected.update(tests)
+        if any("::" not in t for t in affected):
+            raise StaleIndex("affected tests without a pytest node ID")
+
+        # Re-run changed test modules whole; forget tests of changed or deleted modules
+        self.dropped = affected | {
+            t for t in all_tests
+            if t.split("::", 1)[0] in self.changed_tests or not (self.repo_path / t.split("::", 1)[0]).exists()
+        }
+        self.targets = sorted(
+            {t for t in affected if t.split("::", 1)[0] not in self.changed_tests}
+            | {f for f in self.changed_tests if (self.repo_path / f).exists()}
+        )
+
+        if all_tests and len(self.dropped) > INCREMENTAL_MAX_FRACTION * len(all_tests):
+            raise StaleIndex(f"{len(self.dropped)} of {len(all_tests)} recorded tests affected")
+
+        print(f"[INFO] Incremental coverage since {state['commit'][:12]}: "
+              f"{len(self.changed_sources)} changed source files, {len(self.changed_tests)} changed test modules, "
+              f"{len(self.targets)} test targets to re-run (of {len(all_tests)} recorded tests)")
+
+    def merge(self, fresh: CoverageResult = None) -> CoverageResult:
+        """Folds a re-run's result into the previous run's (None: nothing re-ran)."""
+        fresh = fresh or CoverageResult({}, {}, {})
+
+        merged_tests = {}
+        for f, by_test in self.previous_tests.items():
+            if f in self.changed_sources:
+                continue
+            kept = {t: lines for t, lines in by_test.items() if t not in self.dropped}
+            if kept:
+                merged_tests[f] = kept
+        for f, by_test in (fresh.test_lines or {}).items():
+            merged_tests.setdefault(f, {}).update(by_test)
+
+        merged_executed = {}
+        for f in sorted(set(self.previous_executed) | set(fresh.executed)):
+            if f in self.changed_sources:
+                lines = fresh.executed.get(f)
+            else:
+                lines = sorted(set(self.previous_executed.get(f, ())) | set(fresh.executed.get(f, ())))
+            if lines is not None and (self.repo_path / f).exists():
+                merged_executed[f] = lines
+
+        merged_branches = None
+        if fresh.branches is not None:
+            merged_branches = {}
+            for f in sorted(set(self.previous_branches) | set(fresh.branches)):
+                if f in self.changed_sources:
+                    stats = fresh.branches.get(f)
+                else:
+                    stats = dict(self.previous_branches.get(f, {}))
+                    for line, (total, taken) in fresh.branches.get(f, {}).items():
+                        stats[line] = (total, max(taken, stats.get(line, (0, 0))[1]))
+                    stats = dict(sorted(stats.items()))
+                if stats is not None and (self.repo_path / f).exists():
+                    merged_branches[f] = stats
+
+        return CoverageResult(merged_executed, merged_tests, merged_branches)
@@ -0,0 +1,119 @@
+"""
+parallel_coverage.py
+(Runs analysis/coverage.py for several repos at once)
+
+Usage:
+    python -m analysis.parallel_coverage [repo ...] [-w 3] [--timeout 1800] [--log-dir DIR]
+
+Each repo already has its own venv under VENVS_DIR, so coverage runs are
+independent subprocesses. Up to --workers of them run concurrently, each
+with its own timeout, and each repo's stdout/stderr goes to
+<log-dir>/<repo>.log instead of interleaving on the console. The summary
+prints the wall-clock time next to the sum of the per-repo times. Those were
+measured while the repos competed for CPU and disk, so the sum is only an
+upper bound on a serial run; `-w 1` measures the real serial time.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ci.profiling import profiled_command
+from config.paths import COVERAGE_LOGS_DIR, PROJECT_ROOT, TARGET_REPOS_DIR
+
+DEFAULT_WORKERS = int(os.getenv("COVERAGE_WORKERS", 0)) or None
+DEFAULT_TIMEOUT = float(os.getenv("COVERAGE_TIMEOUT", 1800))
+
+# Exit codes of analysis/coverage.py
+STATUS_BY_EXIT_CODE = {0: "ok", 2: "failed"}
+
+
+def coverage_command(repo_name: str) -> list[str]:
+    return [sys.executable, "-m", "analysis.coverage", repo_name]
+
+
+def run_repo_coverage(repo_name: str, log_dir: Path, timeout: float = DEFAULT_TIMEOUT, profile=None) -> dict:
+    """Runs one repo's coverage step; never raises, the outcome is in the result."""
+    log_path = log_dir / f"{repo_name}.log"
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(PROJECT_ROOT)
+
+    t0 = time.perf_counter()
+    with open(log_path, "w") as log:
+        # New session: a timeout kills pytest and coverage grandchildren too
+        proc = subprocess.Popen(
+            profiled_command(coverage_command(repo_name), f"analysis.coverage-{repo_name}", profile),
+            cwd=PROJECT_ROOT, env=env,
+            stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        try:
+            returncode = proc.wait(timeout=timeout)
+            status = STATUS_BY_EXIT_CODE.get(returncode, "failed")
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            returncode = proc.wait()
+            status = "timeout"
+            log.write(f"\n[TIMEOUT] coverage for {repo_name} exceeded {timeout:.0f}s\n")
+
+    return {
+        "repo": repo_name,
+        "status": status,
+        "returncode": returncode,
+        "elapsed_s": time.perf_counter() - t0,
+        "log": log_path,
+    }
+
+
+def run_all(repo_names, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, log_dir=COVERAGE_LOGS_DIR,
+            profile=None) -> list[dict]:
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or min(len(repo_names), os.cpu_count() or 1) or 1
+
+    print(f"🔍 Coverage for {len(repo_names)} repos, {workers} at a time (timeout {timeout:.0f}s, logs in {log_dir})")
+
+    def run(repo_name):
+        result = run_repo_coverage(repo_name, log_dir, timeout, profile)
+        icon = "✅" if result["status"] == "ok" else "❌"
+        print(f"  {icon} {repo_name:<20} {result['status']:<8} {result['elapsed_s']:7.1f}s  → {result['log']}")
+        return result
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, repo_names))
+    wall = time.perf_counter() - t0
+
+    if workers == 1:
+        print(f"⏱️  Wall clock {wall:.1f}s (serial)")
+    else:
+        # Per-repo times include the contention between concurrent runs
+        summed = sum(r["elapsed_s"] for r in results)
+        print(f"⏱️  Wall clock {wall:.1f}s; per-repo times sum to {summed:.1f}s, "
+              f"an upper bound on a serial run (measure it with -w 1)")
+    return results
+
+
+def discover_repos(root: Path = TARGET_REPOS_DIR) -> list[str]:
+    return sorted(p.name for p in root.iterdir() if p.is_dir())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect coverage for several repos concurrently.")
+    parser.add_argument("repos", nargs="*", help=f"Repo names (default: every directory in {TARGET_REPOS_DIR})")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent coverage runs (default: COVERAGE_WORKERS or min(repos, CPUs))")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Per-repo timeout in seconds (default: COVERAGE_TIMEOUT or {DEFAULT_TIMEOUT:.0f})")
+    parser.add_argument("--log-dir", type=Path, default=COVERAGE_LOGS_DIR)
+    args = parser.parse_args(argv)
+
+    results = run_all(args.repos or discover_repos(), args.workers, args.timeout, args.log_dir)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
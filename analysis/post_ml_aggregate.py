@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import os
 
-from analysis.risk import classify_risk
-from recommendations.rules import recommend_tests
+from analysis.risk import classify_risk_series, risk_score_series
+from analysis.coverage_store import BRANCHES_SUFFIX, LINES_SUFFIX, load_branch_stats, load_line_bitmaps
+from analysis.test_impact import TEST_IMPACT_NAME, load_test_lines, save_function_index
+from ci.instrumentation import span
+from config.artifacts import artifact_exists, artifact_path, read_table, write_table
+from recommendations.rules import recommend_tests_series
 
 # ---------------------------------------------------------
 # Paths
@@ -26,7 +31,7 @@ else:
     OUTPUT_FULL = PROCESSED_DIR / "final_results.csv"
     OUTPUT_TOPK = PROCESSED_DIR / "final_results_topk.csv"
 
-TOP_K = 30
+TOP_K = int(os.getenv("TOP_K", 30))
 
 
 # ---------------------------------------------------------
@@ -45,23 +50,84 @@ def extract_repo_and_file(file_path: str):
     return repo, str(relative)
 
 
+def coverage_base(repo_name: str) -> Path:
+    if CI_MODE:
+        return CI_WORKSPACE / "coverage" / "coverage"
+    return DATA_DIR / f"{repo_name}_coverage"
+
+
 def load_coverage(repo_name: str) -> dict:
+    """
+    Covered file -> executed lines for a repo. Reads the line bitmaps written
+    by analysis/coverage.py; falls back to a legacy coverage JSON report.
+    """
+    base = coverage_base(repo_name)
+    bitmap_file = base.parent / f"{base.name}{LINES_SUFFIX}"
+    if bitmap_file.exists():
+        return load_line_bitmaps(bitmap_file)
+
+    json_file = base.with_suffix(".json")
+    if not json_file.exists():
+        return {}
+    with open(json_file) as f:
+        return {
+            covered_file: data.get("executed_lines", [])
+            for covered_file, data in json.load(f).get("files", {}).items()
+        }
+
+
+def load_branches(repo_name: str):
+    """Covered file -> {branch line: (total, taken)}, or None without branch data."""
+    base = coverage_base(repo_name)
+    branches_file = base.parent / f"{base.name}{BRANCHES_SUFFIX}"
+    return load_branch_stats(branches_file) if branches_file.exists() else None
+
+
+def test_impact_file(repo_name: str) -> Path:
     if CI_MODE:
-        cov_file = CI_WORKSPACE / "coverage" / "coverage.json"
-        if not cov_file.exists():
-            return {}
-        with open(cov_file) as f:
-            return json.load(f).get("files", {})
-    else:
-        coverage_file = DATA_DIR / f"{repo_name}_coverage.json"
-        if not coverage_file.exists():
-            return {}
-        with open(coverage_file) as f:
-            return json.load(f).get("files", {})
+        return CI_WORKSPACE / "coverage" / TEST_IMPACT_NAME
+    return DATA_DIR / f"{repo_name}_{TEST_IMPACT_NAME}"
+
+
+def build_coverage_index(coverage_files: dict) -> dict:
+    """
+    Normalized covered-file path -> sorted NumPy array of executed lines.
+    Built once per repo; key order follows the coverage report.
+    """
+    return {
+        covered_file.replace("\\", "/"): np.unique(np.asarray(lines, dtype=np.int64))
+        for covered_file, lines in coverage_files.items()
+    }
+
+
+def match_coverage_file(file_path: str, coverage_index: dict):
+    """
+    Coverage key for a function's file_path. Coverage keys are usually
+    repo-relative while CI File_Paths are absolute, so suffixes are matched
+    both ways.
+    """
+    file_path = file_path.replace("\\", "/")
+    if file_path in coverage_index:
+        return file_path
+    for covered_file in coverage_index:
+        if covered_file.endswith(file_path):
+            return covered_file
+    for covered_file in coverage_index:
+        if file_path.endswith("/" + covered_file):
+            return covered_file
+    return None
+
 
+def count_covered_lines(executed: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Executed lines inside each [start, end] interval, via binary search on
+    the sorted executed-line array.
+    """
+    covered = np.searchsorted(executed, ends, side="right") - np.searchsorted(executed, starts, side="left")
+    return np.maximum(covered, 0)
 
-def compute_function_coverage(row, coverage_files) -> float:
-    file_path = row["file_path"]
+
+def compute_function_coverage(row, coverage_index) -> float:
     start = int(row["start_line"])
     end = int(row["end_line"])
 
@@ -69,15 +135,133 @@ def compute_function_coverage(row, coverage_files) -> float:
         return 0.0
 
     total_lines = end - start + 1
-    executed = set()
-
-    for covered_file, data in coverage_files.items():
-        if covered_file.endswith(file_path):
-            executed_lines = set(data.get("executed_lines", []))
-            executed = executed_lines.intersection(range(start, end + 1))
-            break
+    covered_file = match_coverage_file(row["file_path"], coverage_index)
+    if covered_file is None:
+        return 0.0
 
-    return round((len(executed) / total_lines) * 100, 2) if total_lines else 0.0
+    covered = count_covered_lines(coverage_index[covered_file], np.array([start]), np.array([end]))[0]
+    return round((covered / total_lines) * 100, 2) if total_lines else 0.0
+
+
+def compute_coverage_percent(df: pd.DataFrame, coverage_indexes: dict) -> pd.Series:
+    """
+    Columnar version of compute_function_coverage: one interval join per
+    (repo, file) group instead of a scan of the coverage report per row.
+    """
+    starts = df["start_line"].to_numpy(dtype=np.int64)
+    ends = df["end_line"].to_numpy(dtype=np.int64)
+    covered = np.zeros(len(df), dtype=np.int64)
+
+    groups = df.groupby(["repo_name", "file_path"], sort=False).indices
+    for (repo, file_path), idx in groups.items():
+        coverage_index = coverage_indexes.get(repo, {})
+        covered_file = match_coverage_file(file_path, coverage_index)
+        if covered_file is None:
+            continue
+        covered[idx] = count_covered_lines(coverage_index[covered_file], starts[idx], ends[idx])
+
+    total_lines = ends - starts + 1
+    # Python round() keeps results identical to the per-row computation
+    percent = [
+        round((c / t) * 100, 2) if t > 0 else 0.0
+        for c, t in zip(covered.tolist(), total_lines.tolist())
+    ]
+    return pd.Series(percent, index=df.index, dtype=float)
+
+
+def compute_function_tests(df: pd.DataFrame, test_lines: dict) -> list[list[str]]:
+    """
+    Tests executing at least one line of each function, aligned with df's
+    rows. test_lines maps covered file -> {test ID -> executed lines}; the
+    same interval join as compute_coverage_percent is run once per test.
+    """
+    starts = df["start_line"].to_numpy(dtype=np.int64)
+    ends = df["end_line"].to_numpy(dtype=np.int64)
+    tests = [[] for _ in range(len(df))]
+
+    test_indexes = {f: build_coverage_index(by_test) for f, by_test in test_lines.items()}
+    for file_path, idx in df.groupby("file_path", sort=False).indices.items():
+        covered_file = match_coverage_file(file_path, test_indexes)
+        if covered_file is None:
+            continue
+        for test_id, executed in test_indexes[covered_file].items():
+            for i in idx[count_covered_lines(executed, starts[idx], ends[idx]) > 0]:
+                tests[i].append(test_id)
+    return [sorted(t) for t in tests]
+
+
+def update_test_impact(df: pd.DataFrame, index_file: Path, test_lines: dict = None):
+    """
+    Stores the function -> test mapping of one repo's results in its
+    test-impact index (written by analysis/coverage.py with COVERAGE_CONTEXTS=1).
+    """
+    if test_lines is None:
+        if not index_file.exists():
+            return
+        test_lines = load_test_lines(index_file)
+
+    function_tests = compute_function_tests(df, test_lines)
+    records = zip(
+        df["file_path"], df["method_name"], df["start_line"], df["end_line"],
+        df["risk_category"].astype(str), function_tests,
+    )
+    tested = save_function_index(index_file, records)
+
+    risky = df["risk_category"].isin(["Hidden Risk", "Refactor Candidate"]).to_numpy()
+    selected = {t for tests, r in zip(function_tests, risky) if r for t in tests}
+    print(f"[OK] Test-impact index: {tested}/{len(df)} functions executed by tests; "
+          f"{len(selected)} tests cover Hidden Risk / Refactor Candidate functions → {index_file}")
+
+
+def build_branch_index(branch_stats: dict) -> dict:
+    """
+    Normalized covered-file path -> (sorted branch lines, prefix sums of
+    possible exits, prefix sums of taken exits), so any line interval's
+    totals are two binary searches and two subtractions.
+    """
+    index = {}
+    for covered_file, stats in branch_stats.items():
+        lines = np.fromiter(stats.keys(), dtype=np.int64, count=len(stats))
+        exits = np.array(list(stats.values()), dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(lines, kind="stable")
+        cumulative = np.zeros((len(lines) + 1, 2), dtype=np.int64)
+        np.cumsum(exits[order], axis=0, out=cumulative[1:])
+        index[covered_file.replace("\\", "/")] = (lines[order], cumulative[:, 0], cumulative[:, 1])
+    return index
+
+
+def compute_branch_coverage(df: pd.DataFrame, branch_indexes: dict) -> pd.DataFrame:
+    """
+    Per-function branch exits (possible / taken / missing) and branch
+    percentage, with the same per-(repo, file) interval join as
+    compute_coverage_percent. branch_percent is NaN for functions without
+    branches or branch data.
+    """
+    starts = df["start_line"].to_numpy(dtype=np.int64)
+    ends = df["end_line"].to_numpy(dtype=np.int64)
+    total = np.zeros(len(df), dtype=np.int64)
+    taken = np.zeros(len(df), dtype=np.int64)
+
+    groups = df.groupby(["repo_name", "file_path"], sort=False).indices
+    for (repo, file_path), idx in groups.items():
+        branch_index = branch_indexes.get(repo) or {}
+        covered_file = match_coverage_file(file_path, branch_index)
+        if covered_file is None:
+            continue
+        lines, cum_total, cum_taken = branch_index[covered_file]
+        lo = np.searchsorted(lines, starts[idx], side="left")
+        hi = np.searchsorted(lines, ends[idx], side="right")
+        total[idx] = cum_total[hi] - cum_total[lo]
+        taken[idx] = cum_taken[hi] - cum_taken[lo]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(total > 0, np.round(taken / total * 100, 2), np.nan)
+    return pd.DataFrame({
+        "branches_total": total,
+        "branches_covered": taken,
+        "missing_branches": total - taken,
+        "branch_percent": percent,
+    }, index=df.index)
 
 
 def coverage_bucket(p: float) -> str:
@@ -90,15 +274,29 @@ def coverage_bucket(p: float) -> str:
     return "HIGH"
 
 
-# ---------------------------------------------------------
-# Main
-# ---------------------------------------------------------
-def main():
-    if not INPUT_CSV.exists():
-        raise FileNotFoundError(INPUT_CSV)
+def coverage_bucket_series(percent: pd.Series) -> pd.Series:
+    """
+    Columnar coverage_bucket.
+    """
+    p = percent.to_numpy(dtype=float)
+    buckets = np.select([p == 0, p <= 30, p <= 70], ["ZERO", "LOW", "MEDIUM"], default="HIGH")
+    return pd.Series(buckets, index=percent.index, dtype=object)
 
-    df = pd.read_csv(INPUT_CSV)
 
+# ---------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------
+def aggregate(df: pd.DataFrame, coverage: dict = None, repo_name: str = None, branches: dict = None) -> pd.DataFrame:
+    """
+    Joins ML predictions with coverage, risk and recommendations.
+
+    coverage maps repo name -> {covered file: executed lines}; repos missing
+    from it are read from disk with load_coverage. branches likewise maps
+    repo name -> branch stats (None: not collected), falling back to
+    load_branches; branch columns are only added when some repo has them.
+    repo_name overrides the repo derived from File_Path (CI mode analyzes a
+    single repo).
+    """
     # ---------------- Normalize schema ----------------
     if "CC" in df.columns and "cc" not in df.columns:
         df = df.rename(columns={"CC": "cc"})
@@ -108,8 +306,9 @@ def main():
         df = df.rename(columns={"Method_Name": "method_name"})
 
     # ---------------- Repo handling ----------------
-    if CI_MODE:
+    if repo_name is None and CI_MODE:
         repo_name = Path(os.getenv("TARGET_REPO")).name
+    if repo_name is not None:
         df["repo_name"] = repo_name
     else:
         extracted = df["file_path"].apply(extract_repo_and_file)
@@ -117,54 +316,79 @@ def main():
         df["file_path"] = extracted.apply(lambda x: x[1])
 
     # ---------------- Coverage ----------------
-    coverage_cache = {
-        repo: load_coverage(repo)
+    with span("coverage_join"):
+        coverage = coverage or {}
+        coverage_cache = {
+            repo: build_coverage_index(coverage[repo] if repo in coverage else load_coverage(repo))
+            for repo in df["repo_name"].unique()
+        }
+
+        df["coverage_percent"] = compute_coverage_percent(df, coverage_cache)
+        df["coverage_bucket"] = coverage_bucket_series(df["coverage_percent"])
+
+    # ---------------- Branch coverage ----------------
+    branches = branches or {}
+    branch_cache = {
+        repo: branches[repo] if repo in branches else load_branches(repo)
         for repo in df["repo_name"].unique()
     }
-
-    df["coverage_percent"] = df.apply(
-        lambda r: compute_function_coverage(
-            r, coverage_cache.get(r["repo_name"], {})
-        ),
-        axis=1,
-    )
-    df["coverage_bucket"] = df["coverage_percent"].apply(coverage_bucket)
+    branch_percent = None
+    if any(stats is not None for stats in branch_cache.values()):
+        with span("branch_join"):
+            branch_indexes = {repo: build_branch_index(stats or {}) for repo, stats in branch_cache.items()}
+            branch_cols = compute_branch_coverage(df, branch_indexes)
+            df[list(branch_cols.columns)] = branch_cols
+            branch_percent = df["branch_percent"]
 
     # ---------------- Risk ----------------
-    df["risk_category"] = df.apply(
-        lambda r: classify_risk(r["smell_label"], r["coverage_bucket"]),
-        axis=1,
-    )
+    df["risk_category"] = classify_risk_series(df["smell_label"], df["coverage_bucket"], branch_percent)
+    df["risk_score"] = risk_score_series(df)
 
     # ---------------- Recommendations ----------------
-    df["recommendations"] = df.apply(
-        lambda r: "; ".join(
-            recommend_tests(
-                {
-                    "risk_category": r["risk_category"],
-                    "coverage_bucket": r["coverage_bucket"],
-                    "cc": r.get("cc", 0),
-                    "lloc": r.get("lloc", 0),
-                    "difficulty": r.get("difficulty", 0),
-                }
-            )
-        ),
-        axis=1,
-    )
+    with span("recommendations"):
+        df["recommendations"] = recommend_tests_series(df)
+    return df
 
-    # ---------------- Final Output ----------------
-    OUTPUT_FULL.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(OUTPUT_FULL, index=False)
-    print(f"[OK] Full results written to {OUTPUT_FULL}")
 
+def select_top_k(df: pd.DataFrame, k: int = TOP_K) -> pd.DataFrame:
+    """
+    The k smelly functions with the highest risk_score (lloc breaks ties).
+    nlargest does a partial selection, O(n log k) instead of a full sort.
+    """
     df_hr = df[df["smell_label"] == "HIGH"]
     if df_hr.empty:
+        return df_hr
+    if "risk_score" not in df_hr.columns:
+        df_hr = df_hr.assign(risk_score=risk_score_series(df_hr))
+    return df_hr.nlargest(k, ["risk_score", "lloc"])
+
+
+def write_outputs(df: pd.DataFrame, df_topk: pd.DataFrame, output_full=OUTPUT_FULL, output_topk=OUTPUT_TOPK, fmt=None):
+    written = write_table(df, output_full, fmt)
+    print(f"[OK] Full results written to {written}")
+
+    # Always overwrite TOP-K so a previous run's results never linger
+    written = write_table(df_topk, output_topk, fmt)
+    if df_topk.empty:
         print("[WARN] No HIGH risk functions found")
-        return
+    else:
+        print(f"[OK] TOP-{TOP_K} results written to {written}")
+
+
+# ---------------------------------------------------------
+# Main
+# ---------------------------------------------------------
+def main(fmt=None):
+    if not artifact_exists(INPUT_CSV, fmt):
+        raise FileNotFoundError(artifact_path(INPUT_CSV, fmt))
+
+    with span("post_ml_aggregate"):
+        df = aggregate(read_table(INPUT_CSV, fmt))
+        with span("write", rows=len(df)):
+            write_outputs(df, select_top_k(df), fmt=fmt)
 
-    df_topk = df_hr.sort_values(by="lloc", ascending=False).head(TOP_K)
-    df_topk.to_csv(OUTPUT_TOPK, index=False)
-    print(f"[OK] TOP-{TOP_K} results written to {OUTPUT_TOPK}")
+        for repo, df_repo in df.groupby("repo_name", sort=False):
+            update_test_impact(df_repo, test_impact_file(repo))
 
 
 if __name__ == "__main__":
@@ -1,13 +1,31 @@
-def classify_risk(smell_label: str, coverage_bucket: str) -> str:
+import math
+
+import numpy as np
+import pandas as pd
+
+from config.scoring import RISK_WEIGHTS
+
+# Smelly code whose lines are covered but fewer than this % of branch exits
+# were taken is still a Hidden Risk: the untested paths are the risky ones.
+BRANCH_RISK_THRESHOLD = 50.0
+
+
+def classify_risk(smell_label: str, coverage_bucket: str, branch_percent: float = None) -> str:
     """
     smell_label: 'HIGH' or 'LOW'
     coverage_bucket: 'ZERO', 'LOW', 'MEDIUM', 'HIGH'
+    branch_percent: taken branch exits in %, None/NaN without branch data
     """
 
     smell_label = smell_label.upper()
     coverage_bucket = coverage_bucket.upper()
+    low_branches = (
+        branch_percent is not None
+        and not math.isnan(branch_percent)
+        and branch_percent < BRANCH_RISK_THRESHOLD
+    )
 
-    if smell_label == "HIGH" and coverage_bucket in ("ZERO", "LOW"):
+    if smell_label == "HIGH" and (coverage_bucket in ("ZERO", "LOW") or low_branches):
         return "Hidden Risk"
 
     if smell_label == "HIGH" and coverage_bucket in ("MEDIUM", "HIGH"):
@@ -17,3 +35,65 @@ def classify_risk(smell_label: str, coverage_bucket: str) -> str:
         return "Low Value"
 
     return "Safe Zone"
+
+
+def classify_risk_series(smell_label, coverage_bucket, branch_percent=None):
+    """
+    Columnar classify_risk: same rules applied to whole Series at once.
+    Returns a Series of risk categories aligned with smell_label.
+    """
+    smell = smell_label.astype(str).str.upper().to_numpy()
+    bucket = coverage_bucket.astype(str).str.upper().to_numpy()
+
+    high_smell = smell == "HIGH"
+    low_smell = smell == "LOW"
+    low_cov = np.isin(bucket, ("ZERO", "LOW"))
+    high_cov = np.isin(bucket, ("MEDIUM", "HIGH"))
+    if branch_percent is not None:
+        # NaN (no branches / no data) compares False
+        low_cov_or_branches = low_cov | (pd.to_numeric(branch_percent).to_numpy(dtype=float) < BRANCH_RISK_THRESHOLD)
+    else:
+        low_cov_or_branches = low_cov
+
+    categories = np.select(
+        [high_smell & low_cov_or_branches, high_smell & high_cov, low_smell & low_cov],
+        ["Hidden Risk", "Refactor Candidate", "Low Value"],
+        default="Safe Zone",
+    )
+    return pd.Series(categories, index=smell_label.index, dtype=object)
+
+
+# ---------- Risk score ----------
+
+def risk_terms(df: pd.DataFrame) -> dict:
+    """
+    Positive per-function factors of the risk score (see config/scoring.py).
+    Count-like terms are shifted by one so a zero never wipes out the others.
+    """
+    def numeric(name, default=0.0):
+        if name not in df.columns:
+            return np.full(len(df), default)
+        return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+    total_lines = np.maximum(numeric("end_line") - numeric("start_line") + 1, 0)
+    uncovered = np.round(total_lines * (1 - numeric("coverage_percent") / 100))
+    return {
+        "ml_confidence": np.clip(numeric("ml_confidence"), 1e-4, 1.0),
+        "uncovered_lines": np.maximum(uncovered, 0) + 1,
+        "cc": np.maximum(numeric("cc", 1.0), 1.0),
+        "missing_branches": np.maximum(numeric("missing_branches"), 0) + 1,
+    }
+
+
+def risk_score_series(df: pd.DataFrame, weights: dict = None) -> pd.Series:
+    """
+    Weighted product of risk_terms, computed as a sum of logs over whole
+    columns. Higher means riskier to leave untested.
+    """
+    weights = RISK_WEIGHTS if weights is None else weights
+    terms = risk_terms(df)
+    log_score = np.zeros(len(df))
+    for name, weight in weights.items():
+        if weight:
+            log_score += weight * np.log(terms[name])
+    return pd.Series(np.round(np.exp(log_score), 4), index=df.index, dtype=float)
@@ -0,0 +1,287 @@
+"""
+test_impact.py
+(Per-test coverage and a function -> test-ID index)
+
+Usage:
+    python -m analysis.test_impact <index.sqlite> [--risk "Hidden Risk" ...] [--file path ...]
+
+With COVERAGE_CONTEXTS=1, analysis/coverage.py runs pytest under coverage's
+`dynamic_context = test_function`, so every executed line is tagged with the
+test that ran it. Those per-test lines are stored in an SQLite index next to
+the coverage bitmaps (data/<repo>_test_impact.sqlite, or
+ci_workspace/coverage/test_impact.sqlite in CI); post_ml_aggregate then adds
+which tests execute each analyzed function and its risk category.
+
+The CLI prints the pytest node IDs covering the selected functions, one per
+line, e.g. `pytest $(python -m analysis.test_impact <index>)` runs only the
+tests touching Hidden Risk / Refactor Candidate code.
+
+Stdlib only: the per-test lines are read under the target repo's venv.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from analysis.coverage_store import bitmap_to_lines, decode_branch_stats, encode_branch_stats, lines_to_bitmap
+from ml.discovery import discover_relative
+
+TEST_IMPACT_NAME = "test_impact.sqlite"
+DEFAULT_RISK_CATEGORIES = ("Hidden Risk", "Refactor Candidate")
+
+_SCHEMA = """
+CREATE TABLE tests (
+    id      INTEGER PRIMARY KEY,
+    test_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE test_lines (
+    file  TEXT NOT NULL,
+    test  INTEGER NOT NULL REFERENCES tests(id),
+    lines BLOB NOT NULL,
+    PRIMARY KEY (file, test)
+);
+CREATE TABLE functions (
+    id            INTEGER PRIMARY KEY,
+    file_path     TEXT NOT NULL,
+    method_name   TEXT NOT NULL,
+    start_line    INTEGER NOT NULL,
+    end_line      INTEGER NOT NULL,
+    risk_category TEXT
+);
+CREATE TABLE function_tests (
+    function INTEGER NOT NULL REFERENCES functions(id),
+    test     INTEGER NOT NULL REFERENCES tests(id),
+    PRIMARY KEY (function, test)
+);
+CREATE TABLE file_lines (
+    file  TEXT PRIMARY KEY,
+    lines BLOB NOT NULL
+);
+CREATE TABLE file_branches (
+    file  TEXT PRIMARY KEY,
+    stats BLOB NOT NULL
+);
+CREATE TABLE state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# ---------- Reading per-test coverage ----------
+
+def index_python_files(repo_path: Path) -> dict:
+    """File name -> repo-relative paths of every .py file, tests included."""
+    by_name = {}
+    for rel in discover_relative(repo_path, profile="all"):
+        by_name.setdefault(rel.rsplit("/", 1)[-1], []).append(rel)
+    return by_name
+
+
+def context_to_test_id(context: str, py_files: dict) -> str:
+    """
+    coverage's test_function context ("tests.test_core.TestX.test_y") as a
+    pytest node ID ("tests/test_core.py::TestX::test_y"). The longest dotted
+    prefix naming a repo file is the module; pytest's rootdir-relative
+    imports drop leading directories, so the module may match a path suffix.
+    """
+    parts = context.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        module = "/".join(parts[:i]) + ".py"
+        matches = [f for f in py_files.get(parts[i - 1] + ".py", ()) if f == module or f.endswith("/" + module)]
+        if matches:
+            return "::".join([min(matches, key=len), *parts[i:]])
+    return context
+
+
+def read_test_lines(data_file, repo_path) -> dict:
+    """
+    Measured file -> {pytest node ID -> sorted executed lines}. Lines run
+    outside any test (imports, collection) carry the empty context and are
+    left out.
+    """
+    from coverage import CoverageData
+
+    data = CoverageData(basename=str(data_file))
+    data.read()
+
+    repo_path = Path(repo_path).resolve()
+    repo_root = str(repo_path) + os.sep
+    py_files = index_python_files(repo_path)
+    test_ids = {}
+    test_lines = {}
+    for measured in sorted(data.measured_files()):
+        key = measured[len(repo_root):] if measured.startswith(repo_root) else measured
+        by_test = {}
+        for line, contexts in (data.contexts_by_lineno(measured) or {}).items():
+            if line <= 0:
+                continue
+            for context in contexts:
+                if not context:
+                    continue
+                if context not in test_ids:
+                    test_ids[context] = context_to_test_id(context, py_files)
+                by_test.setdefault(test_ids[context], []).append(line)
+        if by_test:
+            test_lines[key.replace("\\", "/")] = {t: sorted(lines) for t, lines in by_test.items()}
+    return test_lines
+
+
+# ---------- Index storage ----------
+
+def _connect(path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def save_test_lines(path, test_lines: dict, executed: dict = None, state: dict = None, branches: dict = None) -> Path:
+    """
+    Writes a fresh index holding the per-test lines, optionally the run's
+    executed lines, branch stats and state (see
+    analysis/incremental_coverage.py); any function index is dropped.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+
+    with _connect(path) as conn:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT INTO file_lines VALUES (?, ?)",
+            [(file, lines_to_bitmap(lines)) for file, lines in (executed or {}).items()],
+        )
+        conn.executemany(
+            "INSERT INTO file_branches VALUES (?, ?)",
+            [(file, encode_branch_stats(stats)) for file, stats in (branches or {}).items()],
+        )
+        conn.executemany("INSERT INTO state VALUES (?, ?)", (state or {}).items())
+        ids = {}
+        for file, by_test in test_lines.items():
+            for test_id, lines in by_test.items():
+                if test_id not in ids:
+                    ids[test_id] = conn.execute("INSERT INTO tests (test_id) VALUES (?)", (test_id,)).lastrowid
+                conn.execute(
+                    "INSERT INTO test_lines VALUES (?, ?, ?)",
+                    (file, ids[test_id], lines_to_bitmap(lines)),
+                )
+    conn.close()
+    return path
+
+
+def load_test_lines(path) -> dict:
+    """Inverse of save_test_lines: file -> {test ID -> sorted lines}."""
+    conn = _connect(path)
+    rows = conn.execute(
+        "SELECT l.file, t.test_id, l.lines FROM test_lines l JOIN tests t ON t.id = l.test"
+    ).fetchall()
+    conn.close()
+
+    test_lines = {}
+    for file, test_id, bitmap in rows:
+        test_lines.setdefault(file, {})[test_id] = bitmap_to_lines(bitmap)
+    return test_lines
+
+
+def load_executed_lines(path) -> dict:
+    conn = _connect(path)
+    rows = conn.execute("SELECT file, lines FROM file_lines").fetchall()
+    conn.close()
+    return {file: bitmap_to_lines(bitmap) for file, bitmap in rows}
+
+
+def load_branch_stats(path) -> dict:
+    conn = _connect(path)
+    rows = conn.execute("SELECT file, stats FROM file_branches").fetchall()
+    conn.close()
+    return {file: decode_branch_stats(stats)[0] for file, stats in rows}
+
+
+def load_state(path) -> dict:
+    conn = _connect(path)
+    try:
+        return dict(conn.execute("SELECT key, value FROM state"))
+    except sqlite3.OperationalError:  # index written before run state was stored
+        return {}
+    finally:
+        conn.close()
+
+
+def save_function_index(path, functions) -> int:
+    """
+    Replaces the function -> test mapping. `functions` yields
+    (file_path, method_name, start_line, end_line, risk_category, test_ids).
+    Returns the number of functions executed by at least one test.
+    """
+    conn = _connect(path)
+    with conn:
+        conn.execute("DELETE FROM function_tests")
+        conn.execute("DELETE FROM functions")
+        ids = dict(conn.execute("SELECT test_id, id FROM tests"))
+
+        tested = 0
+        for file_path, method_name, start, end, risk, test_ids in functions:
+            function = conn.execute(
+                "INSERT INTO functions (file_path, method_name, start_line, end_line, risk_category) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (file_path, method_name, int(start), int(end), risk),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO function_tests VALUES (?, ?)",
+                [(function, ids[t]) for t in test_ids],
+            )
+            tested += bool(test_ids)
+    conn.close()
+    return tested
+
+
+def select_tests(path, risk_categories=DEFAULT_RISK_CATEGORIES, files=None) -> list[str]:
+    """
+    Sorted node IDs of the tests executing any indexed function in
+    `risk_categories` (all categories if empty), optionally limited to
+    functions whose file_path ends with one of `files`.
+    """
+    query = (
+        "SELECT DISTINCT t.test_id, f.file_path FROM functions f "
+        "JOIN function_tests ft ON ft.function = f.id "
+        "JOIN tests t ON t.id = ft.test"
+    )
+    params = list(risk_categories or ())
+    if params:
+        query += f" WHERE f.risk_category IN ({', '.join('?' * len(params))})"
+
+    conn = _connect(path)
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+
+    files = [f.replace("\\", "/") for f in files or ()]
+    return sorted({
+        test_id for test_id, file_path in rows
+        if not files or any(file_path.endswith(f) or f.endswith(file_path) for f in files)
+    })
+
+
+# ---------- CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the tests that execute functions of the given risk categories.")
+    parser.add_argument("index", type=Path, help="Test-impact index (*test_impact.sqlite)")
+    parser.add_argument("--risk", nargs="*", default=list(DEFAULT_RISK_CATEGORIES),
+                        help="Risk categories to select (default: Hidden Risk, Refactor Candidate; empty = all)")
+    parser.add_argument("--file", nargs="+", default=None, help="Only functions in these files")
+    args = parser.parse_args(argv)
+
+    if not args.index.exists():
+        print(f"❌ Test-impact index not found: {args.index}", file=sys.stderr)
+        return 1
+
+    tests = select_tests(args.index, args.risk, args.file)
+    print(f"🧪 {len(tests)} tests selected", file=sys.stderr)
+    for test_id in tests:
+        print(test_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+pipeline_benchmark.py
+(Measures how each pipeline stage scales on synthetic repositories)
+
+Usage:
+    python -m benchmarks.pipeline_benchmark [--sizes 1000 10000 100000 1000000]
+        [--stages metrics inference aggregate reporting] [--output results.json]
+        [--compare previous.json]
+
+For every size a synthetic repo plus coverage JSON is generated
+(benchmarks/synthetic_repo.py), then the stages run in pipeline order, each in
+a fresh interpreter so its peak RSS is its own:
+  - metrics:   file discovery + per-function metrics (build_validation_dataset)
+  - inference: ml.inference.run_inference on the metrics CSV
+  - aggregate: coverage JSON load + post_ml_aggregate (coverage, branches, risk,
+               recommendations, top-k) + writing final_results
+  - reporting: reporting_ci clean + generate_reports
+Selecting a stage also runs the stages it depends on; only selected stages
+are recorded. Per stage and size the results file holds:
+  - wall_s:           stage wall time, imports excluded
+  - functions_per_s:  synthetic functions / wall_s
+  - peak_rss_mb:      peak RSS of the stage process (imports included)
+  - import_rss_mb:    RSS after imports, before the stage ran
+  - workers_rss_mb:   largest worker process peak (metrics with --jobs > 1)
+Results carry the git commit they were measured at; --compare prints the
+ratios against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: RSS is not reported
+    resource = None
+
+from benchmarks.synthetic_repo import COVERAGE_JSON, generate_repo
+from config.paths import PROJECT_ROOT
+
+STAGES = ["metrics", "inference", "aggregate", "reporting"]
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+METRICS_CSV = "long_method_validation_dataset.csv"
+PREDICTIONS_CSV = "ml_smell_predictions.csv"
+FINAL_CSV = "final_results.csv"
+TOPK_CSV = "final_results_topk.csv"
+
+
+def peak_rss_mb(who=None):
+    if resource is None:
+        return None
+    who = resource.RUSAGE_SELF if who is None else who
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(who).ru_maxrss * scale / 1e6, 1)
+
+
+# ---------- Stages (run inside the child process) ----------
+
+def stage_metrics(workdir, jobs):
+    from ml.build_validation_dataset import FIELDNAMES, collect_source_files, process_file, write_dataset
+    from ml.parallel import process_files
+
+    repo = workdir / "target-repos" / "synth"
+
+    def run():
+        files = collect_source_files(repo)
+        rows, _ = process_files(process_file, files, jobs=jobs, fieldnames=FIELDNAMES)
+        write_dataset(rows, workdir / METRICS_CSV, "csv")
+    return run
+
+
+def stage_inference(workdir, jobs):
+    from ml.inference import run_inference
+
+    return lambda: run_inference(workdir / METRICS_CSV, workdir / PREDICTIONS_CSV, "csv")
+
+
+def stage_aggregate(workdir, jobs):
+    from analysis.post_ml_aggregate import aggregate, select_top_k, write_outputs
+    from benchmarks.synthetic_repo import coverage_from_json
+    from config.artifacts import read_table
+
+    def run():
+        executed, branches = coverage_from_json(workdir / COVERAGE_JSON)
+        df = aggregate(read_table(workdir / PREDICTIONS_CSV, "csv"), {"synth": executed}, branches={"synth": branches})
+        write_outputs(df, select_top_k(df), workdir / FINAL_CSV, workdir / TOPK_CSV, "csv")
+    return run
+
+
+def stage_reporting(workdir, jobs):
+    import matplotlib
+    matplotlib.use("Agg")
+    from config.artifacts import read_table
+    from reporting.reporting_ci import clean, generate_reports
+
+    reports_dir = workdir / "reports"
+    reports_dir.mkdir(exist_ok=True)
+
+    def run():
+        generate_reports(
+            clean(read_table(workdir / FINAL_CSV, "csv")),
+            clean(read_table(workdir / PREDICTIONS_CSV, "csv")),
+            reports_dir,
+        )
+    return run
+
+
+STAGE_RUNNERS = {
+    "metrics": stage_metrics,
+    "inference": stage_inference,
+    "aggregate": stage_aggregate,
+    "reporting": stage_reporting,
+}
+
+
+def run_stage(stage, workdir, jobs):
+    """Child process entry point: prints one result line for the parent."""
+    run = STAGE_RUNNERS[stage](Path(workdir), jobs)
+    import_rss = peak_rss_mb()
+
+    t0 = time.perf_counter()
+    run()
+    wall_s = time.perf_counter() - t0
+
+    result = {
+        "wall_s": round(wall_s, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "import_rss_mb": import_rss,
+        "workers_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource and jobs > 1 else None,
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+# ---------- Driver ----------
+
+def spawn_stage(stage, workdir, jobs):
+    env = {k: v for k, v in os.environ.items() if k not in ("CI_MODE", "CI_WORKSPACE", "TARGET_REPO")}
+    env["MPLBACKEND"] = "Agg"
+    env["PIPELINE_TRACE_FILE"] = str(Path(workdir) / "trace.json")  # keep ci_workspace untouched
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.pipeline_benchmark", "--run-stage", stage,
+         "--workdir", str(workdir), "--jobs", str(jobs)],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print((proc.stdout + proc.stderr)[-3000:])
+    raise RuntimeError(f"Stage {stage} failed (exit code {proc.returncode})")
+
+
+def git_revision():
+    def git(*args):
+        out = subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True)
+        return out.stdout.strip() if out.returncode == 0 else None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return git("rev-parse", "HEAD"), bool(status)
+
+
+def benchmark_size(functions, stages, args, workdir):
+    t0 = time.perf_counter()
+    manifest = generate_repo(
+        workdir, functions, args.functions_per_file, args.body_lines,
+        args.branches, args.covered_fraction, args.seed,
+    )
+    print(f"🏗️  {functions} functions / {manifest['files']} files generated in {time.perf_counter() - t0:.1f}s")
+
+    results = []
+    last = max(STAGES.index(s) for s in stages)
+    for stage in STAGES[:last + 1]:
+        measured = spawn_stage(stage, workdir, args.jobs)
+        if stage not in stages:
+            continue
+        wall_s = measured["wall_s"]
+        results.append({
+            "stage": stage,
+            "functions": functions,
+            "files": manifest["files"],
+            **measured,
+            "functions_per_s": round(functions / wall_s, 1) if wall_s else None,
+        })
+        print(f"⏱️  {stage:<10} {wall_s:>9.2f}s  {results[-1]['functions_per_s']:>10} fn/s  "
+              f"peak {measured['peak_rss_mb']} MB")
+    return results
+
+
+def compare(results, baseline_file):
+    import pandas as pd
+
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    keys = ["stage", "functions"]
+    current = pd.DataFrame(results).set_index(keys)
+    previous = pd.DataFrame(baseline["results"]).set_index(keys)
+    joined = current[["wall_s", "peak_rss_mb"]].join(
+        previous[["wall_s", "peak_rss_mb"]], rsuffix="_base", how="inner",
+    )
+    joined["wall_ratio"] = (joined["wall_s"] / joined["wall_s_base"]).round(3)
+    joined["rss_ratio"] = (joined["peak_rss_mb"] / joined["peak_rss_mb_base"]).round(3)
+    print(f"\n--- vs {baseline_file} ({(baseline.get('commit') or '?')[:10]}) ---")
+    print(joined.to_string())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic repositories.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Function counts")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--functions-per-file", type=int, default=50)
+    parser.add_argument("--body-lines", type=int, default=8)
+    parser.add_argument("--branches", type=int, default=2)
+    parser.add_argument("--covered-fraction", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Metric extraction workers (default: 1, serial)")
+    parser.add_argument("--workdir", type=Path, default=None, help="Keep generated repos and artifacts here")
+    parser.add_argument("--output", type=Path, default=None, help=f"Results JSON (default: {RESULTS_DIR}/pipeline_<commit>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.workdir, args.jobs)
+        return
+
+    commit, dirty = git_revision()
+    results = []
+    for functions in args.sizes:
+        if args.workdir:
+            workdir = args.workdir / f"synth_{functions}"
+            workdir.mkdir(parents=True, exist_ok=True)
+            results += benchmark_size(functions, args.stages, args, workdir)
+        else:
+            with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp:
+                results += benchmark_size(functions, args.stages, args, Path(tmp))
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "functions_per_file": args.functions_per_file,
+            "body_lines": args.body_lines,
+            "branches": args.branches,
+            "covered_fraction": args.covered_fraction,
+            "seed": args.seed,
+            "jobs": args.jobs,
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"pipeline_{(commit or 'nogit')[:10]}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+row_memory.py
+(Memory held by the builders' metric rows: list of dicts vs RowBuffer)
+
+Usage:
+    python -m benchmarks.row_memory [--functions 100000 1000000] [--functions-per-file 50]
+
+Builds the same synthetic rows (training schema, analyze_method's value
+types, one path string per file) both ways and reports, per size:
+  - held MB / B/row:      memory held after building (tracemalloc)
+  - pickle_mb:            what the workers send back to the parent
+  - sample_mb:            peak allocated by the training builder's sampling
+  - write_s:              time to write the CSV from it
+The training builder's sampling is measured too: the old code made
+smelly/non-smelly copies of the row list, the new one samples row indices.
+"""
+import argparse
+import gc
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from config.artifacts import write_rows
+from ml.build_training_dataset import FIELDNAMES
+from ml.row_buffer import RowBuffer
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+
+def synthetic_rows(functions, functions_per_file=50, seed=0):
+    rng = random.Random(seed)
+    path = None
+    for i in range(functions):
+        if i % functions_per_file == 0:
+            path = f"/home/ci/workspace/target-repos/synth/src/synth/pkg_{i // 5000}/module_{i // functions_per_file}.py"
+        empty = rng.random() < 0.2  # radon reports int 0 for functions without operators
+        lloc = rng.randint(1, 60)
+        yield {
+            'File_Path': path,
+            'Method_Name': sys.intern(f"method_{i % 2000}"),
+            'start_line': i % 2000 + 1,
+            'end_line': i % 2000 + lloc + 2,
+            'is_Long_Method': int(lloc > 30),
+            'CC': rng.randint(1, 15),
+            'lloc': lloc,
+            'scloc': lloc + rng.randint(0, 5),
+            'comments': rng.randint(0, 4),
+            'calculated_length': 0 if empty else rng.randint(1, 400),
+            'volume': 0 if empty else rng.uniform(1, 3000),
+            'difficulty': 0 if empty else rng.uniform(0.5, 40),
+            'effort': 0 if empty else rng.uniform(1, 1e5),
+            'time': 0.0 if empty else rng.uniform(0.1, 5e3),
+            'bugs': 0.0 if empty else rng.uniform(0.001, 1.0),
+        }
+
+
+def measure(build):
+    """(result, MB still held, peak MB) of build()."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held / 1e6, peak / 1e6
+
+
+def timed_write(rows, workdir):
+    t0 = time.perf_counter()
+    write_rows(rows, FIELDNAMES, workdir / "rows.csv", "csv")
+    return time.perf_counter() - t0
+
+
+def sample_lists(rows):
+    # build_training_dataset before RowBuffer
+    smelly = [r for r in rows if r.get('is_Long_Method') == 1]
+    non_smelly = [r for r in rows if r.get('is_Long_Method') == 0]
+    return random.sample(smelly, min(200, len(smelly))) + random.sample(non_smelly, min(800, len(non_smelly)))
+
+
+def sample_buffer(rows):
+    smelly = rows.indices_where('is_Long_Method', 1)
+    non_smelly = rows.indices_where('is_Long_Method', 0)
+    picked = random.sample(smelly, min(200, len(smelly))) + random.sample(non_smelly, min(800, len(non_smelly)))
+    return rows.take(picked)
+
+
+def benchmark(functions, functions_per_file, workdir):
+    results = {}
+    for kind, build, sample in (
+        ("list", lambda: list(synthetic_rows(functions, functions_per_file)), sample_lists),
+        ("buffer", lambda: RowBuffer(FIELDNAMES, synthetic_rows(functions, functions_per_file)), sample_buffer),
+    ):
+        rows, held_mb, _ = measure(build)
+        pickle_mb = len(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+        write_s = timed_write(rows, workdir)
+        _, _, sample_mb = measure(lambda: sample(rows))
+        results[kind] = {"held_mb": held_mb, "pickle_mb": pickle_mb, "sample_mb": sample_mb, "write_s": write_s}
+        del rows
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the memory of metric rows as dicts vs RowBuffer.")
+    parser.add_argument("--functions", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--functions-per-file", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    print(f"{'functions':>10} {'kind':>7} {'held MB':>9} {'B/row':>7} {'pickle MB':>10} "
+          f"{'sample MB':>10} {'write s':>8}")
+    with tempfile.TemporaryDirectory(prefix="row_memory_") as tmp:
+        for functions in args.functions:
+            results = benchmark(functions, args.functions_per_file, Path(tmp))
+            for kind, r in results.items():
+                print(f"{functions:>10} {kind:>7} {r['held_mb']:>9.1f} {r['held_mb'] * 1e6 / functions:>7.0f} "
+                      f"{r['pickle_mb']:>10.1f} {r['sample_mb']:>10.1f} {r['write_s']:>8.2f}")
+            ratio = results["list"]["held_mb"] / results["buffer"]["held_mb"]
+            print(f"{'':>10} {'':>7} → {ratio:.1f}x less memory held")
+            os.remove(Path(tmp) / "rows.csv")
+
+
+if __name__ == "__main__":
+    main()
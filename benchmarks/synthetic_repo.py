@@ -0,0 +1,176 @@
+"""
+synthetic_repo.py
+(Generates synthetic Python repositories and matching coverage reports)
+
+Usage:
+    python -m benchmarks.synthetic_repo <output-dir> [--functions 10000] [--functions-per-file 50]
+
+Writes <output-dir>/target-repos/<name>/ (so File_Paths resolve to a repo the
+way they do for real target repos), a coverage.py-style JSON report for it and
+a manifest.json with the generated counts. Every knob shapes the metrics the
+pipeline sees:
+  - functions_per_file: functions per module
+  - body_lines:         mean straight-line statements per function (actual
+                        lengths vary from 1 to 2x, so both smell labels occur)
+  - branches:           mean `if` statements per function (CC - 1)
+  - covered_fraction:   share of functions some test called; each `if` of a
+                        called function took one or both of its exits
+Generation is deterministic for a given seed.
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+
+REPO_NAME = "synth"
+COVERAGE_JSON = "coverage.json"
+MANIFEST_JSON = "manifest.json"
+
+
+def _function(index, start, rng, body_lines, branches, called):
+    """Source lines of one function plus its executed lines and branch arcs."""
+    lines = [f"def func_{index}(a, b):", "    total = a + b"]
+    arcs = []  # (from, to, taken)
+    executed = [start]  # the def statement runs at import
+    if called:
+        executed.append(start + 1)
+
+    for k in range(rng.randint(0, 2 * branches)):
+        if_line = start + len(lines)
+        lines += [f"    if total > {k * 7 + index % 13}:", f"        total -= {k + 1}"]
+        exits = rng.choice(((True, True), (True, False), (False, True))) if called else (False, False)
+        arcs.append((if_line, if_line + 1, exits[0]))
+        arcs.append((if_line, if_line + 2, exits[1]))
+        if called:
+            executed.append(if_line)
+            if exits[0]:
+                executed.append(if_line + 1)
+
+    body_start = start + len(lines)
+    for k in range(rng.randint(1, 2 * body_lines)):
+        lines.append(f"    total = total * {k % 5 + 2} + b - {k}")
+    lines.append("    return total")
+    if called:
+        executed.extend(range(body_start, start + len(lines)))
+    return lines, executed, arcs
+
+
+def _file_coverage(statements, executed, arcs):
+    executed = sorted(set(executed) & statements)
+    missing = sorted(statements.difference(executed))
+    return {
+        "executed_lines": executed,
+        "missing_lines": missing,
+        "executed_branches": [[a, b] for a, b, taken in arcs if taken],
+        "missing_branches": [[a, b] for a, b, taken in arcs if not taken],
+        "summary": {
+            "covered_lines": len(executed),
+            "num_statements": len(statements),
+            "percent_covered": 100.0 * len(executed) / len(statements) if statements else 100.0,
+        },
+    }
+
+
+def generate_repo(output_dir, functions, functions_per_file=50, body_lines=8, branches=2,
+                  covered_fraction=0.6, seed=0, name=REPO_NAME) -> dict:
+    """Writes the repo, its coverage JSON and manifest under output_dir; returns the manifest."""
+    output_dir = Path(output_dir)
+    rng = random.Random(seed)
+    repo = output_dir / "target-repos" / name
+    files_cov = {}
+
+    index = 0
+    file_no = 0
+    while index < functions:
+        rel = f"pkg_{file_no // 100}/mod_{file_no}.py"
+        source = []
+        executed, arcs = [], []
+        for _ in range(min(functions_per_file, functions - index)):
+            start = len(source) + 1
+            lines, fn_executed, fn_arcs = _function(
+                index, start, rng, body_lines, branches, rng.random() < covered_fraction,
+            )
+            source += lines + [""]
+            executed += fn_executed
+            arcs += fn_arcs
+            index += 1
+
+        path = repo / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(source))
+        statements = {n for n, line in enumerate(source, 1) if line}
+        files_cov[rel] = _file_coverage(statements, executed, arcs)
+        file_no += 1
+
+    for package in {p.parent for p in repo.rglob("mod_*.py")}:
+        (package / "__init__.py").touch()
+
+    covered = sum(f["summary"]["covered_lines"] for f in files_cov.values())
+    statements = sum(f["summary"]["num_statements"] for f in files_cov.values())
+    report = {
+        "meta": {"format": 3, "branch_coverage": True, "show_contexts": False},
+        "files": files_cov,
+        "totals": {
+            "covered_lines": covered,
+            "num_statements": statements,
+            "percent_covered": 100.0 * covered / statements if statements else 100.0,
+        },
+    }
+    with open(output_dir / COVERAGE_JSON, "w") as f:
+        json.dump(report, f)
+
+    manifest = {
+        "repo": str(repo),
+        "functions": functions,
+        "files": file_no,
+        "functions_per_file": functions_per_file,
+        "body_lines": body_lines,
+        "branches": branches,
+        "covered_fraction": covered_fraction,
+        "seed": seed,
+    }
+    with open(output_dir / MANIFEST_JSON, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def coverage_from_json(path) -> tuple[dict, dict]:
+    """
+    (executed lines, branch stats) from a coverage.py JSON report, shaped like
+    analysis/coverage.py's output: {file: lines} and {file: {line: (total, taken)}}.
+    """
+    with open(path) as f:
+        files = json.load(f).get("files", {})
+
+    executed, branches = {}, {}
+    for covered_file, data in files.items():
+        executed[covered_file] = data.get("executed_lines", [])
+        stats = {}
+        for taken, key in ((1, "executed_branches"), (0, "missing_branches")):
+            for source, _ in data.get(key, ()):
+                total, hit = stats.get(source, (0, 0))
+                stats[source] = (total + 1, hit + taken)
+        branches[covered_file] = stats
+    return executed, branches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Python repo plus coverage JSON.")
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--functions", type=int, default=10_000)
+    parser.add_argument("--functions-per-file", type=int, default=50)
+    parser.add_argument("--body-lines", type=int, default=8)
+    parser.add_argument("--branches", type=int, default=2)
+    parser.add_argument("--covered-fraction", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    manifest = generate_repo(
+        args.output_dir, args.functions, args.functions_per_file, args.body_lines,
+        args.branches, args.covered_fraction, args.seed,
+    )
+    print(f"✅ {manifest['functions']} functions in {manifest['files']} files -> {manifest['repo']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
+import argparse
 import shutil
 import subprocess
 import sys
 import tempfile
 from pathlib import Path
 
+from ci.profiling import PROFILERS, PROFILE_TOP
 from ci.runner import run_analysis, CIError
 
 
@@ -39,12 +41,38 @@ def install_dependencies(python: Path, repo_dir: Path):
     run([str(python), "-m", "pip", "install", "pytest", "coverage"])
 
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python -m ci.clone_repo <git-repo-url>")
-        sys.exit(1)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ci.clone_repo",
+        description="Clone a repository into a temporary venv and run the ML-guided CI analysis.",
+    )
+    parser.add_argument("repo_url", help="Git URL of the repository to analyze")
+    parser.add_argument(
+        "--base", default=None,
+        help="Only analyze functions changed since this git ref (e.g. origin/main)",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="Run all stages in one interpreter, handing DataFrames over in memory",
+    )
+    parser.add_argument(
+        "--no-csv", action="store_true",
+        help="With --in-process: skip writing intermediate CSV and coverage artifacts (reports are still written)",
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="cprofile", choices=PROFILERS, default=None,
+        help="Profile every step into ci_workspace/metrics/profiles/ (default profiler: cprofile)",
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=PROFILE_TOP,
+        help=f"Hottest functions listed after a profiled run (default: {PROFILE_TOP})",
+    )
+    return parser.parse_args(argv)
 
-    repo_url = sys.argv[1]
+
+def main():
+    args = parse_args()
+    repo_url = args.repo_url
     ensure_git()
 
     with tempfile.TemporaryDirectory(prefix="ml_ci_") as tmp:
@@ -66,7 +94,11 @@ def main():
         try:
             # NOTE: tool runner is invoked from tool repo, 
             # but coverage step will use this venv python
-            run_analysis(repo_dir, external_python=python)
+            run_analysis(
+                repo_dir, external_python=python, base=args.base,
+                in_process=args.in_process, persist=not args.no_csv,
+                profile=args.profile, profile_top=args.profile_top,
+            )
         except CIError as e:
             print(f"\n❌ CI FAILED: {e}")
             sys.exit(1)
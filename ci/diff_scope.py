@@ -0,0 +1,132 @@
+"""
+diff_scope.py
+(Restricts CI analysis to functions touched by a git diff)
+
+The runner computes the changed line ranges of every Python file against a
+base ref, writes them to a JSON scope file and exports its path in
+CI_DIFF_SCOPE. Pipeline steps running in CI mode load the scope and only
+analyze files / functions that overlap the diff.
+"""
+import json
+import os
+import re
+import subprocess
+from pathlib import Path
+
+DIFF_SCOPE_ENV = "CI_DIFF_SCOPE"
+
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffScopeError(Exception):
+    pass
+
+
+class DiffScope:
+    """
+    files: repo-relative posix path -> list of (start, end) changed line ranges
+    in the current version of the file (inclusive).
+    """
+
+    def __init__(self, repo_root, base, files):
+        self.repo_root = Path(repo_root).resolve()
+        self.base = base
+        self.files = {path: [tuple(r) for r in ranges] for path, ranges in files.items()}
+
+    def relpath(self, file_path) -> str:
+        try:
+            return Path(file_path).resolve().relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return Path(file_path).as_posix()
+
+    def contains_file(self, file_path) -> bool:
+        return self.relpath(file_path) in self.files
+
+    def overlaps(self, file_path, start, end) -> bool:
+        ranges = self.files.get(self.relpath(file_path))
+        if not ranges:
+            return False
+        return any(r_start <= end and start <= r_end for r_start, r_end in ranges)
+
+    def absolute_paths(self):
+        return [str(self.repo_root / path) for path in sorted(self.files)]
+
+    def to_dict(self):
+        return {
+            "repo_root": str(self.repo_root),
+            "base": self.base,
+            "files": {path: [list(r) for r in ranges] for path, ranges in self.files.items()},
+        }
+
+    def write(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def read(cls, path: Path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["repo_root"], data["base"], data["files"])
+
+
+# ---------------------------------------------------------
+# Git
+# ---------------------------------------------------------
+def _git(repo_root: Path, *args) -> str:
+    try:
+        out = subprocess.run(
+            ["git", *args], cwd=repo_root, check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise DiffScopeError(f"git {' '.join(args)} failed: {e.stderr.strip()}")
+    return out.stdout
+
+
+def parse_unified_diff(diff_text: str) -> dict:
+    """
+    Parse `git diff -U0` output into {path: [(start, end), ...]} for the new
+    side of each hunk. Pure deletions are recorded as the line they follow.
+    """
+    files = {}
+    current = None
+    for line in diff_text.splitlines():
+        if line.startswith("+++ "):
+            target = line[4:].strip()
+            current = None if target == "/dev/null" else target[2:] if target.startswith("b/") else target
+            if current is not None:
+                files.setdefault(current, [])
+            continue
+        match = _HUNK_RE.match(line)
+        if match and current is not None:
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            if count == 0:
+                files[current].append((max(start, 1), max(start, 1)))
+            else:
+                files[current].append((start, start + count - 1))
+    return files
+
+
+def compute_diff_scope(repo_root: Path, base: str) -> DiffScope:
+    """
+    Changed Python line ranges between the merge-base of `base` and HEAD,
+    plus any uncommitted changes in the working tree.
+    """
+    repo_root = Path(repo_root).resolve()
+    merge_base = _git(repo_root, "merge-base", base, "HEAD").strip()
+    diff = _git(
+        repo_root, "diff", "-U0", "--no-color", "--no-ext-diff",
+        "--diff-filter=ACMR", merge_base, "--", "*.py",
+    )
+    return DiffScope(repo_root, base, parse_unified_diff(diff))
+
+
+def load_diff_scope():
+    """
+    The active scope for this pipeline step, or None for a full analysis.
+    """
+    path = os.getenv(DIFF_SCOPE_ENV)
+    if not path:
+        return None
+    return DiffScope.read(Path(path))
@@ -1,7 +1,9 @@
 from pathlib import Path
+import argparse
 import shutil
 import sys
 
+from ci.profiling import PROFILERS, PROFILE_TOP
 from ci.runner import run_analysis, CIError
 
 
@@ -13,24 +15,58 @@ def ensure_tool_available(tool: str):
         )
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ci.in_repo",
+        description="Run the ML-guided CI analysis on a local repository.",
+    )
+    parser.add_argument(
+        "repo_path", nargs="?", type=Path, default=None,
+        help="Repository to analyze (default: current working directory)",
+    )
+    parser.add_argument(
+        "--base", default=None,
+        help="Only analyze functions changed since this git ref (e.g. origin/main)",
+    )
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="Run all stages in one interpreter, handing DataFrames over in memory",
+    )
+    parser.add_argument(
+        "--no-csv", action="store_true",
+        help="With --in-process: skip writing intermediate CSV and coverage artifacts (reports are still written)",
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="cprofile", choices=PROFILERS, default=None,
+        help="Profile every step into ci_workspace/metrics/profiles/ (default profiler: cprofile)",
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=PROFILE_TOP,
+        help=f"Hottest functions listed after a profiled run (default: {PROFILE_TOP})",
+    )
+    return parser.parse_args(argv)
+
+
 def main():
     """
     CI entrypoint.
 
     Usage:
-        python -m ci.in_repo [repo_path]
+        python -m ci.in_repo [repo_path] [--base <ref>] [--in-process [--no-csv]]
+                             [--profile [cprofile|py-spy]] [--profile-top N]
 
     - If repo_path is provided → analyze that repo
     - Otherwise → analyze current working directory
+    - With --base → restrict the analysis to functions overlapping the diff
+    - With --in-process → run the stages in one interpreter (see ci/pipeline.py)
+    - With --profile → profile each step and print the hottest functions (see ci/profiling.py)
     """
 
-    if len(sys.argv) > 2:
-        print("Usage: python -m ci.in_repo [repo_path]")
-        sys.exit(1)
+    args = parse_args()
 
     repo_root = (
-        Path(sys.argv[1]).resolve()
-        if len(sys.argv) == 2
+        args.repo_path.resolve()
+        if args.repo_path is not None
         else Path.cwd().resolve()
     )
 
@@ -45,7 +81,10 @@ def main():
         print("⚠️  Warning: No pyproject.toml or setup.py found. Proceeding anyway.")
 
     try:
-        run_analysis(repo_root)
+        run_analysis(
+            repo_root, base=args.base, in_process=args.in_process, persist=not args.no_csv,
+            profile=args.profile, profile_top=args.profile_top,
+        )
     except CIError as e:
         print(f"\n❌ CI FAILED: {e}")
         sys.exit(1)
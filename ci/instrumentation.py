@@ -0,0 +1,254 @@
+"""
+instrumentation.py
+(Per-stage timing and memory spans, written to a JSON trace)
+
+    with span("metrics", repo="attrs") as s:
+        ...
+        s.set(files_scanned=len(files), functions=len(rows))
+
+Every closed span is appended as one JSON line to trace.events.jsonl next to
+the trace file. Stages run as subprocesses add their spans to the same file;
+their outermost span hangs under the span that spawned them
+(PIPELINE_TRACE_PARENT). When the process that started the trace closes its
+last span, the events are rendered into PIPELINE_TRACE_FILE (default
+ci_workspace/metrics/trace.json) in PIPELINE_TRACE_FORMAT:
+  - json:   {"spans": [...]}: start, duration, peak RSS and metrics per span
+  - chrome: Chrome trace events, for chrome://tracing or ui.perfetto.dev
+
+Per-file and per-function phases are too many for spans. Hot loops add their
+seconds to the run's Counter with phase(), and the enclosing span collects
+them with pop_phases(), so they survive the process-pool merge.
+
+Tracing is off unless PIPELINE_TRACE=1. The CI runner and
+scripts/run_full_pipeline.py turn it on with enable_tracing() (for their
+subprocess steps too), so stage modules run on their own never overwrite the
+trace; PIPELINE_TRACE=0 keeps it off there as well.
+
+Stdlib only (imported by analysis/coverage.py in the target venv).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: RSS is not reported
+    resource = None
+
+from config.paths import CI_WORKSPACE_METRICS
+
+TRACE_ENABLED = os.getenv("PIPELINE_TRACE") == "1"
+TRACE_FORMATS = ("json", "chrome")
+TRACE_FORMAT = os.getenv("PIPELINE_TRACE_FORMAT", "json")
+TRACE_FILE = Path(os.getenv("PIPELINE_TRACE_FILE", CI_WORKSPACE_METRICS / "trace.json"))
+PARENT_ENV = "PIPELINE_TRACE_PARENT"
+
+
+class TraceError(ValueError):
+    pass
+
+
+if TRACE_FORMAT not in TRACE_FORMATS:
+    raise TraceError(f"Invalid PIPELINE_TRACE_FORMAT {TRACE_FORMAT!r}; expected one of {TRACE_FORMATS}")
+
+def enable_tracing() -> bool:
+    """
+    Turns tracing on for this process and the subprocesses it starts, unless
+    PIPELINE_TRACE=0. Returns whether tracing is on.
+    """
+    global TRACE_ENABLED
+    if os.getenv("PIPELINE_TRACE") == "0":
+        return False
+    os.environ["PIPELINE_TRACE"] = "1"
+    TRACE_ENABLED = True
+    return True
+
+
+# Counter keys holding accumulated phase seconds
+PHASE_PREFIX = "phase_s:"
+
+_local = threading.local()
+_lock = threading.Lock()
+_open_spans = []  # open spans of this process, outermost first
+
+
+class Span:
+    def __init__(self, name, parent, metrics):
+        self.name = name
+        self.parent = parent
+        self.metrics = dict(metrics)
+
+    def set(self, **metrics):
+        self.metrics.update(metrics)
+
+
+def events_file(trace_file=TRACE_FILE) -> Path:
+    trace_file = Path(trace_file)
+    return trace_file.with_name(f"{trace_file.stem}.events.jsonl")
+
+
+def peak_rss_mb(children: bool = False):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 1e6, 1)
+
+
+def _thread_stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def span(name: str, **metrics):
+    """Times the block as one span; metrics can be added through the yielded Span."""
+    if not TRACE_ENABLED:
+        yield Span(name, None, metrics)
+        return
+
+    stack = _thread_stack()
+    with _lock:
+        # Worker threads of the in-process pipeline nest under the process' root span
+        parent = stack[-1].name if stack else (_open_spans[0].name if _open_spans else os.getenv(PARENT_ENV))
+        s = Span(name, parent, metrics)
+        root = not _open_spans
+        starts_trace = root and os.getenv(PARENT_ENV) is None
+        _open_spans.append(s)
+        if starts_trace:
+            _reset_events()
+        if root:
+            os.environ[PARENT_ENV] = name
+    stack.append(s)
+
+    status = "ok"
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - t0
+        stack.pop()
+        record = {
+            "name": s.name,
+            "parent": s.parent,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "start": round(start, 6),
+            "duration_s": round(duration, 6),
+            "status": status,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "metrics": s.metrics,
+        }
+        with _lock:
+            _open_spans.remove(s)
+            _append_event(record)
+            if root:
+                if starts_trace:
+                    os.environ.pop(PARENT_ENV, None)
+                    write_trace()
+                else:
+                    os.environ[PARENT_ENV] = s.parent
+
+# ---------- Phases (hot loops) ----------
+
+@contextmanager
+def phase(counters, name: str):
+    """Adds the block's seconds to counters[PHASE_PREFIX + name] (no-op without counters)."""
+    if counters is None or not TRACE_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        counters[PHASE_PREFIX + name] += time.perf_counter() - t0
+
+
+def pop_phases(counters) -> dict:
+    """Removes the phase entries from counters, returned as {"<phase>_s": seconds}."""
+    keys = [k for k in counters if k.startswith(PHASE_PREFIX)]
+    return {f"{k[len(PHASE_PREFIX):]}_s": round(counters.pop(k), 4) for k in keys}
+
+
+def without_phases(counters) -> dict:
+    return {k: v for k, v in counters.items() if not k.startswith(PHASE_PREFIX)}
+
+# ---------- Trace file ----------
+
+def _reset_events(trace_file=TRACE_FILE):
+    path = events_file(trace_file)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    except OSError:
+        pass
+
+
+def _append_event(record, trace_file=TRACE_FILE):
+    # One write per line in append mode keeps lines from concurrent processes whole
+    try:
+        with open(events_file(trace_file), "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    except OSError:
+        pass
+
+
+def load_spans(trace_file=TRACE_FILE) -> list[dict]:
+    path = events_file(trace_file)
+    if not path.exists():
+        return []
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    return sorted(spans, key=lambda s: s["start"])
+
+
+def chrome_trace(spans) -> dict:
+    events = []
+    for s in spans:
+        args = dict(s["metrics"], peak_rss_mb=s["peak_rss_mb"], status=s["status"])
+        events.append({
+            "name": s["name"],
+            "cat": s["parent"] or "pipeline",
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["duration_s"] * 1e6),
+            "pid": s["pid"],
+            "tid": s["tid"],
+            "args": args,
+        })
+        if s["peak_rss_mb"] is not None:
+            events.append({
+                "name": "peak_rss_mb",
+                "ph": "C",
+                "ts": round((s["start"] + s["duration_s"]) * 1e6),
+                "pid": s["pid"],
+                "args": {"peak_rss_mb": s["peak_rss_mb"]},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(trace_file=TRACE_FILE, fmt=TRACE_FORMAT):
+    spans = load_spans(trace_file)
+    payload = chrome_trace(spans) if fmt == "chrome" else {"spans": spans}
+    try:
+        with open(trace_file, "w") as f:
+            json.dump(payload, f, indent=1)
+    except OSError as e:
+        print(f"⚠️  Could not write trace {trace_file}: {e}")
+        return None
+    return trace_file
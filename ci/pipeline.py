@@ -0,0 +1,193 @@
+"""
+pipeline.py
+(In-process CI pipeline: stages hand DataFrames to each other in memory)
+
+    metrics ──► predictions ──┐
+                              ├──► aggregate ──► reporting
+    coverage ─────────────────┘
+
+Same stages as ci/runner.py's subprocess chain, but run as Python calls in a
+single interpreter, so pandas/sklearn are imported once and intermediate
+tables are never re-parsed from CSV. Independent stages (coverage runs pytest
+in its own subprocess) overlap with the in-process ones. CSV and coverage artifacts
+are an optional sink, written to the same ci_workspace paths as before.
+
+Stage modules resolve their own paths from CI_MODE / CI_WORKSPACE at import,
+so the pipeline never relies on them: every input and output path is passed
+explicitly, whatever was imported (or set in the environment) before.
+"""
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from graphlib import TopologicalSorter
+from pathlib import Path
+
+from ci.diff_scope import DiffScope
+from ci.instrumentation import span
+from ci.profiling import profile_block
+from config.artifacts import write_table
+from config.paths import CI_WORKSPACE_COVERAGE, CI_WORKSPACE_METRICS, CI_WORKSPACE_PROCESSED, CI_WORKSPACE_REPORTS
+
+
+class PipelineError(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+# ---------- DAG execution ----------
+
+def run_dag(stages, max_workers=2, profile=None):
+    """
+    Runs each stage once all its deps are done, passing their results as
+    keyword arguments. A stage returning None stops everything downstream.
+    With profile, each stage is profiled into stage-<name>.prof.
+    Returns (results, timings) keyed by stage name.
+    """
+    by_name = {s.name: s for s in stages}
+    sorter = TopologicalSorter({s.name: s.deps for s in stages})
+    sorter.prepare()
+
+    results, timings = {}, {}
+
+    def timed(stage):
+        kwargs = {dep: results[dep] for dep in stage.deps}
+        if any(v is None for v in kwargs.values()):
+            return None, None
+        t0 = time.perf_counter()
+        with span(f"stage:{stage.name}") as s, profile_block(f"stage-{stage.name}", profile):
+            out = stage.fn(**kwargs)
+            if hasattr(out, "__len__") and not isinstance(out, dict):
+                s.set(rows=len(out))
+        return out, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                running[pool.submit(timed, by_name[name])] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], elapsed = future.result()
+                except Exception as e:
+                    raise PipelineError(f"Stage failed: {name}: {e}") from e
+                if elapsed is not None:
+                    timings[name] = elapsed
+                sorter.done(name)
+
+    return results, timings
+
+
+def print_timings(timings, results, total):
+    print("\n⏱️  Stage timings")
+    for name, elapsed in timings.items():
+        rows = results.get(name)
+        size = f"{len(rows)} rows" if hasattr(rows, "__len__") and not isinstance(rows, dict) else ""
+        print(f"   {name:<12} {elapsed:8.2f}s  {size}")
+    print(f"   {'total':<12} {total:8.2f}s")
+
+
+# ---------- CI pipeline ----------
+
+def run_pipeline(repo_root: Path, external_python: Path = None, scope_file: Path = None, persist: bool = True,
+                 profile: str = None):
+    """
+    In-process equivalent of ci.runner's subprocess steps. Returns the final
+    results DataFrame, or None when a diff-scoped run has nothing to analyze.
+    With profile, stages run one at a time (a thread's profile would otherwise
+    mix with the stage overlapping it) and metric extraction stays serial.
+    """
+    # pyplot runs on a stage thread: only a non-GUI backend is safe there
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from ml import build_validation_dataset as metrics_mod
+    from ml import inference
+    from analysis import coverage as coverage_mod
+    from analysis import post_ml_aggregate
+    from analysis.test_impact import TEST_IMPACT_NAME
+    from reporting import reporting_ci
+
+    # The ci_workspace artifacts of ci.runner's steps
+    metrics_csv = CI_WORKSPACE_METRICS / metrics_mod.OUTPUT_CSV_FILE.name
+    metrics_cache = CI_WORKSPACE_METRICS / metrics_mod.CACHE_FILE.name
+    skipped_csv = CI_WORKSPACE_METRICS / metrics_mod.SKIPPED_FILES_CSV.name
+    predictions_csv = CI_WORKSPACE_PROCESSED / inference.output_file.name
+    final_csv = CI_WORKSPACE_PROCESSED / post_ml_aggregate.OUTPUT_FULL.name
+    topk_csv = CI_WORKSPACE_PROCESSED / post_ml_aggregate.OUTPUT_TOPK.name
+    coverage_base = CI_WORKSPACE_COVERAGE / "coverage"
+    test_impact_file = CI_WORKSPACE_COVERAGE / TEST_IMPACT_NAME
+
+    diff_scope = DiffScope.read(Path(scope_file)) if scope_file is not None else None
+
+    def metrics():
+        # The time budget runs files in worker processes, which cProfile would not see
+        rows, counters = metrics_mod.collect_rows(
+            repo_root, jobs=1 if profile else None, cache_path=metrics_cache,
+            file_timeout=None if profile else metrics_mod.FILE_TIMEOUT, skipped_csv=skipped_csv,
+            single_repo=True, diff_scope=diff_scope,
+        )
+        print("Counters:", dict(counters))
+        if persist:
+            metrics_mod.write_dataset(rows, metrics_csv)
+        if diff_scope is not None and not rows:
+            print("\n✅ No changed functions to analyze")
+            return None
+        return rows.to_frame()
+
+    def predictions(metrics):
+        df = inference.predict_frame(metrics.copy())
+        if persist:
+            write_table(df, predictions_csv)
+        return df
+
+    def coverage(**_):
+        include = diff_scope.absolute_paths() if diff_scope is not None else None
+        python = external_python or Path(sys.executable)
+        try:
+            cov, state = coverage_mod.run_coverage(repo_root, python, test_impact_file, include=include)
+        except coverage_mod.CoverageError as e:
+            raise PipelineError(str(e))
+        if persist:
+            coverage_mod.save_coverage(cov, coverage_base, test_impact_file, state)
+        return cov
+
+    def aggregate(predictions, coverage):
+        df = post_ml_aggregate.aggregate(
+            predictions.copy(),
+            coverage={repo_root.name: coverage.executed},
+            branches={repo_root.name: coverage.branches},
+            repo_name=repo_root.name,
+        )
+        if persist:
+            post_ml_aggregate.write_outputs(df, post_ml_aggregate.select_top_k(df), final_csv, topk_csv)
+            if coverage.test_lines is not None:
+                post_ml_aggregate.update_test_impact(df, test_impact_file, coverage.test_lines)
+        return df
+
+    def reporting(aggregate, predictions):
+        reporting_ci.generate_reports(
+            reporting_ci.clean(aggregate), reporting_ci.clean(predictions), reports_dir=CI_WORKSPACE_REPORTS,
+        )
+        return True
+
+    stages = [
+        Stage("metrics", metrics),
+        # In diff mode coverage waits for metrics, so an empty diff never runs pytest
+        Stage("coverage", coverage, deps=("metrics",) if diff_scope is not None else ()),
+        Stage("predictions", predictions, deps=("metrics",)),
+        Stage("aggregate", aggregate, deps=("predictions", "coverage")),
+        Stage("reporting", reporting, deps=("aggregate", "predictions")),
+    ]
+
+    t0 = time.perf_counter()
+    results, timings = run_dag(stages, max_workers=1 if profile else 2, profile=profile)
+    print_timings(timings, results, time.perf_counter() - t0)
+    return results.get("aggregate")
@@ -0,0 +1,186 @@
+"""
+profiling.py
+(Opt-in hot-path profiling of pipeline steps, enabled with --profile)
+
+Every profiled step writes one file to ci_workspace/metrics/profiles/:
+  - cprofile (default): deterministic cProfile stats, <step>.prof. Subprocess
+    steps are launched through this module (`python -m ci.profiling`), which
+    keeps the step's exit code; in-process stages are profiled in their
+    own thread, one stage at a time.
+  - py-spy: sampling profiler (must be on PATH). Subprocess steps run under
+    `py-spy record --format raw --subprocesses`, so pytest and other
+    children are sampled too, giving collapsed stacks in <step>.collapsed
+    (flamegraph.pl / speedscope input). In-process stages use cProfile.
+print_report() lists the hottest functions by self time, overall and per step.
+.prof files open with `python -m pstats`, snakeviz, etc.
+
+Stdlib only (the launcher runs the coverage step in the target venv).
+"""
+import cProfile
+import os
+import pstats
+import re
+import runpy
+import shutil
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from config.paths import CI_WORKSPACE_METRICS
+
+PROFILERS = ("cprofile", "py-spy")
+PROFILE_DIR = CI_WORKSPACE_METRICS / "profiles"
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", 25))
+
+# py-spy samples per second
+SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", 200))
+
+
+class ProfileError(Exception):
+    pass
+
+
+def check_profiler(profiler):
+    if profiler not in (None, *PROFILERS):
+        raise ProfileError(f"Unknown profiler {profiler!r}; expected one of {PROFILERS}")
+    if profiler == "py-spy" and shutil.which("py-spy") is None:
+        raise ProfileError("py-spy not found in PATH (pip install py-spy) ; use --profile cprofile")
+
+
+def reset_profile_dir(profile_dir=PROFILE_DIR):
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for p in [*profile_dir.glob("*.prof"), *profile_dir.glob("*.collapsed")]:
+        p.unlink()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", name).strip("-")
+
+# ---------- Wrapping steps ----------
+
+def profiled_command(cmd, name: str, profiler, profile_dir=PROFILE_DIR) -> list:
+    """
+    cmd (`<python> -m <module> args...`) run under the profiler; cmd itself
+    when profiler is None.
+    """
+    if not profiler:
+        return cmd
+    if profiler == "py-spy":
+        out = Path(profile_dir) / f"{_slug(name)}.collapsed"
+        return [
+            "py-spy", "record", "--format", "raw", "--rate", str(SAMPLE_RATE),
+            "--subprocesses", "--output", str(out), "--", *cmd,
+        ]
+    python, flag, module, *args = cmd
+    if flag != "-m":
+        raise ProfileError(f"Only `python -m <module>` steps can be profiled: {cmd}")
+    out = Path(profile_dir) / f"{_slug(name)}.prof"
+    return [python, "-m", "ci.profiling", str(out), module, *args]
+
+
+@contextmanager
+def profile_block(name: str, profiler, profile_dir=PROFILE_DIR):
+    """cProfile of the block (current thread only), dumped to <name>.prof."""
+    if not profiler:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(Path(profile_dir) / f"{_slug(name)}.prof")
+
+
+def run_module_profiled(out: Path, module: str, args) -> int:
+    """Runs `python -m module args` under cProfile, returning its exit code."""
+    sys.argv = [module, *args]
+    prof = cProfile.Profile()
+    code = 0
+    try:
+        prof.runcall(runpy.run_module, module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        code = e.code
+    finally:
+        prof.dump_stats(out)
+    return code
+
+# ---------- Report ----------
+
+def _short_path(path: str) -> str:
+    path = path.replace("\\", "/")
+    path = re.sub(r"^.*/(site-packages|lib/python\d+\.\d+)/", "", path)
+    root = str(CI_WORKSPACE_METRICS.parents[1]).replace("\\", "/") + "/"
+    return path[len(root):] if path.startswith(root) else path
+
+
+def _function_label(key) -> str:
+    filename, line, func = key
+    if filename == "~":  # built-in
+        return func
+    return f"{func} ({_short_path(filename)}:{line})"
+
+
+def load_collapsed(path) -> tuple[Counter, int]:
+    """(self samples per frame, total samples) from a collapsed-stack file."""
+    self_samples = Counter()
+    total = 0
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if not stack or not count.isdigit():
+                continue
+            self_samples[stack.rsplit(";", 1)[-1]] += int(count)
+            total += int(count)
+    return self_samples, total
+
+
+def print_report(profile_dir=PROFILE_DIR, top: int = PROFILE_TOP):
+    profile_dir = Path(profile_dir)
+    prof_files = sorted(profile_dir.glob("*.prof"))
+    collapsed_files = sorted(profile_dir.glob("*.collapsed"))
+    if not prof_files and not collapsed_files:
+        print(f"⚠️  No profiles found in {profile_dir}")
+        return
+
+    print(f"\n🔥 Profiles in {profile_dir}")
+    combined = None
+    for path in prof_files:
+        stats = pstats.Stats(str(path))
+        hottest = max(stats.stats.items(), key=lambda kv: kv[1][2], default=None)
+        label = _function_label(hottest[0]) if hottest else "-"
+        print(f"   {path.stem:<40} {stats.total_tt:8.2f}s  hottest: {label}")
+        if combined is None:
+            combined = stats
+        else:
+            combined.add(str(path))
+
+    if combined is not None:
+        print(f"\n🔥 Top {top} functions by self time (cProfile, all steps)")
+        print(f"   {'tottime':>9} {'cumtime':>9} {'ncalls':>10}  function")
+        rows = sorted(combined.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]
+        for key, (_, ncalls, tottime, cumtime, _) in rows:
+            print(f"   {tottime:9.3f} {cumtime:9.3f} {ncalls:10d}  {_function_label(key)}")
+
+    if collapsed_files:
+        merged = Counter()
+        total = 0
+        for path in collapsed_files:
+            self_samples, n = load_collapsed(path)
+            merged.update(self_samples)
+            total += n
+            print(f"   {path.stem:<40} {n / SAMPLE_RATE:8.2f}s sampled")
+        print(f"\n🔥 Top {top} frames by self samples (py-spy, all steps)")
+        for frame, n in merged.most_common(top):
+            print(f"   {100 * n / total:6.2f}% {n:8d}  {frame}")
+
+
+if __name__ == "__main__":
+    # python -m ci.profiling <out.prof> <module> [args...]
+    if len(sys.argv) < 3:
+        print("Usage: python -m ci.profiling <out.prof> <module> [args ...]")
+        sys.exit(1)
+    sys.exit(run_module_profiled(Path(sys.argv[1]), sys.argv[2], sys.argv[3:]))
@@ -3,23 +3,30 @@ import sys
 import os
 from pathlib import Path
 
+from ci.diff_scope import DIFF_SCOPE_ENV, DiffScopeError, compute_diff_scope
+from ci.instrumentation import PARENT_ENV, TRACE_FILE, enable_tracing, span
+from ci.profiling import PROFILE_DIR, PROFILE_TOP, ProfileError, check_profiler, print_report, profiled_command, reset_profile_dir
+from config.artifacts import count_rows
+
 
 class CIError(Exception):
     pass
 
 
-def run_step(module: str, project_root: Path, repo_root: Path):
+def run_step(module: str, project_root: Path, repo_root: Path, python: Path = None, extra_env=None, profile=None):
     print(f"\n--- [CI STEP] {module} ---")
 
     env = os.environ.copy()
     env["PYTHONPATH"] = str(project_root)
     env["CI_MODE"] = "1"
     env["CI_WORKSPACE"] = str(project_root / "ci_workspace")
+    env.update(extra_env or {})
 
     if module == "analysis.coverage":
+        # -m keeps analysis/ off sys.path, so `import coverage` is the real package
         cmd = [
-            sys.executable,
-            str(project_root / "analysis" / "coverage.py"),
+            str(python or sys.executable),
+            "-m", "analysis.coverage",
             str(repo_root)   # 🔥 Explicit repo passed
         ]
         cwd = repo_root
@@ -28,24 +35,85 @@ def run_step(module: str, project_root: Path, repo_root: Path):
         cmd = [sys.executable, "-m", module]
         cwd = project_root
 
+    if profile == "cprofile":
+        # cProfile only sees this process: no worker pool, so no per-file time budget either
+        env["METRICS_JOBS"] = "1"
+        env["METRICS_FILE_TIMEOUT"] = "0"
+    cmd = profiled_command(cmd, module, profile)
+
     try:
-        subprocess.run(cmd, cwd=cwd, env=env, check=True)
+        # Spans of the step's own process nest under this one
+        with span(f"step:{module}") as s:
+            env[PARENT_ENV] = s.name
+            subprocess.run(cmd, cwd=cwd, env=env, check=True)
     except subprocess.CalledProcessError:
         raise CIError(f"Step failed: {module}")
 
 
-def run_analysis(repo_root: Path):
+def run_analysis(repo_root: Path, external_python: Path = None, base: str = None,
+                 in_process: bool = False, persist: bool = True, profile: str = None,
+                 profile_top: int = PROFILE_TOP):
+    if profile:
+        try:
+            check_profiler(profile)
+        except ProfileError as e:
+            raise CIError(str(e))
+        reset_profile_dir()
+
+    traced = enable_tracing()
+    with span("ci", repo=repo_root.name, in_process=in_process, diff_base=base, profile=profile):
+        _run_analysis(repo_root, external_python, base, in_process, persist, profile)
+    if traced:
+        print(f"🧭 Trace written to: {TRACE_FILE}")
+    if profile:
+        print_report(PROFILE_DIR, profile_top)
+
+
+def _run_analysis(repo_root, external_python, base, in_process, persist, profile):
     repo_root = repo_root.resolve()
     project_root = Path(__file__).resolve().parents[1]
+    workspace = project_root / "ci_workspace"
 
     print("\n🚦 STARTING CI ANALYSIS")
     print(f"📁 Target repo: {repo_root}")
     print(f"🧠 Tool root  : {project_root}")
 
-    run_step("ml.build_validation_dataset", project_root, repo_root)
-    run_step("ml.inference", project_root, repo_root)
-    run_step("analysis.coverage", project_root, repo_root)
-    run_step("analysis.post_ml_aggregate", project_root, repo_root)
-    run_step("reporting.reporting_ci", project_root, repo_root)
+    extra_env = {}
+    if base:
+        try:
+            scope = compute_diff_scope(repo_root, base)
+        except DiffScopeError as e:
+            raise CIError(str(e))
+
+        print(f"🔀 Diff mode  : {len(scope.files)} changed Python files vs {base}")
+        if not scope.files:
+            print("\n✅ No Python changes to analyze")
+            return
+
+        scope_file = workspace / "metrics" / "diff_scope.json"
+        scope.write(scope_file)
+        extra_env[DIFF_SCOPE_ENV] = str(scope_file)
+
+    if in_process:
+        from ci.pipeline import PipelineError, run_pipeline
+        try:
+            run_pipeline(repo_root, external_python, scope_file=extra_env.get(DIFF_SCOPE_ENV), persist=persist,
+                         profile=profile)
+        except PipelineError as e:
+            raise CIError(str(e))
+        print("\n✅ CI ANALYSIS COMPLETE")
+        return
+
+    run_step("ml.build_validation_dataset", project_root, repo_root, extra_env=extra_env, profile=profile)
+
+    if base and count_rows(workspace / "metrics" / "long_method_validation_dataset.csv") == 0:
+        print("\n✅ No changed functions to analyze")
+        return
+
+    run_step("ml.inference", project_root, repo_root, extra_env=extra_env, profile=profile)
+    run_step("analysis.coverage", project_root, repo_root, python=external_python, extra_env=extra_env,
+             profile=profile)
+    run_step("analysis.post_ml_aggregate", project_root, repo_root, extra_env=extra_env, profile=profile)
+    run_step("reporting.reporting_ci", project_root, repo_root, extra_env=extra_env, profile=profile)
 
     print("\n✅ CI ANALYSIS COMPLETE")
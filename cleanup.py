@@ -86,7 +86,7 @@ def main():
     
 
     # 3️⃣ Remove coverage artifacts under data/
-    for pattern in ["*_coverage.json", "coverage.json", ".coverage"]:
+    for pattern in ["*_coverage.json", "coverage.json", "*coverage.lines.z", "*coverage.branches.z", "*test_impact.sqlite", ".coverage"]:
         for p in DATA_DIR.rglob(pattern):
             remove_path(p)
         for p in CI_WORKSPACE.rglob(pattern):
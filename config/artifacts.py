@@ -0,0 +1,125 @@
+"""
+artifacts.py
+(On-disk format of the pipeline's tabular artifacts)
+
+Metrics datasets, predictions and final results are CSV by default. Setting
+ARTIFACT_FORMAT=parquet (or passing fmt="parquet") writes them as Parquet
+instead: typed columns, zstd compression and categorical smell_label /
+risk_category / coverage_bucket. Callers keep passing the usual *.csv paths;
+artifact_path() swaps the suffix for the selected format.
+
+Parquet needs pyarrow (`pip install pyarrow`); CSV has no extra dependency.
+"""
+import csv
+import os
+from pathlib import Path
+
+import pandas as pd
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+ARTIFACT_FORMAT = os.getenv("ARTIFACT_FORMAT", "csv").lower()
+
+PARQUET_COMPRESSION = "zstd"
+
+# Low-cardinality label columns stored as categoricals in Parquet
+CATEGORICAL_COLUMNS = {
+    "smell_label": ["HIGH", "LOW"],
+    "coverage_bucket": ["ZERO", "LOW", "MEDIUM", "HIGH"],
+    "risk_category": ["Hidden Risk", "Refactor Candidate", "Low Value", "Safe Zone"],
+}
+
+
+class ArtifactFormatError(Exception):
+    pass
+
+
+def resolve_format(fmt=None) -> str:
+    fmt = (fmt or ARTIFACT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise ArtifactFormatError(f"Unknown artifact format '{fmt}'. Available: {', '.join(FORMATS)}")
+    return fmt
+
+
+def artifact_path(path, fmt=None) -> Path:
+    """The artifact's on-disk path for the given format (suffix swapped)."""
+    return Path(path).with_suffix(FORMATS[resolve_format(fmt)])
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ArtifactFormatError("ARTIFACT_FORMAT=parquet requires pyarrow (pip install pyarrow)")
+
+
+def with_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    for column, categories in CATEGORICAL_COLUMNS.items():
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            extra = sorted(set(df[column].dropna().unique()) - set(categories))
+            df[column] = pd.Categorical(df[column], categories=categories + extra)
+    return df
+
+
+def write_table(df: pd.DataFrame, path, fmt=None) -> Path:
+    """Writes df in the selected format; returns the path actually written."""
+    fmt = resolve_format(fmt)
+    out = artifact_path(path, fmt)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "parquet":
+        _require_pyarrow()
+        with_categoricals(df.copy()).to_parquet(out, index=False, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_csv(out, index=False)
+    return out
+
+
+def write_rows(rows, fieldnames, path, fmt=None) -> Path:
+    """
+    Writes dict rows: a list, or the dataset builders' RowBuffer, which CSV
+    streams as value tuples and Parquet converts column by column.
+    """
+    fmt = resolve_format(fmt)
+    if fmt != "csv":
+        df = rows.to_frame() if hasattr(rows, "to_frame") else pd.DataFrame(rows, columns=fieldnames)
+        return write_table(df, path, fmt)
+
+    out = artifact_path(path, fmt)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w', newline='', encoding='utf-8') as csvfile:
+        if hasattr(rows, "iter_values") and list(fieldnames) == rows.fieldnames:
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
+            writer.writerows(rows.iter_values())
+        else:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    return out
+
+
+def read_table(path, fmt=None, columns=None, **csv_kwargs) -> pd.DataFrame:
+    """Reads an artifact written by write_table/write_rows; csv_kwargs go to read_csv."""
+    fmt = resolve_format(fmt)
+    src = artifact_path(path, fmt)
+    if fmt == "parquet":
+        _require_pyarrow()
+        return pd.read_parquet(src, columns=columns)
+    return pd.read_csv(src, usecols=columns, **csv_kwargs)
+
+
+def artifact_exists(path, fmt=None) -> bool:
+    return artifact_path(path, fmt).exists()
+
+
+def count_rows(path, fmt=None) -> int:
+    """Data rows in an artifact without loading it (0 if missing)."""
+    fmt = resolve_format(fmt)
+    src = artifact_path(path, fmt)
+    if not src.exists():
+        return 0
+    if fmt == "parquet":
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(src).metadata.num_rows
+    with open(src, newline="", encoding="utf-8") as f:
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
@@ -0,0 +1,43 @@
+"""
+discovery.py
+(Which files of a repository the pipeline analyzes)
+
+Glob lists used by ml/discovery.py, matched against repo-relative posix paths
+the way .gitignore patterns are:
+  - a pattern without "/" matches any single path component
+    ("tests" prunes every tests/ directory, "test_*.py" any such file)
+  - a pattern starting with "/" is anchored at the repo root ("/build")
+  - any other pattern with "/" matches the whole relative path
+Matching is case-insensitive ("tests" also prunes Tests/).
+
+DISCOVERY_EXCLUDE adds comma-separated globs to every profile, e.g.
+DISCOVERY_EXCLUDE="migrations,*_pb2.py".
+"""
+import os
+
+INCLUDE_GLOBS = ["*.py"]
+
+# Never analyzed: VCS/tool dirs, virtualenvs, build output, vendored code
+SKIP_GLOBS = [
+    ".*", "__pycache__", "site-packages", "node_modules", "venv", "*.egg-info",
+    "/build", "/dist", "vendor", "_vendor", "vendored", "third_party",
+]
+
+# Test code (validation and CI analyze production code only)
+TEST_GLOBS = [
+    "test", "tests", "testing", "_test", "_tests", "_testing", "_test_*", "test_*", "*_test", "*_tests",
+    "test_*.py", "*_test.py", "conftest.py", "strategies.py",
+]
+
+EXTRA_EXCLUDE_GLOBS = [g.strip() for g in os.getenv("DISCOVERY_EXCLUDE", "").split(",") if g.strip()]
+
+DISCOVERY_PROFILES = {
+    # Training mines every function outside test directories
+    "training": SKIP_GLOBS + ["test", "tests"] + EXTRA_EXCLUDE_GLOBS,
+    "validation": SKIP_GLOBS + TEST_GLOBS + EXTRA_EXCLUDE_GLOBS,
+    # Every Python file, tests included (e.g. mapping test IDs to files)
+    "all": SKIP_GLOBS + EXTRA_EXCLUDE_GLOBS,
+}
+
+# DISCOVERY_GIT=0 forces the os.scandir walk even inside git checkouts
+USE_GIT = os.getenv("DISCOVERY_GIT", "1") == "1"
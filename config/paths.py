@@ -33,6 +33,12 @@ CI_WORKSPACE_METRICS = CI_WORKSPACE / "metrics"
 CI_WORKSPACE_PROCESSED = CI_WORKSPACE / "processed"
 CI_WORKSPACE_REPORTS = CI_WORKSPACE / "reports"
 
+# Per-repo logs of parallel coverage runs (see analysis/parallel_coverage.py)
+COVERAGE_LOGS_DIR = DATA_DIR / "logs" / "coverage"
+
+# Content-hash keyed per-file metrics cache (see ml/metrics_cache.py)
+METRICS_CACHE_FILE = CI_WORKSPACE_METRICS / "metrics_cache.sqlite"
+
 # Repos for dataset
 TRAINING_REPOS = {
     "requests",
@@ -0,0 +1,45 @@
+"""
+scoring.py
+(Weights of the risk score that ranks final_results_topk)
+
+    risk_score = product of term ** weight
+
+over the terms computed in analysis/risk.py, so a weight of 0 drops a term
+and 2 makes it count twice. Override with RISK_WEIGHTS, e.g.
+
+    RISK_WEIGHTS="ml_confidence=1,uncovered_lines=2,cc=1,missing_branches=0"
+
+Terms not listed keep their default weight.
+"""
+import os
+
+DEFAULT_RISK_WEIGHTS = {
+    "ml_confidence": 1.0,     # P(smelly) from the model
+    "uncovered_lines": 1.0,   # lines no test executed, + 1
+    "cc": 1.0,                # cyclomatic complexity
+    "missing_branches": 0.5,  # branch exits never taken, + 1 (1 without branch data)
+}
+
+
+class ScoringConfigError(ValueError):
+    pass
+
+
+def parse_risk_weights(spec: str) -> dict:
+    weights = dict(DEFAULT_RISK_WEIGHTS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in DEFAULT_RISK_WEIGHTS:
+            raise ScoringConfigError(
+                f"Invalid RISK_WEIGHTS entry {item!r}; expected <term>=<weight> "
+                f"with term in {sorted(DEFAULT_RISK_WEIGHTS)}"
+            )
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise ScoringConfigError(f"Invalid weight for {name}: {value!r}")
+    return weights
+
+
+RISK_WEIGHTS = parse_risk_weights(os.getenv("RISK_WEIGHTS", ""))
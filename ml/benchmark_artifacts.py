@@ -0,0 +1,104 @@
+"""
+benchmark_artifacts.py
+(Compares CSV and Parquet artifact formats on pipeline-shaped tables)
+
+Usage:
+    python -m ml.benchmark_artifacts [--rows 100000 1000000] [--output results.json]
+
+Tables have the columns and dtypes of the shipped final_results.csv (which
+carries every column of the metrics and predictions artifacts). Each row is a
+random row of it with its own file path, method name, line range, Halstead
+values and confidence, so nothing repeats in blocks that a compressor could
+exploit. Per format it reports:
+  - save_s:  write_table wall time
+  - load_s:  read_table wall time (CSV read with encoding='latin1' as the
+             pipeline does)
+  - size_mb: file size on disk
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.artifacts import FORMATS, read_table, write_table
+from config.paths import PROCESSED_DATA_DIR
+
+SOURCE_TABLE = PROCESSED_DATA_DIR / "final_results.csv"
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+# Functions per synthetic file
+FUNCTIONS_PER_FILE = 25
+
+
+def synthetic_table(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(SOURCE_TABLE)
+    # Whole rows are drawn so labels, buckets and recommendations stay consistent
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+
+    file_ids = np.sort(rng.integers(0, max(rows // FUNCTIONS_PER_FILE, 1), rows))
+    df["file_path"] = [f"src/pkg_{i % 97}/module_{i}.py" for i in file_ids]
+    df["method_name"] = df["method_name"] + "_" + pd.Series(rng.integers(0, max(rows // 4, 1), rows)).astype(str)
+    length = df["end_line"] - df["start_line"]
+    df["start_line"] = rng.integers(1, 3000, rows)
+    df["end_line"] = df["start_line"] + length
+
+    # Halstead values keep radon's relations: effort = volume * difficulty,
+    # time = effort / 18, bugs = volume / 3000
+    has_operators = df["volume"].to_numpy() > 0
+    df["volume"] = np.where(has_operators, df["volume"] * rng.lognormal(0, 0.3, rows), 0.0)
+    df["difficulty"] = np.where(has_operators, df["difficulty"] * rng.lognormal(0, 0.3, rows), 0.0)
+    df["effort"] = df["volume"] * df["difficulty"]
+    df["time"] = df["effort"] / 18
+    df["bugs"] = df["volume"] / 3000
+    df["ml_confidence"] = np.clip(df["ml_confidence"] * rng.lognormal(0, 0.2, rows), 0, 1).round(4)
+    return df
+
+
+def benchmark_format(df, fmt, workdir):
+    path = Path(workdir) / "artifact.csv"
+
+    t0 = time.perf_counter()
+    written = write_table(df, path, fmt)
+    save_s = time.perf_counter() - t0
+
+    kwargs = {"encoding": "latin1"} if fmt == "csv" else {}
+    t0 = time.perf_counter()
+    read_table(path, fmt, **kwargs)
+    load_s = time.perf_counter() - t0
+
+    size_mb = written.stat().st_size / 1e6
+    written.unlink()
+    return {"format": fmt, "save_s": round(save_s, 3), "load_s": round(load_s, 3), "size_mb": round(size_mb, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet artifacts.")
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--output", default=None, help="Optional JSON file for the results")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="artifact_bench_") as workdir:
+        for rows in args.rows:
+            print(f"⏱️  {rows} rows ...")
+            df = synthetic_table(rows)
+            for fmt in FORMATS:
+                results.append({"rows": rows, **benchmark_format(df, fmt, workdir)})
+
+    report = pd.DataFrame(results).set_index(["rows", "format"])
+    print("\n--- Artifact format benchmark ---")
+    print(report.to_string())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
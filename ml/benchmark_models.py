@@ -0,0 +1,102 @@
+"""
+benchmark_models.py
+(Compares registered smell classifiers on the shipped training CSV)
+
+Usage:
+    python -m ml.benchmark_models [--models svc_rbf logreg ...] [--output results.json]
+
+Uses the same 80/20 stratified split and MinMaxScaler as ml/train_model.py
+and reports, per model:
+  - train_s:         wall time of one fit on the training split
+  - infer_ms_per_1k: latency of scoring 1k functions with predict_proba, the
+                     only call ml/inference.py makes
+  - threshold:       decision threshold from fit_threshold on the training
+                     split, as ml/train_model.py stores it with the model
+  - f1, roc_auc:     on the held-out split; f1 of probability >= threshold,
+                     the labels ml/inference.py would produce
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import MinMaxScaler
+
+from config.paths import TRAINING_DATA_DIR
+from config.artifacts import read_table
+from ml.model_registry import MODEL_REGISTRY, build_model, fit_threshold
+
+train_file = TRAINING_DATA_DIR / "long_method_training_dataset.csv"
+necessary_features = ['scloc', 'lloc', 'effort', 'time', 'bugs', 'volume', 'difficulty', 'calculated_length']
+target_column = 'is_Long_Method'
+
+# Scoring set size for latency; test rows are tiled up to this many
+LATENCY_ROWS = 20_000
+
+
+def benchmark_model(name, X_train, y_train, X_test, y_test):
+    clf = build_model(name)
+
+    t0 = time.perf_counter()
+    clf.fit(X_train, y_train)
+    train_s = time.perf_counter() - t0
+
+    threshold = fit_threshold(clf, X_train)
+    probs = clf.predict_proba(X_test)[:, 1]
+    preds = (probs >= threshold).astype(int)
+
+    X_latency = np.resize(X_test, (LATENCY_ROWS, X_test.shape[1]))
+    t0 = time.perf_counter()
+    clf.predict_proba(X_latency)
+    infer_s = time.perf_counter() - t0
+
+    return {
+        "model": name,
+        "train_s": round(train_s, 4),
+        "infer_ms_per_1k": round(infer_s / LATENCY_ROWS * 1000 * 1000, 3),
+        "threshold": threshold,
+        "f1": round(f1_score(y_test, preds), 4),
+        "roc_auc": round(roc_auc_score(y_test, probs), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark registered smell classifiers.")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODEL_REGISTRY), default=list(MODEL_REGISTRY))
+    parser.add_argument("--output", default=None, help="Optional JSON file for the results")
+    args = parser.parse_args(argv)
+
+    df = read_table(train_file, encoding='latin1')
+    X = df[necessary_features]
+    y = df[target_column]
+    X_train_raw, X_test_raw, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    scaler = MinMaxScaler()
+    X_train = scaler.fit_transform(X_train_raw)
+    X_test = scaler.transform(X_test_raw)
+
+    results = []
+    for name in args.models:
+        print(f"⏱️  Benchmarking {name} ...")
+        results.append(benchmark_model(name, X_train, y_train, X_test, y_test))
+
+    report = pd.DataFrame(results).set_index("model")
+    baseline = report.loc["svc_rbf"] if "svc_rbf" in report.index else None
+    if baseline is not None:
+        report["train_speedup"] = (baseline["train_s"] / report["train_s"]).round(1)
+        report["infer_speedup"] = (baseline["infer_ms_per_1k"] / report["infer_ms_per_1k"]).round(1)
+
+    print("\n--- Smell model benchmark ---")
+    print(report.to_string())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
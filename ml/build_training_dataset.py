@@ -2,21 +2,30 @@
 script_fixed_clean.py
 (All debug prints removed)
 """
-import os
-import csv
-import ast
 import random
+import argparse
 from collections import Counter
+from functools import partial
 
-from radon.complexity import cc_visit
-from radon.raw import analyze as raw_analyze
-from radon.metrics import h_visit
 from pathlib import Path
-from config.paths import TARGET_REPOS_DIR, TRAINING_DATA_DIR, TRAINING_REPOS
+from config.paths import TARGET_REPOS_DIR, TRAINING_DATA_DIR, TRAINING_REPOS, METRICS_CACHE_FILE
+from config.artifacts import ARTIFACT_FORMAT, FORMATS, write_rows
+from ml.row_buffer import RowBuffer
+from ml.parallel import process_files, default_jobs, pop_skipped, write_skipped_report, MAX_FILE_BYTES, FILE_TIMEOUT
+from ml.metrics_engine import FileMetrics, get_node_end_lineno
+from ml.metrics_cache import open_cache, cached_file_rows
+from ml.discovery import discover_files
+from ci.instrumentation import phase, pop_phases, span
 
 # ---------- CONFIG ----------
 OUTPUT_CSV_FILE = TRAINING_DATA_DIR / "long_method_training_dataset.csv"
 
+CACHE_FILE = METRICS_CACHE_FILE
+CACHE_NAMESPACE = "training"
+
+# Files skipped over the per-file size / time budgets (ml/parallel.py)
+SKIPPED_FILES_CSV = TRAINING_DATA_DIR / "long_method_training_skipped_files.csv"
+
 # ---------- TRAINING REPOS ----------
 # TRAINING_REPOS = {"requests", "flask", "click"}
 
@@ -34,125 +43,46 @@ FIELDNAMES = [
     'effort', 'time', 'bugs'
 ]
 
-# ---------- Utilities ----------
-
-def is_test_path(path: str) -> bool:
-    p = path.lower()
-    return (
-        "/test/" in p or
-        "/tests/" in p or
-        "\\test\\" in p or
-        "\\tests\\" in p
-    )
-
-
-def get_node_end_lineno(node):
-    end = getattr(node, 'end_lineno', None)
-    if end is not None:
-        return end
-    max_lineno = getattr(node, 'lineno', None)
-    for child in ast.walk(node):
-        if hasattr(child, 'lineno'):
-            try:
-                if child.lineno and (max_lineno is None or child.lineno > max_lineno):
-                    max_lineno = child.lineno
-            except Exception:
-                pass
-    return max_lineno
-
-
-def overlap_length(a_start, a_end, b_start, b_end):
-    if a_start is None or a_end is None or b_start is None or b_end is None:
-        return 0
-    start = max(a_start, b_start)
-    end = min(a_end, b_end)
-    return max(0, end - start + 1)
-
-
-def match_cc_block_for_node(cc_blocks, node_start, node_end):
-    best_block = None
-    best_overlap = 0
-    for block in cc_blocks:
-        b_start = getattr(block, 'lineno', None)
-        b_end = getattr(block, 'endline', None)
-        if b_end is None:
-            b_end = b_start
-        ol = overlap_length(node_start, node_end, b_start, b_end)
-        if ol > best_overlap:
-            best_overlap = ol
-            best_block = block
-    if best_block is None or best_overlap == 0:
-        return None
-    try:
-        return best_block.complexity
-    except Exception:
-        return getattr(best_block, 'complexity', getattr(best_block, 'cc', None))
-
-
-def get_method_source(content, node):
-    try:
-        src = ast.get_source_segment(content, node)
-        if src:
-            return src
-    except Exception:
-        pass
-    lines = content.splitlines(keepends=True)
-    start = getattr(node, 'lineno', None)
-    end = get_node_end_lineno(node)
-    if start is None or end is None:
-        return None
-    try:
-        return ''.join(lines[start - 1:end])
-    except Exception:
-        return None
-
 # ---------- Label -----------
 
 def get_smell_label(lloc, cc):
     return 1 if (lloc is not None and cc is not None and (lloc > LLOC_THRESHOLD and cc > CC_THRESHOLD)) else 0
 
+
+def label_rows(rows):
+    # Labelled after the cache lookup: cached rows hold metrics only, so
+    # changing the thresholds never serves stale labels
+    for row in rows:
+        row['is_Long_Method'] = get_smell_label(row['lloc'], row['CC'])
+    return rows
+
 # ---------- Analysis per method ----------
 
-def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
+def analyze_method(node, file_metrics, file_path, counters=None):
     method_name = node.name
     node_start = getattr(node, 'lineno', None)
     node_end = get_node_end_lineno(node)
-    method_code = get_method_source(file_content, node)
-    if not method_code:
-        if counters is not None:
-            counters['skip_source'] += 1
-        return None
-    cc = match_cc_block_for_node(full_cc_list, node_start, node_end)
+    cc = file_metrics.complexity(node)
     if cc is None:
         if counters is not None:
             counters['skip_cc'] += 1
         return None
     try:
-        raw = raw_analyze(method_code)
-        lloc = getattr(raw, 'lloc', None)
-        scloc = getattr(raw, 'sloc', None) or getattr(raw, 'sloc', 0)
-        comments = getattr(raw, 'comments', 0)
+        with phase(counters, 'raw'):
+            lloc, scloc, comments = file_metrics.raw_metrics(node)
     except Exception:
         if counters is not None:
             counters['skip_raw'] += 1
         return None
     try:
-        hal_reports = h_visit(method_code)
-        if hal_reports:
-            hal = hal_reports[0]
-            calculated_length = getattr(hal, 'length', None)
-            if calculated_length is None:
-                N1 = getattr(hal, 'N1', None)
-                N2 = getattr(hal, 'N2', None)
-                if N1 is not None and N2 is not None:
-                    calculated_length = N1 + N2
-            volume = getattr(hal, 'volume', None)
-            difficulty = getattr(hal, 'difficulty', None)
-            effort = getattr(hal, 'effort', None)
-            time_metric = getattr(hal, 'time', None)
-            bugs = getattr(hal, 'bugs', None)
-        else:
-            calculated_length = volume = difficulty = effort = time_metric = bugs = None
+        with phase(counters, 'radon_halstead'):
+            hal = file_metrics.halstead(node)
+        calculated_length = hal.length
+        volume = hal.volume
+        difficulty = hal.difficulty
+        effort = hal.effort
+        time_metric = hal.time
+        bugs = hal.bugs
     except Exception:
         if counters is not None:
             counters['skip_halstead'] += 1
@@ -164,7 +94,6 @@ def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
         'Method_Name': method_name,
         'start_line': node_start,
         'end_line': node_end,
-        'is_Long_Method': get_smell_label(lloc, cc),
         'CC': cc,
         'lloc': lloc,
         'scloc': scloc,
@@ -179,8 +108,7 @@ def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
 
 # ---------- File processing ----------
 
-def process_file(file_path, counters=None):
-    rows = []
+def process_file(file_path, counters=None, cache_path=None):
     if counters is None:
         counters = Counter()
     try:
@@ -188,30 +116,44 @@ def process_file(file_path, counters=None):
             content = fh.read()
     except Exception:
         counters['fail_read'] += 1
-        return rows
+        return []
+    cache = open_cache(cache_path, CACHE_NAMESPACE) if cache_path else None
+    return label_rows(cached_file_rows(cache, content, file_path, counters, analyze_file))
+
+
+def analyze_file(content, file_path, counters):
+    rows = []
     try:
-        tree = ast.parse(content)
+        file_metrics = FileMetrics(content, counters)
     except Exception:
         counters['fail_parse'] += 1
         return rows
-    try:
-        full_cc_list = cc_visit(content)
-    except Exception:
+    if file_metrics.cc_error is not None:
         counters['fail_cc_visit'] += 1
-        full_cc_list = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            res = analyze_method(node, content, full_cc_list, file_path, counters=counters)
-            if res:
-                rows.append(res)
+    for node in file_metrics.function_nodes():
+        res = analyze_method(node, file_metrics, file_path, counters=counters)
+        if res:
+            rows.append(res)
     return rows
 
 # ---------- Build dataset ----------
 
-def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
-    all_rows = []
+def collect_source_files(repo_path):
+    # Everything outside test/ and tests/ directories (and vendored/generated trees)
+    return discover_files(repo_path, profile="training")
+
+
+def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE, jobs=None, cache_path=CACHE_FILE, fmt=None,
+                  max_file_bytes=MAX_FILE_BYTES, file_timeout=FILE_TIMEOUT):
+    all_rows = RowBuffer(FIELDNAMES)
+    skipped = []
     counters = Counter()
 
+    process_fn = process_file
+    if cache_path:
+        open_cache(cache_path, CACHE_NAMESPACE).prune()
+        process_fn = partial(process_file, cache_path=cache_path)
+
     for repo_path in projects_root.iterdir():
         if not repo_path.is_dir():
             continue
@@ -223,20 +165,25 @@ def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
 
         print(f"Processing training repo: {repo_name}")
 
-        for root, dirs, files in os.walk(repo_path):
-            if is_test_path(root):
-                continue
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    rows = process_file(file_path, counters=counters)
-                    all_rows.extend(rows)
-
-    # ---- sampling logic unchanged ----
-    smelly_list = [r for r in all_rows if r.get('is_Long_Method') == 1]
-    non_smelly_list = [r for r in all_rows if r.get('is_Long_Method') == 0]
+        with span("metrics", repo=repo_name) as s:
+            with span("discovery"):
+                file_paths = collect_source_files(repo_path)
+            rows, repo_counters = process_files(
+                process_fn, file_paths, jobs=jobs, max_bytes=max_file_bytes, timeout=file_timeout,
+                fieldnames=FIELDNAMES,
+            )
+            skipped.extend(pop_skipped(repo_counters))
+            s.set(files_scanned=len(file_paths), functions=len(rows), **pop_phases(repo_counters))
+            s.set(cache_hit=repo_counters['cache_hit'], cache_miss=repo_counters['cache_miss'])
+            s.set(skip_too_large=repo_counters['skip_too_large'], skip_timeout=repo_counters['skip_timeout'])
+        all_rows.extend(rows)
+        counters.update(repo_counters)
+
+    write_skipped_report(skipped, SKIPPED_FILES_CSV)
+
+    # ---- sampling logic unchanged, on row indices ----
+    smelly_list = all_rows.indices_where('is_Long_Method', 1)
+    non_smelly_list = all_rows.indices_where('is_Long_Method', 0)
 
     if len(smelly_list) > MAX_SMELLY_SAMPLES:
         smelly_sampled = random.sample(smelly_list, MAX_SMELLY_SAMPLES)
@@ -248,21 +195,52 @@ def build_dataset(projects_root=TARGET_REPOS_DIR, output_csv=OUTPUT_CSV_FILE):
     else:
         non_smelly_sampled = non_smelly_list
 
-    final_data = smelly_sampled + non_smelly_sampled
+    final_data = [*smelly_sampled, *non_smelly_sampled]
     random.shuffle(final_data)
 
     print(f"Smelly samples collected: {len(smelly_sampled)}")
     print(f"Non-smelly samples collected: {len(non_smelly_sampled)}")
     print(f"Final dataset size: {len(final_data)}")
+    print("Counters:", dict(counters))
 
-    output_csv.parent.mkdir(parents=True, exist_ok=True)
+    write_rows(all_rows.take(final_data), FIELDNAMES, output_csv, fmt)
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerows(final_data)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and label per-method metrics for training repos.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=default_jobs(),
+        help="Worker processes for metric extraction (default: CPU count, 1 = serial)",
+    )
+    parser.add_argument(
+        "--cache", type=Path, default=CACHE_FILE,
+        help=f"Metrics cache database (default: {CACHE_FILE})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Re-analyze every file without reading or writing the metrics cache",
+    )
+    parser.add_argument(
+        "--format", choices=sorted(FORMATS), default=ARTIFACT_FORMAT,
+        help=f"Output artifact format (default: ARTIFACT_FORMAT env var or csv, currently {ARTIFACT_FORMAT})",
+    )
+    parser.add_argument(
+        "--max-file-bytes", type=int, default=MAX_FILE_BYTES,
+        help=f"Skip larger files (default: METRICS_MAX_FILE_BYTES or {MAX_FILE_BYTES}, 0 = no limit)",
+    )
+    parser.add_argument(
+        "--file-timeout", type=float, default=FILE_TIMEOUT,
+        help=(f"Seconds allowed per file before its worker is killed and the file skipped "
+              f"(default: METRICS_FILE_TIMEOUT or {FILE_TIMEOUT:g}, 0 = no limit)"),
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    build_dataset()
+    args = parse_args()
+    with span("training_dataset"):
+        build_dataset(
+            jobs=args.jobs, cache_path=None if args.no_cache else args.cache, fmt=args.format,
+            max_file_bytes=args.max_file_bytes, file_timeout=args.file_timeout,
+        )
 
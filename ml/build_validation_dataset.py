@@ -4,15 +4,20 @@ script_metrics_only.py
 (Extracts metrics for all methods, no classification, no sampling)
 """
 import os
-import csv
-import ast
+import argparse
 from collections import Counter
+from functools import partial
 
-from radon.complexity import cc_visit
-from radon.raw import analyze as raw_analyze
-from radon.metrics import h_visit
 from pathlib import Path
-from config.paths import TARGET_REPOS_DIR, VALIDATION_DATA_DIR, VALIDATION_REPOS
+from config.paths import TARGET_REPOS_DIR, VALIDATION_DATA_DIR, VALIDATION_REPOS, METRICS_CACHE_FILE
+from config.artifacts import ARTIFACT_FORMAT, FORMATS, write_rows
+from ml.row_buffer import RowBuffer
+from ml.parallel import process_files, default_jobs, pop_skipped, write_skipped_report, MAX_FILE_BYTES, FILE_TIMEOUT
+from ml.metrics_engine import FileMetrics, get_node_end_lineno
+from ml.metrics_cache import open_cache, cached_file_rows
+from ml.discovery import discover_files
+from ci.diff_scope import load_diff_scope
+from ci.instrumentation import phase, pop_phases, span
 
 CI_MODE = os.getenv("CI_MODE") == "1"
 CI_WORKSPACE = Path(os.getenv("CI_WORKSPACE", VALIDATION_DATA_DIR))
@@ -23,6 +28,12 @@ TARGET_REPO = Path(os.getenv("TARGET_REPO", TARGET_REPOS_DIR))
 OUTPUT_CSV_FILE = VALIDATION_DATA_DIR / "long_method_validation_dataset.csv"
 OUTPUT_CSV_FILE = (CI_WORKSPACE / "metrics" / "long_method_validation_dataset.csv") if CI_MODE else OUTPUT_CSV_FILE
 
+CACHE_FILE = (CI_WORKSPACE / "metrics" / METRICS_CACHE_FILE.name) if CI_MODE else METRICS_CACHE_FILE
+
+# Files skipped over the per-file size / time budgets (ml/parallel.py)
+SKIPPED_FILES_CSV = OUTPUT_CSV_FILE.with_name("long_method_validation_skipped_files.csv")
+CACHE_NAMESPACE = "validation"
+
 
 FIELDNAMES = [
     'File_Path', 'Method_Name', 'start_line', 'end_line',
@@ -31,127 +42,36 @@ FIELDNAMES = [
     'effort', 'time', 'bugs'
 ]
 
-# ---------- Utilities ----------
-
-def is_test_path(path: str, filename: str = "") -> bool:
-    p = path.lower()
-    f = filename.lower()
-    
-    # Check directory
-    is_test_dir = any(x in p for x in ["/test", "/testing", "/_test", "site-packages"])
-    
-    # Check filename
-    is_test_file = f.startswith("test_") or f.endswith("_test.py") or f == "conftest.py" or f == "strategies.py"
-    
-    return is_test_dir or is_test_file
-
-
-def get_node_end_lineno(node):
-    end = getattr(node, 'end_lineno', None)
-    if end is not None:
-        return end
-    max_lineno = getattr(node, 'lineno', None)
-    for child in ast.walk(node):
-        if hasattr(child, 'lineno'):
-            try:
-                if child.lineno and (max_lineno is None or child.lineno > max_lineno):
-                    max_lineno = child.lineno
-            except Exception:
-                pass
-    return max_lineno
-
-
-def overlap_length(a_start, a_end, b_start, b_end):
-    if a_start is None or a_end is None or b_start is None or b_end is None:
-        return 0
-    start = max(a_start, b_start)
-    end = min(a_end, b_end)
-    return max(0, end - start + 1)
-
-
-def match_cc_block_for_node(cc_blocks, node_start, node_end):
-    best_block = None
-    best_overlap = 0
-    for block in cc_blocks:
-        b_start = getattr(block, 'lineno', None)
-        b_end = getattr(block, 'endline', None)
-        if b_end is None:
-            b_end = b_start
-        ol = overlap_length(node_start, node_end, b_start, b_end)
-        if ol > best_overlap:
-            best_overlap = ol
-            best_block = block
-    if best_block is None or best_overlap == 0:
-        return None
-    try:
-        return best_block.complexity
-    except Exception:
-        return getattr(best_block, 'complexity', getattr(best_block, 'cc', None))
-
-
-def get_method_source(content, node):
-    try:
-        src = ast.get_source_segment(content, node)
-        if src:
-            return src
-    except Exception:
-        pass
-    lines = content.splitlines(keepends=True)
-    start = getattr(node, 'lineno', None)
-    end = get_node_end_lineno(node)
-    if start is None or end is None:
-        return None
-    try:
-        return ''.join(lines[start - 1:end])
-    except Exception:
-        return None
-
 # ---------- Analysis per method ----------
 
-def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
+def analyze_method(node, file_metrics, file_path, counters=None):
     method_name = node.name
     node_start = getattr(node, 'lineno', None)
     node_end = get_node_end_lineno(node)
 
-    method_code = get_method_source(file_content, node)
-    if not method_code:
-        if counters is not None:
-            counters['skip_source'] += 1
-        return None
-
-    cc = match_cc_block_for_node(full_cc_list, node_start, node_end)
+    cc = file_metrics.complexity(node)
     if cc is None:
         if counters is not None:
             counters['skip_cc'] += 1
         return None
 
     try:
-        raw = raw_analyze(method_code)
-        lloc = getattr(raw, 'lloc', None)
-        scloc = getattr(raw, 'sloc', None) or getattr(raw, 'sloc', 0)
-        comments = getattr(raw, 'comments', 0)
+        with phase(counters, 'raw'):
+            lloc, scloc, comments = file_metrics.raw_metrics(node)
     except Exception:
         if counters is not None:
             counters['skip_raw'] += 1
         return None
 
     try:
-        hal_reports = h_visit(method_code)
-        if hal_reports:
-            hal = hal_reports[0]
-            calculated_length = getattr(hal, 'length', None)
-            if calculated_length is None:
-                N1 = getattr(hal, 'N1', None)
-                N2 = getattr(hal, 'N2', None)
-                if N1 is not None and N2 is not None:
-                    calculated_length = N1 + N2
-            volume = getattr(hal, 'volume', None)
-            difficulty = getattr(hal, 'difficulty', None)
-            effort = getattr(hal, 'effort', None)
-            time_metric = getattr(hal, 'time', None)
-            bugs = getattr(hal, 'bugs', None)
-        else:
-            calculated_length = volume = difficulty = effort = time_metric = bugs = None
+        with phase(counters, 'radon_halstead'):
+            hal = file_metrics.halstead(node)
+        calculated_length = hal.length
+        volume = hal.volume
+        difficulty = hal.difficulty
+        effort = hal.effort
+        time_metric = hal.time
+        bugs = hal.bugs
     except Exception:
         if counters is not None:
             counters['skip_halstead'] += 1
@@ -179,8 +99,7 @@ def analyze_method(node, file_content, full_cc_list, file_path, counters=None):
 
 # ---------- File processing ----------
 
-def process_file(file_path, counters=None):
-    rows = []
+def process_file(file_path, counters=None, cache_path=None):
     if counters is None:
         counters = Counter()
     try:
@@ -188,34 +107,54 @@ def process_file(file_path, counters=None):
             content = fh.read()
     except Exception:
         counters['fail_read'] += 1
-        return rows
+        return []
+
+    cache = open_cache(cache_path, CACHE_NAMESPACE) if cache_path else None
+    return cached_file_rows(cache, content, file_path, counters, analyze_file)
 
+
+def analyze_file(content, file_path, counters):
+    rows = []
     try:
-        tree = ast.parse(content)
+        file_metrics = FileMetrics(content, counters)
     except Exception:
         counters['fail_parse'] += 1
         return rows
 
-    try:
-        full_cc_list = cc_visit(content)
-    except Exception:
+    if file_metrics.cc_error is not None:
         counters['fail_cc_visit'] += 1
-        full_cc_list = []
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            res = analyze_method(node, content, full_cc_list, file_path, counters=counters)
-            if res:
-                rows.append(res)
+    for node in file_metrics.function_nodes():
+        res = analyze_method(node, file_metrics, file_path, counters=counters)
+        if res:
+            rows.append(res)
     return rows
 
 # ---------- Build dataset ----------
 
-def build_dataset(projects_root=TARGET_REPO, output_csv=OUTPUT_CSV_FILE):
-    all_rows = []
+def collect_source_files(repo_path):
+    # Production code only: tests, vendored and generated trees are excluded
+    return discover_files(repo_path, profile="validation")
+
+
+def collect_rows(projects_root=TARGET_REPO, jobs=None, cache_path=CACHE_FILE,
+                 max_file_bytes=MAX_FILE_BYTES, file_timeout=FILE_TIMEOUT, skipped_csv=SKIPPED_FILES_CSV,
+                 single_repo=CI_MODE, diff_scope=None):
+    """
+    Metric rows (a RowBuffer) for every in-scope function, plus the run's counters.
+    single_repo scans projects_root as one repo (CI) instead of the validation
+    repos under it; a diff_scope keeps only the changed functions.
+    """
+    all_rows = RowBuffer(FIELDNAMES)
+    skipped = []
     counters = Counter()
 
-    if CI_MODE:
+    process_fn = process_file
+    if cache_path:
+        open_cache(cache_path, CACHE_NAMESPACE).prune()
+        process_fn = partial(process_file, cache_path=cache_path)
+
+    if single_repo:
         print(f"🔍 CI Mode: scanning repo {projects_root}")
 
         repo_paths = [projects_root]  # Treat as single repo
@@ -228,32 +167,91 @@ def build_dataset(projects_root=TARGET_REPO, output_csv=OUTPUT_CSV_FILE):
     for repo_path in repo_paths:
         print(f"Processing repo: {repo_path.name}")
 
-        for root, dirs, files in os.walk(repo_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.') and "test" not in d.lower()]
-
-            if is_test_path(root):
-                continue
-
-            for file in files:
-                if file.endswith(".py") and not is_test_path(root, file):
-                    file_path = os.path.join(root, file)
-                    rows = process_file(file_path, counters=counters)
-                    all_rows.extend(rows)
-
-
+        with span("metrics", repo=repo_path.name) as s:
+            with span("discovery"):
+                file_paths = collect_source_files(repo_path)
+            s.set(files_discovered=len(file_paths))
+            if diff_scope is not None:
+                file_paths = [p for p in file_paths if diff_scope.contains_file(p)]
+                print(f"🔀 Diff scope vs {diff_scope.base}: {len(file_paths)} changed files")
+
+            rows, repo_counters = process_files(
+                process_fn, file_paths, jobs=jobs, max_bytes=max_file_bytes, timeout=file_timeout,
+                fieldnames=FIELDNAMES,
+            )
+            skipped.extend(pop_skipped(repo_counters))
+            if diff_scope is not None:
+                in_scope = [
+                    i for i, r in enumerate(rows)
+                    if diff_scope.overlaps(r['File_Path'], r['start_line'], r['end_line'])
+                ]
+                repo_counters['skip_outside_diff'] += len(rows) - len(in_scope)
+                rows = rows.take(in_scope)
+
+            # Phase seconds are summed over files, so over all workers with --jobs > 1
+            s.set(files_scanned=len(file_paths), functions=len(rows), **pop_phases(repo_counters))
+            s.set(cache_hit=repo_counters['cache_hit'], cache_miss=repo_counters['cache_miss'])
+            s.set(skip_too_large=repo_counters['skip_too_large'], skip_timeout=repo_counters['skip_timeout'])
+
+        all_rows.extend(rows)
+        counters.update(repo_counters)
+
+    write_skipped_report(skipped, skipped_csv)
     print(f"Total methods collected: {len(all_rows)}")
+    return all_rows, counters
+
 
-    output_csv.parent.mkdir(parents=True, exist_ok=True)
+def write_dataset(rows, output_csv=OUTPUT_CSV_FILE, fmt=None):
+    written = write_rows(rows, FIELDNAMES, output_csv, fmt)
+    print(f"Dataset written to: {written}")
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerows(all_rows)
 
-    print(f"Dataset written to: {output_csv}")
+def build_dataset(projects_root=TARGET_REPO, output_csv=OUTPUT_CSV_FILE, jobs=None, cache_path=CACHE_FILE, fmt=None,
+                  max_file_bytes=MAX_FILE_BYTES, file_timeout=FILE_TIMEOUT):
+    with span("validation_dataset"):
+        all_rows, counters = collect_rows(
+            projects_root, jobs=jobs, cache_path=cache_path,
+            max_file_bytes=max_file_bytes, file_timeout=file_timeout,
+            diff_scope=load_diff_scope() if CI_MODE else None,
+        )
+        with span("write", rows=len(all_rows)):
+            write_dataset(all_rows, output_csv, fmt)
     print("Counters:", dict(counters))
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract per-method metrics for validation repos.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=default_jobs(),
+        help="Worker processes for metric extraction (default: CPU count, 1 = serial)",
+    )
+    parser.add_argument(
+        "--cache", type=Path, default=CACHE_FILE,
+        help=f"Metrics cache database (default: {CACHE_FILE})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Re-analyze every file without reading or writing the metrics cache",
+    )
+    parser.add_argument(
+        "--format", choices=sorted(FORMATS), default=ARTIFACT_FORMAT,
+        help=f"Output artifact format (default: ARTIFACT_FORMAT env var or csv, currently {ARTIFACT_FORMAT})",
+    )
+    parser.add_argument(
+        "--max-file-bytes", type=int, default=MAX_FILE_BYTES,
+        help=f"Skip larger files (default: METRICS_MAX_FILE_BYTES or {MAX_FILE_BYTES}, 0 = no limit)",
+    )
+    parser.add_argument(
+        "--file-timeout", type=float, default=FILE_TIMEOUT,
+        help=(f"Seconds allowed per file before its worker is killed and the file skipped "
+              f"(default: METRICS_FILE_TIMEOUT or {FILE_TIMEOUT:g}, 0 = no limit)"),
+    )
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    build_dataset()
+    args = parse_args()
+    build_dataset(
+        jobs=args.jobs, cache_path=None if args.no_cache else args.cache, fmt=args.format,
+        max_file_bytes=args.max_file_bytes, file_timeout=args.file_timeout,
+    )
@@ -0,0 +1,131 @@
+"""
+check_metrics_parity.py
+(Compares the single-parse metrics engine against per-method radon analysis)
+
+Usage:
+    python -m ml.check_metrics_parity [path ...]
+
+Without arguments every pinned training repo under TARGET_REPOS_DIR is
+checked. Exits non-zero if any function's CC, raw or Halstead metrics differ
+from the reference radon computation. tests/test_metrics_parity.py runs the
+same comparison on the sample sources in tests/samples/.
+"""
+import ast
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+from radon.complexity import cc_visit
+from radon.metrics import h_visit
+from radon.raw import analyze as raw_analyze
+
+from config.paths import TARGET_REPOS_DIR, TRAINING_REPOS
+from ml.metrics_engine import FileMetrics, get_node_end_lineno, match_cc_block_for_node
+
+METRIC_COLUMNS = [
+    'CC', 'lloc', 'scloc', 'comments',
+    'calculated_length', 'volume', 'difficulty',
+    'effort', 'time', 'bugs'
+]
+
+MAX_REPORTED = 20
+
+# ---------- Reference (radon per-method snippet) ----------
+
+def reference_metrics(content, node, cc_blocks):
+    method_code = ast.get_source_segment(content, node)
+    if not method_code:
+        return None
+    cc = match_cc_block_for_node(cc_blocks, node.lineno, get_node_end_lineno(node))
+    raw = raw_analyze(method_code)
+    hal = h_visit(method_code)[0]
+    return dict(zip(METRIC_COLUMNS, [
+        cc, raw.lloc, raw.sloc, raw.comments,
+        hal.length, hal.volume, hal.difficulty, hal.effort, hal.time, hal.bugs,
+    ]))
+
+
+def engine_metrics(file_metrics, node):
+    lloc, sloc, comments = file_metrics.raw_metrics(node)
+    hal = file_metrics.halstead(node)
+    return dict(zip(METRIC_COLUMNS, [
+        file_metrics.complexity(node), lloc, sloc, comments,
+        hal.length, hal.volume, hal.difficulty, hal.effort, hal.time, hal.bugs,
+    ]))
+
+# ---------- Comparison ----------
+
+def check_file(file_path, counters, mismatches):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as fh:
+            content = fh.read()
+        file_metrics = FileMetrics(content)
+        cc_blocks = cc_visit(content)
+    except Exception:
+        counters['skip_file'] += 1
+        return
+
+    for node in file_metrics.function_nodes():
+        try:
+            expected = reference_metrics(content, node, cc_blocks)
+        except Exception:
+            # radon could not re-parse the isolated snippet; the engine can
+            counters['skip_reference'] += 1
+            continue
+        if expected is None:
+            counters['skip_reference'] += 1
+            continue
+
+        actual = engine_metrics(file_metrics, node)
+        diff = {k: (expected[k], actual[k]) for k in METRIC_COLUMNS if expected[k] != actual[k]}
+        if diff:
+            counters['mismatch'] += 1
+            mismatches.append((file_path, node.name, node.lineno, diff))
+        else:
+            counters['match'] += 1
+
+
+def iter_python_files(root):
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for file in files:
+            if file.endswith('.py'):
+                yield os.path.join(dirpath, file)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    roots = [Path(p) for p in argv] or [
+        TARGET_REPOS_DIR / name for name in sorted(TRAINING_REPOS)
+        if (TARGET_REPOS_DIR / name).is_dir()
+    ]
+    if not roots:
+        print(f"❌ No training repos found under {TARGET_REPOS_DIR}")
+        return 1
+
+    counters = Counter()
+    mismatches = []
+    for root in roots:
+        if not root.exists():
+            print(f"⚠️  NOT FOUND: {root}")
+            continue
+        print(f"Checking: {root}")
+        for file_path in iter_python_files(root):
+            check_file(file_path, counters, mismatches)
+
+    for file_path, name, lineno, diff in mismatches[:MAX_REPORTED]:
+        print(f"  ✗ {file_path}:{lineno} {name}")
+        for column, (expected, actual) in diff.items():
+            print(f"      {column}: radon={expected} engine={actual}")
+
+    print("Counters:", dict(counters))
+    if mismatches:
+        print(f"❌ {len(mismatches)} functions differ from radon")
+        return 1
+    print("✅ Metrics engine matches radon")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
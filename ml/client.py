@@ -0,0 +1,81 @@
+"""
+client.py
+(Thin stdlib-only client for ml/server.py)
+
+Usage:
+    python -m ml.client path/to/module.py [...]     # metrics + smell labels per function
+    python -m ml.client --health
+
+Imports nothing heavier than urllib, so a call costs interpreter start-up plus
+one request instead of re-importing pandas/sklearn and re-loading the model.
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+SERVER_URL = os.getenv("SMELL_SERVER_URL", "http://127.0.0.1:8765")
+
+
+class ServerUnavailable(Exception):
+    pass
+
+
+def request(endpoint, payload=None, url=SERVER_URL, timeout=30):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(
+        url.rstrip("/") + endpoint, data=data,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}")
+    except (urllib.error.URLError, OSError) as e:
+        raise ServerUnavailable(f"Smell server not reachable at {url}: {e}")
+
+
+def predict(rows, url=SERVER_URL):
+    return request("/predict", {"rows": rows}, url=url)["predictions"]
+
+
+def analyze(paths, url=SERVER_URL):
+    return request("/analyze", {"paths": [os.path.abspath(p) for p in paths]}, url=url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a running ml.server instance.")
+    parser.add_argument("paths", nargs="*", help="Python files to analyze")
+    parser.add_argument("--health", action="store_true", help="Only check that the server is up")
+    parser.add_argument("--url", default=SERVER_URL, help=f"Server URL (default: {SERVER_URL})")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON response")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.health or not args.paths:
+            print(json.dumps(request("/health", url=args.url)))
+            return 0
+        result = analyze(args.paths, url=args.url)
+    except ServerUnavailable as e:
+        print(f"❌ {e}")
+        return 1
+
+    if "error" in result:
+        print(f"❌ {result['error']}")
+        return 1
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    for fn in result["functions"]:
+        print(f"{fn['File_Path']}:{fn['start_line']}  {fn['Method_Name']:<40} "
+              f"{fn['smell_label']:<4} {fn['ml_confidence']:.4f}")
+    print(f"✅ {len(result['functions'])} functions in {result['elapsed_ms']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
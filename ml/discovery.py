@@ -0,0 +1,146 @@
+"""
+discovery.py
+(Lists the source files of a repository for metric extraction)
+
+Inside a git checkout the candidates come from one `git ls-files` call
+(tracked plus untracked-but-not-ignored files), so .gitignore'd build output,
+virtualenvs and caches are never visited. Elsewhere an os.scandir walk prunes
+excluded directories before descending into them. Both apply the same
+compiled include/exclude globs from config/discovery.py, so training,
+validation and CI see the same files either way (minus ignored ones).
+
+Stdlib only.
+"""
+import fnmatch
+import os
+import re
+import subprocess
+from pathlib import Path
+
+from config.discovery import DISCOVERY_PROFILES, INCLUDE_GLOBS, USE_GIT
+
+
+def _compile(globs):
+    """One regex per kind: component-wide, root-anchored and full-path globs.
+
+    Matching ignores case, so "tests" also prunes Tests/ and TESTS/ (as the
+    old lowercasing is_test_path did) and "*.py" also takes *.PY files.
+    """
+    def union(patterns):
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns), re.IGNORECASE)
+
+    names = [g for g in globs if "/" not in g]
+    anchored = [g.lstrip("/") for g in globs if g.startswith("/")]
+    paths = [g for g in globs if "/" in g and not g.startswith("/")]
+    return union(names), union(anchored), union(paths)
+
+
+class PathFilter:
+    def __init__(self, exclude=(), include=INCLUDE_GLOBS):
+        self.include_names, _, self.include_paths = _compile(include)
+        self.exclude_names, self.exclude_anchored, self.exclude_paths = _compile(exclude)
+
+    def excluded(self, rel_path: str, name: str, top_level: bool) -> bool:
+        return bool(
+            (self.exclude_names and self.exclude_names.match(name))
+            or (top_level and self.exclude_anchored and self.exclude_anchored.match(name))
+            or (self.exclude_paths and self.exclude_paths.match(rel_path))
+        )
+
+    def included(self, rel_path: str, name: str) -> bool:
+        return bool(
+            (self.include_names and self.include_names.match(name))
+            or (self.include_paths and self.include_paths.match(rel_path))
+        )
+
+    def accepts(self, rel_path: str, _dirs=None) -> bool:
+        """Full check of a repo-relative file path, every parent directory included.
+
+        `_dirs` memoizes directory verdicts across calls on one listing.
+        """
+        parent, _, name = rel_path.rpartition("/")
+        if parent and not self._dir_accepted(parent, _dirs if _dirs is not None else {}):
+            return False
+        return not self.excluded(rel_path, name, not parent) and self.included(rel_path, name)
+
+    def _dir_accepted(self, rel_dir: str, seen: dict) -> bool:
+        verdict = seen.get(rel_dir)
+        if verdict is None:
+            parent, _, name = rel_dir.rpartition("/")
+            verdict = (
+                (not parent or self._dir_accepted(parent, seen))
+                and not self.excluded(rel_dir, name, not parent)
+            )
+            seen[rel_dir] = verdict
+        return verdict
+
+
+def profile_filter(profile: str) -> PathFilter:
+    return PathFilter(DISCOVERY_PROFILES[profile])
+
+
+# ---------- Listing ----------
+
+def git_files(repo_path: Path, pathspecs=INCLUDE_GLOBS):
+    """Repo-relative paths from git, or None outside a usable git checkout."""
+    def ls_files(*args):
+        out = subprocess.run(
+            ["git", "ls-files", "-z", *args, "--", *pathspecs], cwd=repo_path, capture_output=True,
+        )
+        if out.returncode != 0:
+            return None
+        return [p for p in out.stdout.decode("utf-8", "surrogateescape").split("\0") if p]
+
+    try:
+        # Only at the top of a checkout: a parent repo may ignore this directory
+        prefix = subprocess.run(
+            ["git", "rev-parse", "--show-prefix"], cwd=repo_path, capture_output=True, text=True,
+        )
+        if prefix.returncode != 0 or prefix.stdout.strip():
+            return None
+        listed = ls_files("--cached", "--others", "--exclude-standard")
+        deleted = ls_files("--deleted")
+    except OSError:  # git not installed
+        return None
+    if listed is None or deleted is None:
+        return None
+    deleted = set(deleted)
+    return [p for p in dict.fromkeys(listed) if p not in deleted]
+
+
+def scan_files(repo_path: Path, path_filter: PathFilter) -> list[str]:
+    """Repo-relative paths of accepted files, pruning excluded directories."""
+    found = []
+    stack = [("", str(repo_path))]
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        try:
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if path_filter.excluded(rel, entry.name, not rel_dir):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((rel, entry.path))
+            elif entry.is_file() and path_filter.included(rel, entry.name):
+                found.append(rel)
+    return found
+
+
+def discover_relative(repo_path, profile: str = "validation", use_git: bool = USE_GIT) -> list[str]:
+    """Sorted repo-relative posix paths of the files accepted by the profile."""
+    path_filter = profile_filter(profile)
+    listed = git_files(repo_path) if use_git else None
+    if listed is not None:
+        seen = {}
+        return sorted(p for p in listed if path_filter.accepts(p, seen))
+    return sorted(scan_files(repo_path, path_filter))
+
+
+def discover_files(repo_path, profile: str = "validation", use_git: bool = USE_GIT) -> list[str]:
+    """Sorted absolute paths of the repo's files accepted by the profile."""
+    return [os.path.join(repo_path, p) for p in discover_relative(repo_path, profile, use_git)]
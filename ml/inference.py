@@ -1,7 +1,15 @@
+import argparse
+import csv
+import heapq
+import tempfile
+import time
 import pandas as pd
 import joblib
 import numpy as np
 from config.paths import MODELS_DIR, VALIDATION_DATA_DIR, PROCESSED_DATA_DIR
+from ml.model_registry import load_model_metadata
+from config.artifacts import ARTIFACT_FORMAT, FORMATS, ArtifactFormatError, read_table, write_table, resolve_format
+from ci.instrumentation import span
 from pathlib import Path
 
 import os
@@ -13,6 +21,7 @@ CI_WORKSPACE = Path(os.getenv("CI_WORKSPACE", PROCESSED_DATA_DIR))
 unseen_file = VALIDATION_DATA_DIR / "long_method_validation_dataset.csv"
 model_filename = MODELS_DIR / "smell_detector.pkl"
 scaler_filename = MODELS_DIR / "scaler.pkl"
+metadata_filename = MODELS_DIR / "smell_detector.json"
 output_file = PROCESSED_DATA_DIR / "ml_smell_predictions.csv" # Renamed for clarity
 
 unseen_file = (CI_WORKSPACE / "metrics" / "long_method_validation_dataset.csv") if CI_MODE else unseen_file
@@ -20,44 +29,168 @@ output_file = (CI_WORKSPACE / "processed" / "ml_smell_predictions.csv") if CI_MO
 
 
 necessary_features = ['scloc', 'lloc', 'effort', 'time', 'bugs', 'volume', 'difficulty', 'calculated_length']
+sort_column = 'Method_Name'
 
-try:
-    # --- 2. Load Resources ---
-    df_new = pd.read_csv(unseen_file, encoding='latin1')
-    clf = joblib.load(model_filename)
-    scaler = joblib.load(scaler_filename)
+# Rows scaled and scored per predict_proba call; bounds the scaled-feature copy
+BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", 50_000))
 
-    # --- 3. Preprocessing ---
-    X_new = df_new[necessary_features].fillna(0) # Safety first
-    X_new_scaled = scaler.transform(X_new)
+# Streaming mode reads the metrics CSV this many rows at a time
+STREAM = os.getenv("INFERENCE_STREAM") == "1"
+CHUNK_SIZE = int(os.getenv("INFERENCE_CHUNK_SIZE", BATCH_SIZE))
 
-    # --- 4. Prediction ---
-    preds = clf.predict(X_new_scaled)
-    # We keep probability ONLY for logging/metadata, NOT for decision making
-    probs = clf.predict_proba(X_new_scaled)[:, 1] 
 
-    # --- 5. Clean Mapping (The Hard Line) ---
+def score_batches(clf, scaler, X, batch_size=BATCH_SIZE):
+    """HIGH-smell probability for every row of X, one predict_proba call per batch."""
+    probs = np.empty(len(X))
+    for start in range(0, len(X), batch_size):
+        batch = X.iloc[start:start + batch_size]
+        probs[start:start + len(batch)] = clf.predict_proba(scaler.transform(batch))[:, 1]
+    return probs
+
+
+def label_predictions(df, clf, scaler, threshold):
+    # Single scoring pass: labels come from the probability and the decision
+    # threshold stored with the model (see ml/train_model.py)
+    X = df[necessary_features].fillna(0) # Safety first
+    with span("score", rows=len(X)) as s:
+        t0 = time.perf_counter()
+        probs = score_batches(clf, scaler, X)
+        if len(X):
+            s.set(ms_per_1k=round((time.perf_counter() - t0) / len(X) * 1e6, 3))
+
     # Map 1 -> HIGH, 0 -> LOW to match risk.py expectations
-    df_new['smell_label'] = np.where(preds == 1, "HIGH", "LOW")
-    
-    # Optional: Keep the raw probability for the final report CSV, 
-    # but ensure it's not used for "Risk" logic here.
-    df_new['ml_confidence'] = np.round(probs, 4)
+    df['smell_label'] = np.where(probs >= threshold, "HIGH", "LOW")
+
+    # Raw probability is kept for the final report CSV;
+    # risk logic only ever looks at smell_label.
+    df['ml_confidence'] = np.round(probs, 4)
+    return df
+
+
+def load_resources():
+    with span("load_model"):
+        clf = joblib.load(model_filename)
+        scaler = joblib.load(scaler_filename)
+        threshold = load_model_metadata(metadata_filename)["threshold"]
+    return clf, scaler, threshold
+
+
+# ---------- In-memory mode ----------
+
+def predict_frame(df_new):
+    """Labelled predictions for a metrics DataFrame, sorted by Method_Name."""
+    clf, scaler, threshold = load_resources()
+    df_new = label_predictions(df_new, clf, scaler, threshold)
 
-    # --- 6. Output Generation ---
     # We do NOT sort by probability. We keep the original order or sort by Method_Name.
-    final_report = df_new.sort_values(by='Method_Name')
+    return df_new.sort_values(by=sort_column)
+
+
+def run_inference(input_csv=unseen_file, output_csv=output_file, fmt=None):
+    with span("inference") as s:
+        df_new = read_table(input_csv, fmt, encoding='latin1')
+        s.set(rows=len(df_new))
+        final_report = predict_frame(df_new)
+
+        cols_to_show = ['Method_Name', 'smell_label', 'ml_confidence']
+        if 'File_Path' in final_report.columns:
+            cols_to_show.insert(0, 'File_Path')
+
+        print("\n--- 🎯 ML Smell Detection Results ---")
+        print(final_report[cols_to_show].head(10))
+
+        # Save (CSV or Parquet) - this will be read by your analysis module
+        written = write_table(final_report, output_csv, fmt)
+        print(f"\n✅ Predictions complete. Output saved to: {written}")
+
+
+# ---------- Streaming mode ----------
+# Peak memory is one chunk, independent of repo size. Unsorted output keeps the
+# input order; sorted output spills each sorted chunk to a run file and k-way
+# merges the runs (external merge sort, stable on ties).
+
+def merge_sorted_runs(run_paths, output_csv, key_column=sort_column):
+    handles = [open(p, newline='', encoding='utf-8') for p in run_paths]
+    try:
+        readers = [csv.reader(h) for h in handles]
+        header = None
+        for reader in readers:
+            header = next(reader)
+        key_index = header.index(key_column)
+
+        with open(output_csv, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(header)
+            writer.writerows(heapq.merge(*readers, key=lambda row: row[key_index]))
+    finally:
+        for h in handles:
+            h.close()
+
+
+def run_streaming_inference(input_csv=unseen_file, output_csv=output_file, chunk_size=CHUNK_SIZE, sort=True, fmt=None):
+    if resolve_format(fmt) != "csv":
+        raise ArtifactFormatError("Streaming inference reads and appends CSV only; use --format csv")
+    with span("inference", streamed=True, chunk_size=chunk_size) as s:
+        clf, scaler, threshold = load_resources()
+        output_csv = Path(output_csv)
+        output_csv.parent.mkdir(parents=True, exist_ok=True)
+
+        total = high = 0
+        with tempfile.TemporaryDirectory(prefix="inference_runs_", dir=output_csv.parent) as tmp:
+            run_paths = []
+            chunks = pd.read_csv(input_csv, encoding='latin1', chunksize=chunk_size)
+            for i, chunk in enumerate(chunks):
+                chunk = label_predictions(chunk, clf, scaler, threshold)
+                total += len(chunk)
+                high += int((chunk['smell_label'] == "HIGH").sum())
+
+                if sort:
+                    run_path = Path(tmp) / f"run_{i:05d}.csv"
+                    chunk.sort_values(by=sort_column, kind='stable').to_csv(run_path, index=False)
+                    run_paths.append(run_path)
+                else:
+                    chunk.to_csv(output_csv, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+            if sort and run_paths:
+                print(f"🔀 Merging {len(run_paths)} sorted runs ...")
+                merge_sorted_runs(run_paths, output_csv)
+
+        print(f"\n--- 🎯 ML Smell Detection Results (streamed, {chunk_size} rows/chunk) ---")
+        print(f"Functions scored: {total} | HIGH: {high}")
+        print(f"\n✅ Predictions complete. Output saved to: {output_csv}")
+        s.set(rows=total)
 
-    cols_to_show = ['Method_Name', 'smell_label', 'ml_confidence']
-    if 'File_Path' in final_report.columns:
-        cols_to_show.insert(0, 'File_Path')
 
-    print("\n--- 🎯 ML Smell Detection Results ---")
-    print(final_report[cols_to_show].head(10))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score validation metrics with the trained smell detector.")
+    parser.add_argument(
+        "--stream", action="store_true", default=STREAM,
+        help="Read and score the metrics CSV in chunks with bounded memory (default: INFERENCE_STREAM=1)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"Rows per chunk in streaming mode (default: {CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--no-sort", action="store_true",
+        help="Streaming mode only: keep input order instead of sorting by Method_Name",
+    )
+    parser.add_argument(
+        "--format", choices=sorted(FORMATS), default=ARTIFACT_FORMAT,
+        help=f"Input/output artifact format (default: ARTIFACT_FORMAT env var or csv, currently {ARTIFACT_FORMAT})",
+    )
+    parser.add_argument("--input", type=Path, default=unseen_file)
+    parser.add_argument("--output", type=Path, default=output_file)
+    return parser.parse_args(argv)
 
-    # Save to CSV - this will be read by your analysis module
-    final_report.to_csv(output_file, index=False)
-    print(f"\n✅ Predictions complete. Output saved to: {output_file}")
 
-except Exception as e:
-    print(f"❌ An error occurred: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        if args.stream:
+            run_streaming_inference(args.input, args.output, chunk_size=args.chunk_size,
+                                    sort=not args.no_sort, fmt=args.format)
+        else:
+            run_inference(args.input, args.output, fmt=args.format)
+    except Exception as e:
+        print(f"❌ An error occurred: {e}")
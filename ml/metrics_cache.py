@@ -0,0 +1,121 @@
+"""
+metrics_cache.py
+(Content-hash keyed on-disk cache of per-file metric rows)
+
+Entries are keyed by (namespace, sha256 of the file content, ENGINE_VERSION),
+so a file is only re-analyzed when its content or the metrics engine changes.
+Each entry stores the file's rows without File_Path plus the per-file skip /
+fail counters, so a cache hit reproduces exactly what process_file would have
+returned for that content at any path.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+from ci.instrumentation import without_phases
+from ml.metrics_engine import ENGINE_VERSION
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_metrics (
+    namespace      TEXT NOT NULL,
+    content_hash   TEXT NOT NULL,
+    engine_version TEXT NOT NULL,
+    rows           TEXT NOT NULL,
+    counters       TEXT NOT NULL,
+    PRIMARY KEY (namespace, content_hash, engine_version)
+)
+"""
+
+# Per thread: (pid, db_path, namespace) -> MetricsCache. sqlite3 connections are
+# never shared across a fork or between threads (the server runs one thread per
+# request), and a thread's connections are closed when it exits.
+_open_caches = threading.local()
+
+
+class MetricsCache:
+    def __init__(self, db_path, namespace: str):
+        self.db_path = Path(db_path)
+        self.namespace = namespace
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def get(self, content_hash: str):
+        """
+        Returns (rows, counters) for a cached file, or None on a miss.
+        """
+        cur = self.conn.execute(
+            "SELECT rows, counters FROM file_metrics "
+            "WHERE namespace = ? AND content_hash = ? AND engine_version = ?",
+            (self.namespace, content_hash, ENGINE_VERSION),
+        )
+        hit = cur.fetchone()
+        if hit is None:
+            return None
+        return json.loads(hit[0]), Counter(json.loads(hit[1]))
+
+    def put(self, content_hash: str, rows, counters):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_metrics VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, content_hash, ENGINE_VERSION, json.dumps(rows), json.dumps(dict(counters))),
+        )
+
+    def prune(self) -> int:
+        """
+        Drop entries written by other metrics-engine versions.
+        """
+        cur = self.conn.execute(
+            "DELETE FROM file_metrics WHERE engine_version != ?", (ENGINE_VERSION,)
+        )
+        return cur.rowcount
+
+
+def open_cache(db_path, namespace: str) -> MetricsCache:
+    caches = getattr(_open_caches, "caches", None)
+    if caches is None:
+        caches = _open_caches.caches = {}
+    key = (os.getpid(), str(db_path), namespace)
+    cache = caches.get(key)
+    if cache is None:
+        cache = caches[key] = MetricsCache(db_path, namespace)
+    return cache
+
+
+def cached_file_rows(cache, content, file_path, counters, analyze_fn):
+    """
+    Return the metric rows for one file's content, served from cache when
+    possible. analyze_fn(content, file_path, counters) computes rows on a miss.
+    Hit/miss counts are recorded in counters as cache_hit / cache_miss.
+    """
+    file_path = file_path.replace('\\', '/')
+    if cache is None:
+        return analyze_fn(content, file_path, counters)
+
+    content_hash = cache.content_hash(content)
+    cached = cache.get(content_hash)
+    if cached is not None:
+        rows, file_counters = cached
+        counters['cache_hit'] += 1
+        counters.update(file_counters)
+        return [{'File_Path': file_path, **row} for row in rows]
+
+    counters['cache_miss'] += 1
+    file_counters = Counter()
+    rows = analyze_fn(content, file_path, file_counters)
+    counters.update(file_counters)
+    cache.put(
+        content_hash,
+        [{k: v for k, v in row.items() if k != 'File_Path'} for row in rows],
+        without_phases(file_counters),  # timings of this run only, never replayed
+    )
+    return rows
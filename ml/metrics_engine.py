@@ -0,0 +1,219 @@
+"""
+metrics_engine.py
+(Per-function CC, raw and Halstead metrics from a single parse of each file)
+
+The dataset builders used to cut every function out of its file and run
+radon's raw_analyze / h_visit on the snippet, re-tokenizing and re-parsing
+each method body. FileMetrics tokenizes and parses a file once and derives
+the same numbers for every function:
+
+  - CC:       radon's ComplexityVisitor over the file AST, matched per node
+  - raw:      radon's logical-line rules applied to token groups taken from
+              the whole-file token stream
+  - Halstead: radon's HalsteadVisitor over the function body subtrees
+"""
+import ast
+import io
+import tokenize
+from bisect import bisect_left
+
+from radon.complexity import cc_visit_ast
+from radon.metrics import halstead_visitor_report
+from radon.raw import _logical, is_single_token
+from radon.visitors import HalsteadVisitor
+
+from ci.instrumentation import phase
+
+# Bump whenever the numbers produced for an unchanged file may change.
+ENGINE_VERSION = "1"
+
+_IGNORED_TOKENS = {tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER}
+_OPEN_BRACKETS = {"(", "[", "{"}
+_CLOSE_BRACKETS = {")", "]", "}"}
+_ENDMARKER = tokenize.TokenInfo(tokenize.ENDMARKER, "", (0, 0), (0, 0), "")
+
+# ---------- Node helpers ----------
+
+def get_node_end_lineno(node):
+    end = getattr(node, 'end_lineno', None)
+    if end is not None:
+        return end
+    max_lineno = getattr(node, 'lineno', None)
+    for child in ast.walk(node):
+        if hasattr(child, 'lineno'):
+            try:
+                if child.lineno and (max_lineno is None or child.lineno > max_lineno):
+                    max_lineno = child.lineno
+            except Exception:
+                pass
+    return max_lineno
+
+
+def overlap_length(a_start, a_end, b_start, b_end):
+    if a_start is None or a_end is None or b_start is None or b_end is None:
+        return 0
+    start = max(a_start, b_start)
+    end = min(a_end, b_end)
+    return max(0, end - start + 1)
+
+
+def match_cc_block_for_node(cc_blocks, node_start, node_end):
+    best_block = None
+    best_overlap = 0
+    for block in cc_blocks:
+        b_start = getattr(block, 'lineno', None)
+        b_end = getattr(block, 'endline', None)
+        if b_end is None:
+            b_end = b_start
+        ol = overlap_length(node_start, node_end, b_start, b_end)
+        if ol > best_overlap:
+            best_overlap = ol
+            best_block = block
+    if best_block is None or best_overlap == 0:
+        return None
+    try:
+        return best_block.complexity
+    except Exception:
+        return getattr(best_block, 'complexity', getattr(best_block, 'cc', None))
+
+# ---------- File metrics ----------
+
+class FileMetrics:
+    """
+    One file, parsed once. Raises SyntaxError (like ast.parse) if the
+    source cannot be parsed; tokenizer or CC failures are deferred to the
+    per-function accessors so callers can count them separately. Parse,
+    CC and tokenize seconds are added to `counters` when given.
+    """
+
+    def __init__(self, content: str, counters=None):
+        self.content = content
+        with phase(counters, "parse"):
+            self.tree = ast.parse(content)
+        self.lines = io.StringIO(content).readlines()
+
+        with phase(counters, "radon_cc"):
+            try:
+                self.cc_blocks = cc_visit_ast(self.tree)
+                self.cc_error = None
+            except Exception as e:
+                self.cc_blocks = []
+                self.cc_error = e
+
+        with phase(counters, "tokenize"):
+            try:
+                self._tokenize()
+                self.token_error = None
+            except (tokenize.TokenError, SyntaxError) as e:
+                self.tokens = None
+                self.token_error = e
+
+    def function_nodes(self):
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.FunctionDef):
+                yield node
+
+    # ---------- Tokens ----------
+
+    def _tokenize(self):
+        tokens = []
+        group_ends = set()
+        depth = 0
+        for tok in tokenize.generate_tokens(io.StringIO(self.content).readline):
+            if tok.type == tokenize.OP:
+                if tok.string in _OPEN_BRACKETS:
+                    depth += 1
+                elif tok.string in _CLOSE_BRACKETS:
+                    depth = max(0, depth - 1)
+            # A token group (radon's "shortest tokenization") closes at the
+            # end of a logical line, or at a blank/comment line outside brackets.
+            if tok.type == tokenize.NEWLINE or (tok.type == tokenize.NL and depth == 0):
+                group_ends.add(tok.start[0])
+            if tok.type not in _IGNORED_TOKENS:
+                tokens.append(tok)
+
+        self.tokens = tokens
+        self._token_starts = [t.start for t in tokens]
+
+        # next_group_end[row] -> last row of the group containing row
+        n_rows = len(self.lines)
+        next_group_end = [n_rows] * (n_rows + 2)
+        upcoming = n_rows
+        for row in range(n_rows, 0, -1):
+            if row in group_ends:
+                upcoming = row
+            next_group_end[row] = upcoming
+        self._next_group_end = next_group_end
+
+    def _char_col(self, row, byte_col):
+        # ast column offsets are UTF-8 byte offsets, tokenize uses characters
+        line = self.lines[row - 1] if 0 < row <= len(self.lines) else ""
+        return len(line.encode("utf-8")[:byte_col].decode("utf-8", errors="replace"))
+
+    # ---------- Per-function metrics ----------
+
+    def complexity(self, node):
+        return match_cc_block_for_node(
+            self.cc_blocks, getattr(node, 'lineno', None), get_node_end_lineno(node)
+        )
+
+    def raw_metrics(self, node):
+        """
+        (lloc, sloc, comments) for the source segment of node, identical to
+        radon.raw.analyze(ast.get_source_segment(content, node)).
+        """
+        if self.tokens is None:
+            raise self.token_error
+
+        first_row, last_row = node.lineno, node.end_lineno
+        start = (first_row, self._char_col(first_row, node.col_offset))
+        end = (last_row, self._char_col(last_row, node.end_col_offset))
+
+        i = bisect_left(self._token_starts, start)
+        i_end = bisect_left(self._token_starts, end)
+
+        lloc = sloc = comments = 0
+        row = first_row
+        while row <= last_row:
+            group_end = min(self._next_group_end[row], last_row)
+
+            group = []
+            while i < i_end and self.tokens[i].start[0] <= group_end:
+                group.append(self.tokens[i])
+                i += 1
+            group.append(_ENDMARKER)
+
+            comments += sum(1 for t in group if t.type == tokenize.COMMENT)
+
+            if is_single_token(tokenize.COMMENT, group):
+                pass
+            elif is_single_token(tokenize.STRING, group):
+                pass
+            else:
+                for r in range(row, group_end + 1):
+                    line = self.lines[r - 1]
+                    if r == last_row:
+                        line = line[:end[1]]
+                    if r == first_row:
+                        line = line[start[1]:]
+                    if line.strip():
+                        sloc += 1
+
+            lloc += _logical(group)
+            row = group_end + 1
+
+        return lloc, sloc, comments
+
+    def halstead(self, node):
+        """
+        HalsteadReport for node, identical to the `total` report of
+        radon.metrics.h_visit(ast.get_source_segment(content, node)).
+        """
+        visitor = HalsteadVisitor(context=node.name)
+        for child in node.body:
+            sub = HalsteadVisitor.from_ast(child, context=node.name)
+            visitor.operators += sub.operators
+            visitor.operands += sub.operands
+            visitor.operators_seen.update(sub.operators_seen)
+            visitor.operands_seen.update(sub.operands_seen)
+        return halstead_visitor_report(visitor)
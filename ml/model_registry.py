@@ -0,0 +1,97 @@
+"""
+model_registry.py
+(Smell classifiers selectable by name)
+
+Every entry builds an unfitted sklearn estimator exposing predict and
+predict_proba, so ml/inference.py works with any of them unchanged.
+The model is chosen with `python -m ml.train_model --model <name>` or the
+SMELL_MODEL environment variable.
+"""
+import json
+import os
+
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import SVC, LinearSVC
+
+DEFAULT_MODEL = "svc_rbf"
+SMELL_MODEL = os.getenv("SMELL_MODEL", DEFAULT_MODEL)
+
+
+def _svc_rbf():
+    # Original model: probability=True adds an internal 5-fold Platt calibration
+    return SVC(kernel='rbf', probability=True, random_state=42)
+
+
+def _logreg():
+    return LogisticRegression(max_iter=1000, random_state=42)
+
+
+def _hist_gb():
+    return HistGradientBoostingClassifier(random_state=42)
+
+
+def _nystroem_linear_svm():
+    # RBF feature map approximation + linear SVM, sigmoid-calibrated for predict_proba
+    return make_pipeline(
+        Nystroem(kernel='rbf', n_components=100, random_state=42),
+        CalibratedClassifierCV(LinearSVC(random_state=42), method='sigmoid', cv=3),
+    )
+
+
+MODEL_REGISTRY = {
+    "svc_rbf": _svc_rbf,
+    "logreg": _logreg,
+    "hist_gb": _hist_gb,
+    "nystroem_linear_svm": _nystroem_linear_svm,
+}
+
+
+def build_model(name: str = SMELL_MODEL):
+    try:
+        factory = MODEL_REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown model '{name}'. Available: {', '.join(MODEL_REGISTRY)}")
+    return factory()
+
+
+# ---------- Model metadata ----------
+# Stored next to the pickled model: {"model": name, "threshold": float}
+
+DEFAULT_THRESHOLD = 0.5
+
+
+def fit_threshold(clf, X) -> float:
+    """
+    Probability cut-off that reproduces clf.predict() on X. Models whose
+    predict() is not proba >= 0.5 (e.g. SVC, where labels come from the
+    decision function and probabilities from Platt scaling) get the midpoint
+    between the highest negative and lowest positive probability.
+    """
+    preds = clf.predict(X)
+    probs = clf.predict_proba(X)[:, 1]
+    if ((probs >= DEFAULT_THRESHOLD) == (preds == 1)).all():
+        return DEFAULT_THRESHOLD
+    if not (preds == 1).any() or not (preds == 0).any():
+        return DEFAULT_THRESHOLD
+    lowest_positive = probs[preds == 1].min()
+    highest_negative = probs[preds == 0].max()
+    if highest_negative >= lowest_positive:
+        return DEFAULT_THRESHOLD
+    return round(float(highest_negative + lowest_positive) / 2, 4)
+
+
+def save_model_metadata(path, model_name: str, threshold: float):
+    with open(path, "w") as f:
+        json.dump({"model": model_name, "threshold": threshold}, f, indent=2)
+
+
+def load_model_metadata(path) -> dict:
+    meta = {"model": None, "threshold": DEFAULT_THRESHOLD}
+    if os.path.exists(path):
+        with open(path) as f:
+            meta.update(json.load(f))
+    return meta
@@ -0,0 +1,249 @@
+"""
+parallel.py
+(Fans per-file metric extraction out across a process pool)
+
+Files are dispatched in discovery order and results are merged in that order,
+so rows and counters come out exactly as the serial loop would produce them.
+Given the dataset's fieldnames, rows travel and accumulate in a compact
+RowBuffer (ml/row_buffer.py) instead of dicts.
+
+Every file gets a size and a time budget. A file over the size budget is never
+read. With a time budget, each file is its own call into a worker process,
+waited on until its deadline: a worker still busy past it (e.g. stuck in
+ast.parse of a huge generated file) is killed with its pool, the pool is
+replaced, and the other files in flight are resubmitted. Skipped files are
+counted as skip_too_large / skip_timeout and listed through pop_skipped().
+Without a time budget, files go to the pool in fixed-size batches, and jobs=1
+runs in-process (which cProfile runs rely on).
+"""
+import csv
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+
+from ml.row_buffer import RowBuffer
+
+# ---------- CONFIG ----------
+DEFAULT_CHUNK_SIZE = 64
+
+# Per-file budgets (0 disables)
+MAX_FILE_BYTES = int(os.getenv("METRICS_MAX_FILE_BYTES", 1_000_000))
+FILE_TIMEOUT = float(os.getenv("METRICS_FILE_TIMEOUT", 30))
+
+# Counter keys listing skipped files: "skipped:<reason>:<path>" -> bytes or seconds
+SKIP_PREFIX = "skipped:"
+SKIPPED_FIELDNAMES = ["File_Path", "reason", "measured"]
+
+
+def default_jobs() -> int:
+    # METRICS_JOBS overrides the CPU count (cProfile runs set 1: it does not follow worker processes)
+    return int(os.getenv("METRICS_JOBS", 0)) or os.cpu_count() or 1
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# ---------- Budgets ----------
+
+def file_size(file_path) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0  # unreadable files are counted by process_fn (fail_read)
+
+
+def pop_skipped(counters) -> list[dict]:
+    """Removes the skipped-file entries from counters, returned as report rows."""
+    keys = [k for k in counters if k.startswith(SKIP_PREFIX)]
+    skipped = []
+    for key in keys:
+        reason, path = key[len(SKIP_PREFIX):].split(":", 1)
+        skipped.append({"File_Path": path, "reason": reason, "measured": round(counters.pop(key), 3)})
+    return sorted(skipped, key=lambda r: r["File_Path"])
+
+
+def write_skipped_report(skipped, report_path):
+    """CSV of the files skipped over budget; a stale report is removed when there are none."""
+    report_path = Path(report_path)
+    if not skipped:
+        report_path.unlink(missing_ok=True)
+        return None
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SKIPPED_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(skipped)
+    print(f"⏭️  {len(skipped)} files skipped over the per-file budgets:")
+    for r in skipped[:10]:
+        unit = "s" if r["reason"] == "timeout" else "B"
+        print(f"   {r['reason']:<10} {r['measured']:>12} {unit}  {r['File_Path']}")
+    if len(skipped) > 10:
+        print(f"   ... {len(skipped) - 10} more")
+    print(f"   Report: {report_path}")
+    return report_path
+
+# ---------- Workers ----------
+
+def posix_path(file_path) -> str:
+    return str(file_path).replace("\\", "/")
+
+
+def over_size(file_path, max_bytes, counters) -> bool:
+    """Counts and lists the file in counters when it is over the size budget."""
+    size = file_size(file_path)
+    if max_bytes and size > max_bytes:
+        counters["skip_too_large"] += 1
+        counters[f"{SKIP_PREFIX}too_large:{posix_path(file_path)}"] = size
+        return True
+    return False
+
+
+def process_batch(process_fn, batch, max_bytes=MAX_FILE_BYTES, fieldnames=None):
+    """
+    Run process_fn over one batch of files, skipping those over the size
+    budget. Returns (rows, counters) for the batch, rows as a RowBuffer when
+    fieldnames are given.
+    """
+    rows = RowBuffer(fieldnames) if fieldnames else []
+    counters = Counter()
+    for file_path in batch:
+        if over_size(file_path, max_bytes, counters):
+            continue
+        rows.extend(process_fn(file_path, counters=counters))
+    return rows, counters
+
+
+def _warm_up(process_fn):
+    # Unpickling process_fn imports its module, so worker start-up is not charged to a file's budget
+    return os.getpid()
+
+
+def new_pool(workers):
+    # Forking while other threads run (the in-process CI pipeline's stages) can
+    # copy a held lock into the child; spawn starts clean workers instead
+    on_main_thread = threading.current_thread() is threading.main_thread()
+    mp_context = None if on_main_thread else multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+
+
+def _kill_workers(pool):
+    # A running call cannot be cancelled: terminate the workers (no public API
+    # before Python 3.14), which fails the pool's other futures with BrokenProcessPool
+    for proc in list((pool._processes or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _timed_out(file_path, elapsed, fieldnames):
+    """A finished future holding the (rows, counters) of a file killed over its time budget."""
+    future = Future()
+    future.set_result((
+        RowBuffer(fieldnames) if fieldnames else [],
+        Counter({"skip_timeout": 1, f"{SKIP_PREFIX}timeout:{posix_path(file_path)}": elapsed}),
+    ))
+    return future
+
+
+def iter_file_results(process_fn, file_paths, jobs, max_bytes=MAX_FILE_BYTES, timeout=FILE_TIMEOUT,
+                      fieldnames=None):
+    """
+    Yield (rows, counters) per file, in the order of file_paths, each file
+    analyzed in a worker process within `timeout` seconds. A file still
+    running past its deadline is recorded as skip_timeout and its worker
+    killed; the pool is replaced and the files it was also running resubmitted.
+    """
+    skipped = Counter()
+    todo = deque(p for p in file_paths if not over_size(p, max_bytes, skipped))
+    if skipped:
+        yield (RowBuffer(fieldnames) if fieldnames else []), skipped
+    if not todo:
+        return
+
+    worker = partial(process_batch, process_fn, max_bytes=0, fieldnames=fieldnames)
+    workers = min(jobs, len(todo))
+    in_flight = deque()  # [file_path, future, started], in file order; at most one per worker
+    pool = None
+    try:
+        while todo or in_flight:
+            if pool is None:
+                pool = new_pool(workers)
+                wait([pool.submit(_warm_up, process_fn) for _ in range(workers)])
+                for entry in in_flight:
+                    if entry[1] is None:
+                        entry[1:] = [pool.submit(worker, [entry[0]]), time.monotonic()]
+            while todo and len(in_flight) < workers:
+                file_path = todo.popleft()
+                in_flight.append([file_path, pool.submit(worker, [file_path]), time.monotonic()])
+
+            while in_flight and in_flight[0][1].done():
+                yield in_flight.popleft()[1].result()
+            running = [entry for entry in in_flight if not entry[1].done()]
+            if not running:
+                continue
+            now = time.monotonic()
+            first_deadline = min(started for _, _, started in running) + timeout
+            if first_deadline > now:
+                wait([future for _, future, _ in running], timeout=first_deadline - now,
+                     return_when=FIRST_COMPLETED)
+                continue
+
+            expired = [entry for entry in running if now - entry[2] >= timeout]
+            _kill_workers(pool)
+            pool = None
+            for entry in in_flight:
+                if entry in expired:
+                    entry[1] = _timed_out(entry[0], now - entry[2], fieldnames)
+                elif entry[1].cancelled() or isinstance(entry[1].exception(), BrokenProcessPool):
+                    entry[1] = None  # killed alongside: resubmitted to the new pool
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_batch_results(process_fn, file_paths, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                       max_bytes=MAX_FILE_BYTES, timeout=FILE_TIMEOUT, fieldnames=None):
+    """
+    Yield (rows, counters) per batch, in the order of file_paths. With a time
+    budget every file is its own batch (iter_file_results); otherwise jobs <= 1
+    runs in-process. The result order is identical either way.
+    """
+    file_paths = list(file_paths)
+    jobs = default_jobs() if jobs is None else max(1, int(jobs))
+    if timeout:
+        yield from iter_file_results(process_fn, file_paths, jobs, max_bytes, timeout, fieldnames)
+        return
+
+    batches = list(chunked(file_paths, chunk_size))
+    worker = partial(process_batch, process_fn, max_bytes=max_bytes, fieldnames=fieldnames)
+    if jobs == 1 or len(batches) <= 1:
+        for batch in batches:
+            yield worker(batch)
+        return
+
+    with new_pool(min(jobs, len(batches))) as pool:
+        # Executor.map preserves submission order -> deterministic merge
+        yield from pool.map(worker, batches)
+
+
+def process_files(process_fn, file_paths, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  max_bytes=MAX_FILE_BYTES, timeout=FILE_TIMEOUT, fieldnames=None):
+    """
+    Extract rows for every file. Returns (all_rows, counters); all_rows is a
+    RowBuffer when fieldnames are given, else a list of dicts. Files over
+    budget are counted in counters and listed by pop_skipped(counters).
+    """
+    all_rows = RowBuffer(fieldnames) if fieldnames else []
+    counters = Counter()
+    for rows, batch_counters in iter_batch_results(
+        process_fn, file_paths, jobs, chunk_size, max_bytes, timeout, fieldnames,
+    ):
+        all_rows.extend(rows)
+        counters.update(batch_counters)
+    return all_rows, counters
@@ -0,0 +1,162 @@
+"""
+row_buffer.py
+(Compact columnar storage for per-function metric rows)
+
+The dataset builders used to hold every function as a dict of 14-15 keys,
+about 640 bytes each with their values. A RowBuffer keeps one column per
+field instead:
+  - integer metrics in array('i'), float metrics in array('d')
+  - File_Path as an array of ids into one list of distinct paths
+  - other text (Method_Name) as a plain list of str
+so a function costs about a sixth of that. Rows go in as the builders' row
+dicts and are read back a slice at a time, as dicts or value tuples, so no
+full list of dicts is ever built. Values round-trip exactly: radon's int 0
+stays 0 and None survives in numeric columns.
+"""
+import math
+from array import array
+
+INT_COLUMNS = {
+    'start_line', 'end_line', 'is_Long_Method',
+    'CC', 'lloc', 'scloc', 'comments', 'calculated_length',
+}
+# radon reports int 0 for empty Halstead metrics, floats otherwise
+FLOAT_COLUMNS = {'volume', 'difficulty', 'effort', 'time', 'bugs'}
+INTERNED_COLUMNS = {'File_Path'}
+
+_INT_NONE = -(2 ** 31)  # array('i') is 32-bit: line numbers and metric counts fit
+
+# Rows decoded per column slice while iterating
+ITER_CHUNK = 4096
+
+
+class RowBuffer:
+    def __init__(self, fieldnames, rows=()):
+        self.fieldnames = list(fieldnames)
+        self._columns = {}
+        for name in self.fieldnames:
+            if name in INTERNED_COLUMNS or name in INT_COLUMNS:
+                self._columns[name] = array('i')
+            elif name in FLOAT_COLUMNS:
+                self._columns[name] = array('d')
+            else:
+                self._columns[name] = []
+        # Float columns remember which values were ints (1) or None (2)
+        self._kinds = {name: array('b') for name in self.fieldnames if name in FLOAT_COLUMNS}
+        self._values = []  # distinct interned values, shared by all interned columns
+        self._value_ids = {}
+        self._length = 0
+        self.extend(rows)
+
+    def __len__(self):
+        return self._length
+
+    def _intern(self, value):
+        value_id = self._value_ids.get(value)
+        if value_id is None:
+            value_id = self._value_ids[value] = len(self._values)
+            self._values.append(value)
+        return value_id
+
+    # ---------- Writing ----------
+
+    def append(self, row: dict):
+        for name, column in self._columns.items():
+            value = row.get(name)
+            if name in INTERNED_COLUMNS:
+                column.append(self._intern(value))
+            elif name in INT_COLUMNS:
+                column.append(_INT_NONE if value is None else value)
+            elif name in FLOAT_COLUMNS:
+                kind = 2 if value is None else (1 if type(value) is int else 0)
+                column.append(math.nan if value is None else value)
+                self._kinds[name].append(kind)
+            else:
+                column.append(value)
+        self._length += 1
+
+    def extend(self, rows):
+        if not isinstance(rows, RowBuffer):
+            for row in rows:
+                self.append(row)
+            return
+        if rows.fieldnames != self.fieldnames:
+            raise ValueError(f"Cannot merge rows with fields {rows.fieldnames} into {self.fieldnames}")
+        remap = [self._intern(value) for value in rows._values]
+        for name, column in self._columns.items():
+            if name in INTERNED_COLUMNS:
+                column.extend(array('i', (remap[i] for i in rows._columns[name])))
+            else:
+                column.extend(rows._columns[name])
+        for name, kinds in self._kinds.items():
+            kinds.extend(rows._kinds[name])
+        self._length += len(rows)
+
+    # ---------- Reading ----------
+
+    def column(self, name, start=0, stop=None) -> list:
+        """Values of one column (rows start:stop), as they were appended."""
+        values = self._columns[name][start:stop]
+        if name in INTERNED_COLUMNS:
+            interned = self._values
+            return [interned[i] for i in values]
+        if name in INT_COLUMNS:
+            if _INT_NONE not in values:
+                return values.tolist()
+            return [None if v == _INT_NONE else v for v in values]
+        if name in FLOAT_COLUMNS:
+            kinds = self._kinds[name][start:stop]
+            if not any(kinds):
+                return values.tolist()
+            return [v if k == 0 else (int(v) if k == 1 else None) for v, k in zip(values, kinds)]
+        return list(values)
+
+    def row(self, i) -> dict:
+        return {name: self.column(name, i, i + 1)[0] for name in self.fieldnames}
+
+    def iter_values(self):
+        """Row value tuples in fieldnames order (what CSV writers need)."""
+        # Column slices are decoded in bulk; only ITER_CHUNK rows exist at once
+        for start in range(0, self._length, ITER_CHUNK):
+            columns = [self.column(name, start, start + ITER_CHUNK) for name in self.fieldnames]
+            yield from zip(*columns)
+
+    def __iter__(self):
+        for values in self.iter_values():
+            yield dict(zip(self.fieldnames, values))
+
+    def indices_where(self, name, value) -> array:
+        """Indices of the rows whose integer column `name` equals value."""
+        column = self._columns[name]
+        return array('i', (i for i, v in enumerate(column) if v == value))
+
+    def take(self, indices) -> "RowBuffer":
+        """New buffer holding the given rows, in the given order."""
+        out = RowBuffer(self.fieldnames)
+        out._values = list(self._values)
+        out._value_ids = dict(self._value_ids)
+        for name, column in self._columns.items():
+            values = (column[i] for i in indices)
+            out._columns[name] = array(column.typecode, values) if isinstance(column, array) else list(values)
+        for name, kinds in self._kinds.items():
+            out._kinds[name] = array('b', (kinds[i] for i in indices))
+        out._length = len(out._columns[self.fieldnames[0]]) if self.fieldnames else 0
+        return out
+
+    def to_frame(self):
+        """DataFrame with the dtypes pd.DataFrame(list_of_dicts) would infer."""
+        import numpy as np
+        import pandas as pd
+
+        if not self._length:
+            return pd.DataFrame([], columns=self.fieldnames)
+        data = {}
+        for name, column in self._columns.items():
+            if name in INT_COLUMNS and _INT_NONE not in column:
+                data[name] = np.array(column, dtype=np.int64)
+            elif name in FLOAT_COLUMNS and 2 not in self._kinds[name]:
+                values = np.array(column, dtype=np.float64)
+                data[name] = values.astype(np.int64) if 0 not in self._kinds[name] else values
+            else:
+                data[name] = self.column(name)
+        return pd.DataFrame(data, columns=self.fieldnames)
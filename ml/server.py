@@ -0,0 +1,135 @@
+"""
+server.py
+(Long-lived smell detection server: model and scaler stay loaded)
+
+Usage:
+    python -m ml.server [--host 127.0.0.1] [--port 8765] [--no-cache]
+
+Localhost HTTP + JSON, stdlib only:
+  GET  /health   -> {"status": "ok", "model": ..., "threshold": ...}
+  POST /predict  {"rows": [{"lloc": 12, "effort": 340.5, ...}, ...]}
+                 -> {"predictions": [{"smell_label": "LOW", "ml_confidence": 0.0123}, ...]}
+  POST /analyze  {"paths": ["/abs/path/module.py", ...]}
+                 -> {"functions": [<validation metrics row> + smell_label + ml_confidence, ...]}
+
+/analyze extracts metrics with ml/build_validation_dataset.py (through the
+metrics cache, so unchanged files are not re-parsed) and scores them with the
+same threshold as ml/inference.py. Clients: ml/client.py.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from ml.inference import necessary_features, load_resources, label_predictions, metadata_filename
+from ml.model_registry import load_model_metadata
+from ml.build_validation_dataset import process_file, CACHE_FILE
+
+DEFAULT_HOST = os.getenv("SMELL_SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("SMELL_SERVER_PORT", 8765))
+
+
+class SmellService:
+    """Holds the fitted model, scaler and threshold for the server's lifetime."""
+
+    def __init__(self, cache_path=CACHE_FILE):
+        self.clf, self.scaler, self.threshold = load_resources()
+        self.model_name = load_model_metadata(metadata_filename)["model"]
+        self.cache_path = cache_path
+
+    def predict(self, rows):
+        if not rows:
+            return []
+        df = pd.DataFrame(rows).reindex(columns=list(dict.fromkeys(necessary_features + list(rows[0]))))
+        df = label_predictions(df, self.clf, self.scaler, self.threshold)
+        return [
+            {"smell_label": label, "ml_confidence": float(conf)}
+            for label, conf in zip(df['smell_label'], df['ml_confidence'])
+        ]
+
+    def analyze(self, paths):
+        counters = Counter()
+        rows = []
+        for path in paths:
+            rows.extend(process_file(path, counters=counters, cache_path=self.cache_path))
+        for row, pred in zip(rows, self.predict(rows)):
+            row.update(pred)
+        return rows, counters
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+            self._send(200, {"status": "ok", "model": service.model_name, "threshold": service.threshold})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                return self._send(400, {"error": f"Invalid JSON: {e}"})
+
+            t0 = time.perf_counter()
+            try:
+                if self.path == "/predict":
+                    result = {"predictions": service.predict(payload.get("rows", []))}
+                elif self.path == "/analyze":
+                    functions, counters = service.analyze(payload.get("paths", []))
+                    result = {"functions": functions, "counters": dict(counters)}
+                else:
+                    return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+
+            result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, cache_path=CACHE_FILE):
+    t0 = time.perf_counter()
+    service = SmellService(cache_path=cache_path)
+    # Warm-up: the first predict_proba call pays one-off sklearn validation costs
+    service.predict([{f: 0 for f in necessary_features}])
+    print(f"🧠 Model loaded ({service.model_name or 'unknown'}, threshold {service.threshold}) "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+    httpd = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"🚀 Smell server listening on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Smell server stopped")
+    finally:
+        httpd.server_close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve smell predictions with the model kept in memory.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST}, localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the metrics cache for /analyze")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve(args.host, args.port, cache_path=None if args.no_cache else CACHE_FILE)
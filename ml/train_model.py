@@ -1,11 +1,12 @@
-import pandas as pd
+import argparse
 import numpy as np
 import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, classification_report
 from config.paths import MODELS_DIR, TRAINING_DATA_DIR
+from config.artifacts import read_table
+from ml.model_registry import MODEL_REGISTRY, SMELL_MODEL, build_model, fit_threshold, save_model_metadata
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -14,36 +15,66 @@ warnings.filterwarnings('ignore')
 train_file = TRAINING_DATA_DIR / "long_method_training_dataset.csv"
 model_filename = MODELS_DIR / "smell_detector.pkl"
 scaler_filename = MODELS_DIR / "scaler.pkl"
+metadata_filename = MODELS_DIR / "smell_detector.json"  # model name + decision threshold
 necessary_features = ['scloc', 'lloc', 'effort', 'time', 'bugs', 'volume', 'difficulty', 'calculated_length']
 target_column = 'is_Long_Method'
 
-try:
-    df = pd.read_csv(train_file, encoding='latin1')
-    X = df[necessary_features]
-    y = df[target_column]
 
-    # --- Train/Test Split ---
-    X_train_raw, X_test_raw, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+def main(model_name=SMELL_MODEL, threshold=None):
+    try:
+        df = read_table(train_file, encoding='latin1')
+        X = df[necessary_features]
+        y = df[target_column]
 
-    # --- Scaling ---
-    scaler = MinMaxScaler()
-    X_train_scaled = scaler.fit_transform(X_train_raw)
-    X_test_scaled = scaler.transform(X_test_raw)
+        # --- Train/Test Split ---
+        X_train_raw, X_test_raw, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
-    # --- Evaluation ---
-    clf = SVC(kernel='rbf', probability=True, random_state=42)
-    clf.fit(X_train_scaled, y_train)
+        # --- Scaling ---
+        scaler = MinMaxScaler()
+        X_train_scaled = scaler.fit_transform(X_train_raw)
+        X_test_scaled = scaler.transform(X_test_raw)
 
-    # --- Final Retrain on 100% Data for Deployment ---
-    final_scaler = MinMaxScaler()
-    X_full_scaled = final_scaler.fit_transform(X)
-    final_model = SVC(kernel='rbf', probability=True, random_state=42)
-    final_model.fit(X_full_scaled, y)
+        # --- Evaluation ---
+        print(f"🧠 Model: {model_name}")
+        clf = build_model(model_name)
+        clf.fit(X_train_scaled, y_train)
 
-    # --- Save Resources ---
-    joblib.dump(final_model, model_filename)
-    joblib.dump(final_scaler, scaler_filename)
-    print("✅ Model and Scaler saved successfully.")
+        # --- Final Retrain on 100% Data for Deployment ---
+        final_scaler = MinMaxScaler()
+        X_full_scaled = final_scaler.fit_transform(X)
+        final_model = build_model(model_name)
+        final_model.fit(X_full_scaled, y)
 
-except Exception as e:
-    print(f"❌ Error during training: {e}")
\ No newline at end of file
+        # --- Decision Threshold ---
+        # Inference labels from predict_proba alone; unless overridden, pick the
+        # cut-off that reproduces the model's own predict() on the training data
+        if threshold is None:
+            threshold = fit_threshold(final_model, X_full_scaled)
+        print(f"🎚️  Decision threshold: {threshold}")
+
+        # --- Save Resources ---
+        joblib.dump(final_model, model_filename)
+        joblib.dump(final_scaler, scaler_filename)
+        save_model_metadata(metadata_filename, model_name, threshold)
+        print("✅ Model, Scaler and metadata saved successfully.")
+
+    except Exception as e:
+        print(f"❌ Error during training: {e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the smell detector and save it to models/.")
+    parser.add_argument(
+        "--model", choices=sorted(MODEL_REGISTRY), default=SMELL_MODEL,
+        help=f"Classifier to train (default: SMELL_MODEL env var or svc_rbf, currently {SMELL_MODEL})",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=None,
+        help="HIGH-smell probability cut-off stored with the model (default: fitted to match the model's predict())",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.model, args.threshold)
@@ -1,9 +1,14 @@
+import numpy as np
+import pandas as pd
+
+
 def recommend_tests(function: dict) -> list:
     """
     function dict may contain:
       - risk_category
       - coverage_bucket
       - cc (cyclomatic complexity)
+      - missing_branches (branch exits never taken, from branch coverage)
       - lloc (logical lines of code)
       - difficulty (Halstead difficulty)
     """
@@ -14,6 +19,7 @@ def recommend_tests(function: dict) -> list:
     coverage = function.get("coverage_bucket")
 
     cc = function.get("cc", 0)
+    missing_branches = function.get("missing_branches", 0)
     lloc = function.get("lloc", 0)
     difficulty = function.get("difficulty", 0)
 
@@ -32,6 +38,9 @@ def recommend_tests(function: dict) -> list:
     if cc >= 10:
         recs.append("Add branch and conditional path tests due to high cyclomatic complexity")
 
+    if missing_branches > 0:
+        recs.append("Add tests for the branch exits coverage never took")
+
     if lloc >= 30:
         recs.append("Consider decomposing this method; add focused unit tests per responsibility")
 
@@ -47,3 +56,71 @@ def recommend_tests(function: dict) -> list:
         recs.append("No immediate testing action required")
 
     return recs
+
+
+# ---------------------------------------------------------
+# Columnar evaluation
+# ---------------------------------------------------------
+# Each rule of recommend_tests is one bit, in output order. A row's bitmask
+# indexes a precomputed table of joined recommendation strings.
+RULE_MESSAGES = [
+    "Write tests immediately before modifying this code",
+    "Add basic smoke tests to ensure execution paths are covered",
+    "Increase coverage by adding input boundary tests",
+    "Add branch and conditional path tests due to high cyclomatic complexity",
+    "Add tests for the branch exits coverage never took",
+    "Consider decomposing this method; add focused unit tests per responsibility",
+    "Mock external dependencies to isolate complex logic during testing",
+    "Safe to refactor after ensuring existing tests capture current behavior",
+]
+FALLBACK_MESSAGE = "No immediate testing action required"
+
+
+def _recommendation_table(sep: str) -> np.ndarray:
+    table = []
+    for code in range(1 << len(RULE_MESSAGES)):
+        recs = [msg for bit, msg in enumerate(RULE_MESSAGES) if code & (1 << bit)]
+        table.append(sep.join(recs) if recs else FALLBACK_MESSAGE)
+    return np.array(table, dtype=object)
+
+
+def recommendation_codes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Bitmask of the recommend_tests rules that fire for every row of df
+    (columns: risk_category, coverage_bucket, cc, missing_branches, lloc, difficulty).
+    """
+    def column(name):
+        if name in df.columns:
+            return df[name]
+        return pd.Series(0, index=df.index)
+
+    risk = column("risk_category").to_numpy()
+    coverage = column("coverage_bucket").to_numpy()
+    cc = pd.to_numeric(column("cc"), errors="coerce").to_numpy()
+    missing_branches = pd.to_numeric(column("missing_branches"), errors="coerce").to_numpy()
+    lloc = pd.to_numeric(column("lloc"), errors="coerce").to_numpy()
+    difficulty = pd.to_numeric(column("difficulty"), errors="coerce").to_numpy()
+
+    rules = [
+        risk == "Hidden Risk",
+        coverage == "ZERO",
+        np.isin(coverage, ("ZERO", "LOW")),
+        cc >= 10,
+        missing_branches > 0,
+        lloc >= 30,
+        difficulty >= 20,
+        risk == "Refactor Candidate",
+    ]
+    codes = np.zeros(len(df), dtype=np.int64)
+    for bit, fired in enumerate(rules):
+        codes |= fired.astype(np.int64) << bit
+    return codes
+
+
+def recommend_tests_series(df: pd.DataFrame, sep: str = "; ") -> pd.Series:
+    """
+    Columnar recommend_tests: the recommendations of every row joined with
+    sep, identical to sep.join(recommend_tests(row)).
+    """
+    codes = recommendation_codes(df)
+    return pd.Series(_recommendation_table(sep)[codes], index=df.index, dtype=object)
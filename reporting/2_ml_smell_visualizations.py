@@ -1,8 +1,8 @@
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import os
 from config.paths import PROCESSED_DATA_DIR, REPORTS_DIR
+from config.artifacts import artifact_exists, artifact_path, read_table
 
 ML_PREDICTIONS_FILE = os.path.join(PROCESSED_DATA_DIR, "ml_smell_predictions.csv")
 
@@ -11,11 +11,11 @@ def load_and_clean_ml_data(file_path):
     Standardizes headers, simplifies absolute paths, and removes duplicates 
     for the ML predictions dataset.
     """
-    if not os.path.exists(file_path):
-        print(f"Error: {file_path} not found.")
+    if not artifact_exists(file_path):
+        print(f"Error: {artifact_path(file_path)} not found.")
         return None
 
-    df = pd.read_csv(file_path)
+    df = read_table(file_path)
 
     # A. Simplify paths (removes system-specific prefixes)
     def simplify_path(path):
@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import sys
 import os
@@ -19,11 +20,14 @@ from config.paths import (
     TARGET_REPOS_DIR,
     PROCESSED_DATA_DIR,
 )
+from analysis.parallel_coverage import discover_repos, run_all as run_coverage_parallel
+from ci.instrumentation import PARENT_ENV, TRACE_FILE, enable_tracing, span
+from ci.profiling import PROFILERS, PROFILE_DIR, PROFILE_TOP, ProfileError, check_profiler, print_report, profiled_command, reset_profile_dir
 
 # -------------------------------------------------
 # Subprocess runner
 # -------------------------------------------------
-def run_step(module_path: str, args=None):
+def run_step(module_path: str, args=None, profile=None):
     """
     Run a Python module in a clean subprocess.
     Used for both ML and analysis stages.
@@ -36,14 +40,22 @@ def run_step(module_path: str, args=None):
 
     env = os.environ.copy()
     env["PYTHONPATH"] = str(PROJECT_ROOT)
+    if profile == "cprofile":
+        # cProfile only sees this process: no worker pool, so no per-file time budget either
+        env["METRICS_JOBS"] = "1"
+        env["METRICS_FILE_TIMEOUT"] = "0"
+    cmd = profiled_command(cmd, module_path, profile)
 
     try:
-        subprocess.run(
-            cmd,
-            cwd=str(PROJECT_ROOT),
-            env=env,
-            check=True,
-        )
+        # Spans of the step's own process nest under this one
+        with span(f"step:{module_path}") as s:
+            env[PARENT_ENV] = s.name
+            subprocess.run(
+                cmd,
+                cwd=str(PROJECT_ROOT),
+                env=env,
+                check=True,
+            )
     except subprocess.CalledProcessError:
         print(f"❌ Error in {module_path}. Pipeline aborted.")
         sys.exit(1)
@@ -52,16 +64,48 @@ def run_step(module_path: str, args=None):
 # -------------------------------------------------
 # Main pipeline
 # -------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the full research pipeline over every target repo.")
+    parser.add_argument(
+        "--profile", nargs="?", const="cprofile", choices=PROFILERS, default=None,
+        help=f"Profile every step into {PROFILE_DIR} (default profiler: cprofile)",
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=PROFILE_TOP,
+        help=f"Hottest functions listed after a profiled run (default: {PROFILE_TOP})",
+    )
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    if args.profile:
+        try:
+            check_profiler(args.profile)
+        except ProfileError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        reset_profile_dir()
+
+    traced = enable_tracing()
+    with span("pipeline", profile=args.profile):
+        run_pipeline(args.profile)
+    if traced:
+        print(f"🧭 Trace written to: {TRACE_FILE}")
+    if args.profile:
+        print_report(PROFILE_DIR, args.profile_top)
+
+
+def run_pipeline(profile=None):
     print("🚀 STARTING MACHINE LEARNING–GUIDED CODE SMELL DETECTION PIPELINE")
 
     # -------------------------------------------------
     # OFFLINE ML PHASE (isolated subprocesses)
     # -------------------------------------------------
-    run_step("ml.build_training_dataset")
-    run_step("ml.build_validation_dataset")
-    run_step("ml.train_model")
-    run_step("ml.inference")
+    run_step("ml.build_training_dataset", profile=profile)
+    run_step("ml.build_validation_dataset", profile=profile)
+    run_step("ml.train_model", profile=profile)
+    run_step("ml.inference", profile=profile)
 
     # -------------------------------------------------
     # ONLINE ANALYSIS PHASE
@@ -71,21 +115,23 @@ def main():
     # ---- Coverage stage (no assumptions about existing JSONs) ----
     print("\n🔍 Running coverage for all target repositories...")
 
-    for repo_dir in TARGET_REPOS_DIR.iterdir():
-        if repo_dir.is_dir():
-            run_step(
-                "analysis.coverage",
-                args=[repo_dir.name],
-            )
+    # Repos run concurrently in their own venvs (COVERAGE_WORKERS / COVERAGE_TIMEOUT)
+    with span("coverage_all"):
+        results = run_coverage_parallel(discover_repos(TARGET_REPOS_DIR), profile=profile)
+    failed = [r for r in results if r["status"] != "ok"]
+    if failed:
+        for r in failed:
+            print(f"❌ Coverage {r['status']} for {r['repo']} (see {r['log']}). Pipeline aborted.")
+        sys.exit(1)
 
     # ---- Post-ML aggregation stage ----
     print("\n🧠 Aggregating ML predictions with coverage & risk analysis...")
-    run_step("analysis.post_ml_aggregate")
+    run_step("analysis.post_ml_aggregate", profile=profile)
 
     #----- Reporting ------
     print("\nGenerating Reports...")
-    run_step("reporting.1_final_results_visualization")
-    run_step("reporting.2_ml_smell_visualizations")
+    run_step("reporting.1_final_results_visualization", profile=profile)
+    run_step("reporting.2_ml_smell_visualizations", profile=profile)
 
     print("\n" + "=" * 60)
     print("✅ PIPELINE EXECUTION COMPLETE")
@@ -0,0 +1,36 @@
+import asyncio
+
+
+async def fetch(session, url, retries=3):
+    for attempt in range(retries):
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return await response.text()
+        except OSError:
+            await asyncio.sleep(2 ** attempt)
+    return None
+
+
+async def gather_all(session, urls):
+    results = await asyncio.gather(*(fetch(session, u) for u in urls))
+    return [r for r in results if r is not None]
+
+
+async def stream(queue):
+    async for item in queue:
+        if item is None:
+            break
+        yield item * 2
+
+
+class Client:
+    async def close(self):
+        await self.session.close()
+
+
+def run(urls):
+    async def main():
+        async with make_session() as session:
+            return await gather_all(session, urls)
+    return asyncio.run(main())
@@ -0,0 +1,42 @@
+import functools
+
+
+def logged(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        print("calling", func.__name__)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@logged
+def add(a, b):
+    return a + b
+
+
+@logged
+@functools.lru_cache(maxsize=None)
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+
+class Shape:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    @property
+    def area(self):
+        return self.width * self.height
+
+    @staticmethod
+    def unit():
+        return Shape(1, 1)
+
+    @classmethod
+    def square(cls, side):
+        if side <= 0:
+            raise ValueError("side must be positive")
+        return cls(side, side)
@@ -0,0 +1,17 @@
+def sort_people(people):
+    return sorted(people, key=lambda p: (p.age, p.name))
+
+
+def make_ops():
+    ops = {
+        "add": lambda a, b: a + b,
+        "sub": lambda a, b: a - b,
+        "div": lambda a, b: a / b if b else None,
+    }
+    return ops
+
+
+def pipeline(values):
+    square = lambda x: x * x  # noqa: E731
+    evens = filter(lambda v: v % 2 == 0, values)
+    return [square(v) for v in evens if v > 1] or [0]
@@ -0,0 +1,28 @@
+def outer(items, threshold):
+    def keep(item):
+        return item > threshold and item % 2 == 0
+
+    def scale(item, factor=2):
+        def clamp(value):
+            return min(max(value, 0), 100)
+        return clamp(item * factor)
+
+    result = []
+    for item in items:
+        if keep(item):
+            result.append(scale(item))
+        elif item < 0:
+            continue
+    return result
+
+
+class Registry:
+    def register(self, name):
+        def decorator(func):
+            self.entries[name] = func
+            return func
+        return decorator
+
+    class Entry:
+        def describe(self):
+            return f"{self.name}: {self.value}"
@@ -0,0 +1,27 @@
+def documented(value):
+    """
+    A docstring spanning
+    several lines.
+    """
+    # a full-line comment
+    text = """
+    multiline string
+    # not a comment
+    """  # trailing comment
+    return text.format(value)  # inline comment
+
+
+def concatenated():
+    query = (
+        "SELECT *"
+        " FROM table"  # comment inside parentheses
+        " WHERE id = %s"
+    )
+    return query
+
+
+def escapes(name):
+    # one
+    # two
+    pattern = r"\d+\s*" + '\'' + f"{name!r:>10}"
+    return pattern
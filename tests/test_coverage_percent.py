@@ -0,0 +1,68 @@
+import pandas as pd
+
+from analysis.post_ml_aggregate import build_coverage_index, compute_coverage_percent, compute_function_coverage
+
+COVERAGE = {
+    "repo_a": {
+        "src/pkg/core.py": [1, 2, 3, 5, 8, 13, 21, 22, 23],
+        "src\\pkg\\windows.py": [4, 5, 6],
+        "/abs/target-repos/repo_a/src/pkg/absolute.py": [10, 11, 12, 40],
+    },
+    "repo_b": {
+        "lib/util.py": [2, 3, 30, 31, 32],
+    },
+}
+
+ROWS = [
+    # repo-relative coverage key, absolute CI File_Path
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 1, 5),
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 6, 20),
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 21, 23),
+    # start > end, single line, empty interval
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 9, 4),
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 8, 8),
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/core.py", 30, 29),
+    # relative File_Path, exact key and backslash key
+    ("repo_a", "src/pkg/core.py", 1, 3),
+    ("repo_a", "src/pkg/windows.py", 1, 6),
+    # absolute coverage key, relative File_Path
+    ("repo_a", "src/pkg/absolute.py", 10, 19),
+    # file with no coverage entry, repo with no coverage at all
+    ("repo_a", "/ci/target-repos/repo_a/src/pkg/untested.py", 1, 10),
+    ("repo_c", "/ci/target-repos/repo_c/mod.py", 1, 10),
+    # same relative path in another repo must not match repo_a's data
+    ("repo_b", "/ci/target-repos/repo_b/lib/util.py", 1, 3),
+    ("repo_b", "/ci/target-repos/repo_b/lib/util.py", 29, 33),
+    ("repo_b", "/ci/target-repos/repo_b/src/pkg/core.py", 1, 5),
+]
+
+
+def test_compute_coverage_percent_matches_per_row():
+    df = pd.DataFrame(ROWS, columns=["repo_name", "file_path", "start_line", "end_line"])
+    indexes = {repo: build_coverage_index(files) for repo, files in COVERAGE.items()}
+
+    got = compute_coverage_percent(df, indexes)
+
+    expected = [
+        compute_function_coverage(row, indexes.get(row["repo_name"], {}))
+        for _, row in df.iterrows()
+    ]
+    assert got.tolist() == expected
+    assert got.tolist() == [
+        80.0, 13.33, 100.0,
+        0.0, 100.0, 0.0,
+        100.0, 50.0,
+        30.0,
+        0.0, 0.0,
+        66.67, 60.0, 0.0,
+    ]
+
+
+def test_compute_coverage_percent_keeps_index():
+    df = pd.DataFrame(ROWS[:3], columns=["repo_name", "file_path", "start_line", "end_line"], index=[7, 3, 5])
+    indexes = {repo: build_coverage_index(files) for repo, files in COVERAGE.items()}
+
+    got = compute_coverage_percent(df, indexes)
+
+    assert got.index.tolist() == [7, 3, 5]
+    assert got.tolist() == [80.0, 13.33, 100.0]
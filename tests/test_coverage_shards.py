@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from analysis.coverage import collect_coverage
+
+PACKAGE = {
+    "demo/__init__.py": "",
+    "demo/core.py": (
+        "def add(a, b):\n"        # 1
+        "    return a + b\n"      # 2
+        "\n"
+        "\n"
+        "def sub(a, b):\n"        # 5
+        "    return a - b\n"      # 6
+        "\n"
+        "\n"
+        "def mul(a, b):\n"        # 9
+        "    return a * b\n"      # 10
+    ),
+    "tests/test_add.py": (
+        "import pytest\n"
+        "from demo.core import add\n\n"
+        "@pytest.mark.parametrize('a', [1, 2])\n"
+        "def test_add(a):\n    assert add(a, 1) == a + 1\n"
+    ),
+    "tests/test_sub.py": (
+        "from demo.core import sub\n\n"
+        "def test_sub():\n    assert sub(2, 1) == 1\n\n"
+        "def test_sub_zero():\n    assert sub(0, 0) == 0\n"
+    ),
+    "tests/test_mul.py": (
+        "from demo.core import mul\n\n"
+        "class TestMul:\n    def test_mul(self):\n        assert mul(2, 3) == 6\n"
+    ),
+}
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for name, source in PACKAGE.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    (tmp_path / "pyproject.toml").write_text("[tool.pytest.ini_options]\npythonpath = ['.']\n")
+    monkeypatch.delenv("COVERAGE_FILE", raising=False)
+    return tmp_path
+
+
+def executed(result):
+    return set(result.executed["demo/core.py"])
+
+
+def test_sharded_run_covers_all_collected_tests(repo):
+    result = collect_coverage(repo, sys.executable, include=["demo/*"], shards=2)
+
+    assert {2, 6, 10} <= executed(result)
+
+
+def test_sharded_run_keeps_to_explicit_node_ids(repo):
+    tests = ["tests/test_add.py::test_add", "tests/test_mul.py::TestMul::test_mul", "tests/test_sub.py::test_sub_zero"]
+
+    result = collect_coverage(repo, sys.executable, include=["demo/*"], shards=2, contexts=True, tests=tests)
+
+    assert {2, 6, 10} <= executed(result)
+    ran = {test for by_test in result.test_lines.values() for test in by_test}
+    assert ran == set(tests)
+
+
+def test_explicit_node_ids_deselect_the_rest_of_the_file(repo):
+    result = collect_coverage(repo, sys.executable, include=["demo/*"], shards=1, contexts=True,
+                              tests=["tests/test_sub.py::test_sub_zero"])
+
+    ran = {test for by_test in result.test_lines.values() for test in by_test}
+    assert ran == {"tests/test_sub.py::test_sub_zero"}
+    assert 2 not in executed(result)
@@ -0,0 +1,23 @@
+from ml.discovery import discover_relative
+
+FILES = [
+    "pkg/__init__.py",
+    "pkg/core.py",
+    "pkg/Tests/test_core.py",
+    "pkg/Test/helpers.py",
+    "TESTS/test_top.py",
+    "pkg/Test_Core.py",
+    "pkg/CONFTEST.py",
+]
+
+
+def test_validation_excludes_tests_regardless_of_case(tmp_path):
+    for rel in FILES:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("def f():\n    return 1\n")
+
+    assert discover_relative(tmp_path, "validation", use_git=False) == ["pkg/__init__.py", "pkg/core.py"]
+    assert discover_relative(tmp_path, "training", use_git=False) == [
+        "pkg/CONFTEST.py", "pkg/Test_Core.py", "pkg/__init__.py", "pkg/core.py",
+    ]
@@ -0,0 +1,30 @@
+import time
+
+from ml.parallel import pop_skipped, process_files
+
+
+def stall_on_marker(file_path, counters=None):
+    """Hangs on the marker file, like ast.parse on a huge generated module."""
+    with open(file_path, encoding="utf-8") as fh:
+        content = fh.read()
+    if "STALL" in content:
+        time.sleep(60)
+    counters["added"] += 1
+    return [{"File_Path": str(file_path), "size": len(content)}]
+
+
+def test_timed_out_file_is_killed_and_skipped(tmp_path):
+    names = ["a.py", "stall.py", "b.py", "c.py", "d.py"]
+    for name in names:
+        (tmp_path / name).write_text("STALL\n" if name == "stall.py" else f"# {name}\n")
+    files = [str(tmp_path / name) for name in names]
+
+    t0 = time.perf_counter()
+    rows, counters = process_files(stall_on_marker, files, jobs=2, timeout=1)
+
+    assert time.perf_counter() - t0 < 30
+    assert [r["File_Path"] for r in rows] == [f for f in files if not f.endswith("stall.py")]
+    skipped = pop_skipped(counters)
+    assert [(s["File_Path"], s["reason"]) for s in skipped] == [(files[1], "timeout")]
+    assert skipped[0]["measured"] >= 1
+    assert counters == {"added": 4, "skip_timeout": 1}
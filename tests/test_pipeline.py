@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import ci.pipeline as pipeline
+# Imported first on purpose: their import-time paths are the research ones
+import ml.build_validation_dataset as metrics_mod
+import ml.inference as inference
+
+SOURCES = {
+    "demo/__init__.py": "",
+    "demo/core.py": (
+        "def clamp(value, low, high):\n"
+        "    if value < low:\n"
+        "        return low\n"
+        "    if value > high:\n"
+        "        return high\n"
+        "    return value\n"
+        "\n\n"
+        "def untested(items):\n"
+        "    return [i * 2 for i in items if i]\n"
+    ),
+    "tests/test_core.py": (
+        "from demo.core import clamp\n\n"
+        "def test_clamp():\n    assert clamp(5, 0, 3) == 3\n"
+    ),
+}
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    dirs = {}
+    for name in ("COVERAGE", "METRICS", "PROCESSED", "REPORTS"):
+        path = dirs[name] = tmp_path / "ci_workspace" / name.lower()
+        path.mkdir(parents=True)
+        monkeypatch.setattr(pipeline, f"CI_WORKSPACE_{name}", path)
+    return dirs
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "demo_repo"
+    for name, source in SOURCES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    (root / "pyproject.toml").write_text("[tool.pytest.ini_options]\npythonpath = ['.']\n")
+    return root
+
+
+def research_outputs():
+    paths = [metrics_mod.OUTPUT_CSV_FILE, inference.output_file]
+    return {p: os.stat(p).st_mtime_ns if p.exists() else None for p in paths}
+
+
+def test_pipeline_writes_only_to_the_ci_workspace(workspace, repo, monkeypatch):
+    monkeypatch.delenv("CI_MODE", raising=False)
+    before = research_outputs()
+
+    df = pipeline.run_pipeline(repo)
+
+    assert sorted(df["method_name"]) == ["clamp", "untested"]
+    assert (workspace["METRICS"] / metrics_mod.OUTPUT_CSV_FILE.name).exists()
+    assert (workspace["PROCESSED"] / inference.output_file.name).exists()
+    assert (workspace["PROCESSED"] / "final_results.csv").exists()
+    assert (workspace["REPORTS"] / "1_actual_risk_landscape.png").exists()
+    assert research_outputs() == before
+    assert "CI_MODE" not in os.environ
@@ -0,0 +1,78 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from analysis.risk import BRANCH_RISK_THRESHOLD, classify_risk, classify_risk_series
+from recommendations.rules import recommend_tests, recommend_tests_series
+
+NAN = float("nan")
+
+SMELL_LABELS = ["HIGH", "LOW", "high", "Low", "hIgH"]
+COVERAGE_BUCKETS = ["ZERO", "LOW", "MEDIUM", "HIGH", "zero", "Low", "medium", "High"]
+BRANCH_PERCENTS = [None, NAN, 0.0, BRANCH_RISK_THRESHOLD - 0.1, BRANCH_RISK_THRESHOLD, 100.0]
+
+
+def test_classify_risk_series_matches_scalar():
+    cases = list(itertools.product(SMELL_LABELS, COVERAGE_BUCKETS, BRANCH_PERCENTS))
+    df = pd.DataFrame(cases, columns=["smell_label", "coverage_bucket", "branch_percent"])
+
+    got = classify_risk_series(df["smell_label"], df["coverage_bucket"], df["branch_percent"])
+
+    expected = [classify_risk(*case) for case in cases]
+    assert got.tolist() == expected
+
+
+def test_classify_risk_series_without_branch_data():
+    cases = list(itertools.product(SMELL_LABELS, COVERAGE_BUCKETS))
+    df = pd.DataFrame(cases, columns=["smell_label", "coverage_bucket"])
+
+    got = classify_risk_series(df["smell_label"], df["coverage_bucket"])
+
+    assert got.tolist() == [classify_risk(*case) for case in cases]
+
+
+RISKS = ["Hidden Risk", "Refactor Candidate", "Low Value", "Safe Zone"]
+BUCKETS = ["ZERO", "LOW", "MEDIUM", "HIGH"]
+CCS = [NAN, 1, 9, 10, 25]
+MISSING_BRANCHES = [NAN, 0, 1, 4]
+LLOCS = [NAN, 5, 30]
+DIFFICULTIES = [NAN, 3.5, 20.0]
+COLUMNS = ["risk_category", "coverage_bucket", "cc", "missing_branches", "lloc", "difficulty"]
+
+
+def _scalar_recommendations(df, sep="; "):
+    # Missing values are NaN in the frame; the scalar rules see them as such
+    return [sep.join(recommend_tests(row)) for row in df.to_dict(orient="records")]
+
+
+def test_recommend_tests_series_matches_scalar():
+    cases = list(itertools.product(RISKS, BUCKETS, CCS, MISSING_BRANCHES, LLOCS, DIFFICULTIES))
+    df = pd.DataFrame(cases, columns=COLUMNS)
+
+    got = recommend_tests_series(df)
+
+    assert got.tolist() == _scalar_recommendations(df)
+
+
+def test_recommend_tests_series_missing_columns():
+    # Without branch data (no missing_branches column) the rule never fires
+    df = pd.DataFrame(
+        list(itertools.product(RISKS, BUCKETS, CCS)), columns=["risk_category", "coverage_bucket", "cc"]
+    )
+
+    got = recommend_tests_series(df, sep=" | ")
+
+    assert got.tolist() == _scalar_recommendations(df, sep=" | ")
+    assert not got.str.contains("branch exits").any()
+
+
+@pytest.mark.parametrize("missing_branches, fires", [(0, False), (1, True), (NAN, False)])
+def test_missing_branches_rule(missing_branches, fires):
+    row = {"risk_category": "Safe Zone", "coverage_bucket": "HIGH", "cc": 1,
+           "missing_branches": missing_branches, "lloc": 5, "difficulty": 1.0}
+
+    got = recommend_tests_series(pd.DataFrame([row]))[0]
+
+    assert ("Add tests for the branch exits coverage never took" in got) is fires
+    assert got == "; ".join(recommend_tests(row))
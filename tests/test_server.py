@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from ml import client
+from ml.server import SmellService, make_handler
+
+SOURCE = '''
+def short(a):
+    return a + 1
+
+
+def branchy(x):
+    if x > 1:
+        return x
+    for i in range(x):
+        x += i
+    return x
+'''
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    service = SmellService(cache_path=tmp_path / "metrics_cache.sqlite")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def module_path(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    return path
+
+
+def test_repeated_analyze_uses_cache(server_url, module_path):
+    # Every request is handled on a new thread; each must get its own connection
+    results = [client.analyze([module_path], url=server_url) for _ in range(5)]
+
+    for result in results:
+        assert "error" not in result
+        assert [f["Method_Name"] for f in result["functions"]] == ["short", "branchy"]
+    assert results[0]["counters"]["cache_miss"] == 1
+    assert all(r["counters"]["cache_hit"] == 1 for r in results[1:])
+
+
+def test_concurrent_analyze(server_url, module_path):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: client.analyze([module_path], url=server_url), range(16)))
+
+    for result in results:
+        assert "error" not in result
+        assert len(result["functions"]) == 2
@@ -0,0 +1,36 @@
+from collections import Counter
+
+import ml.build_training_dataset as training
+from ml.metrics_cache import open_cache
+
+BRANCHES = "\n".join(f"    if x == {i}:\n        x += {i}" for i in range(16))
+SOURCE = f"def tiny(x):\n    return x\n\n\ndef long_branchy(x):\n{BRANCHES}\n    return x\n"
+
+
+def test_labels_follow_thresholds_on_cache_hits(tmp_path, monkeypatch):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    cache_path = tmp_path / "metrics_cache.sqlite"
+
+    counters = Counter()
+    rows = training.process_file(str(path), counters, cache_path=cache_path)
+    assert counters["cache_miss"] == 1
+    assert {r['Method_Name']: r['is_Long_Method'] for r in rows} == {"tiny": 0, "long_branchy": 1}
+
+    monkeypatch.setattr(training, "LLOC_THRESHOLD", 100)
+    counters = Counter()
+    rows = training.process_file(str(path), counters, cache_path=cache_path)
+    assert counters["cache_hit"] == 1
+    assert {r['Method_Name']: r['is_Long_Method'] for r in rows} == {"tiny": 0, "long_branchy": 0}
+
+
+def test_cache_stores_metrics_without_labels(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    cache_path = tmp_path / "metrics_cache.sqlite"
+
+    training.process_file(str(path), Counter(), cache_path=cache_path)
+
+    cache = open_cache(cache_path, training.CACHE_NAMESPACE)
+    cached_rows, _ = cache.get(cache.content_hash(SOURCE))
+    assert cached_rows and all('is_Long_Method' not in row for row in cached_rows)